@@ -0,0 +1,104 @@
+# © All rights reserved. ECOLE POLYTECHNIQUE FEDERALE DE LAUSANNE,
+# Switzerland, Laboratory of Experimental Biophysics, 2016-2018
+# See the LICENSE.txt file for more details.
+
+"""Benchmark of the clustering engines of the Cluster processor.
+
+Clusters synthetic SMLM data, made of Gaussian clusters of localizations on
+top of a uniform background, with scikit-learn's DBSCAN, with the grid of
+eps-sized cells of algorithm='grid', and with tiles that are clustered by
+either of them. The time and the peak memory allocated by Python are
+reported for each engine, and the labels are checked to be identical.
+
+The peak memory is measured with tracemalloc, which slows the clustering
+down a little and does not see the memory of worker processes.
+
+scikit-learn needs several GB of memory for 1e7 localizations; pass
+--no-sklearn to skip it.
+
+Usage
+-----
+python clustering.py [--no-sklearn] [numLocs ...]
+
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from bstore import processors as proc
+
+
+def makeLocalizations(numLocs, locsPerCluster=200, sigma=30, width=40000):
+    """Returns a DataFrame of clustered and background localizations.
+
+    Four fifths of the localizations belong to clusters with a standard
+    deviation of sigma nm; the rest are spread uniformly over a square field
+    of view of the given width in nm.
+
+    """
+    rng = np.random.RandomState(42)
+    numClustered = 4 * numLocs // 5
+    centers = rng.uniform(0, width,
+                          size=(max(numClustered // locsPerCluster, 1), 2))
+    coords = np.vstack([
+        centers[rng.randint(len(centers), size=numClustered)]
+        + rng.normal(0, sigma, size=(numClustered, 2)),
+        rng.uniform(0, width, size=(numLocs - numClustered, 2))])
+    return pd.DataFrame({'x': coords[:, 0], 'y': coords[:, 1]})
+
+
+def benchmark(numLocs=1000000, tileSize=2000, workers=None, sklearn=True):
+    """Clusters numLocs localizations with each engine and reports the results.
+
+    Parameters
+    ----------
+    numLocs  : int
+    tileSize : float
+    workers  : int
+        The number of processes of the tiled engines.
+    sklearn  : bool
+        Whether to run the engines that use scikit-learn.
+
+    """
+    df = makeLocalizations(numLocs)
+    print('{0:d} localizations\n'.format(numLocs))
+    print('{0:<14s}{1:>12s}{2:>18s}{3:>12s}'.format(
+        'engine', 'time [s]', 'peak memory [MB]', 'clusters'))
+
+    tiles = {'tileSize': tileSize, 'workers': workers}
+    engines = [('grid', {'algorithm': 'grid'}),
+               ('tiled grid', dict(tiles, algorithm='grid'))]
+    if sklearn:
+        engines = [('sklearn', {}), ('tiled sklearn', tiles)] + engines
+    labels = None
+    for name, kwargs in engines:
+        cluster = proc.Cluster(minSamples=10, eps=20, **kwargs)
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        procdf = cluster(df)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print('{0:<14s}{1:>12.3f}{2:>18.1f}{3:>12d}'.format(
+            name, elapsed, peak / 1e6, procdf['cluster_id'].max() + 1))
+
+        if labels is None:
+            labels = procdf['cluster_id'].values
+        else:
+            assert np.array_equal(procdf['cluster_id'].values, labels), \
+                'The labels of {0:s} differ from those of {1:s}.'.format(
+                    name, engines[0][0])
+    print()
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    sklearn = '--no-sklearn' not in args
+    sizes = [int(float(arg)) for arg in args if arg != '--no-sklearn']
+    for numLocs in sizes or [100000, 1000000, 10000000]:
+        benchmark(numLocs, sklearn=sklearn)
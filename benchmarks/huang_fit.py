@@ -0,0 +1,73 @@
+# © All rights reserved. ECOLE POLYTECHNIQUE FEDERALE DE LAUSANNE,
+# Switzerland, Laboratory of Experimental Biophysics, 2016-2018
+# See the LICENSE.txt file for more details.
+
+"""Benchmark of the Huang z-fit of ComputeZPosition.
+
+Computes the z-positions of synthetic astigmatic localizations with
+fittype='huang', which finds the minimum of the objective function for all
+localizations at once on a grid of z-positions, and with
+fittype='huang_minimize', which runs one minimization per localization. The
+time and the error with respect to the true z-positions are reported for
+both.
+
+Usage
+-----
+python huang_fit.py [numLocs]
+
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import interp1d
+
+from bstore import processors as proc
+
+
+def makeLocalizations(numLocs):
+    """Returns calibration curves and localizations at random z-positions.
+
+    The PSF widths are those of the ground truth calibration used in the
+    tests of the astigmatism processors, plus 1 nm of Gaussian noise.
+
+    """
+    rng = np.random.RandomState(42)
+    zCal = np.arange(-800, 800, 10.0)
+    fx = interp1d(zCal, 0.0005 * (zCal - 150)**2 + 150, kind='cubic')
+    fy = interp1d(zCal, 0.0005 * (zCal + 150)**2 + 150, kind='cubic')
+
+    z = rng.uniform(-500, 500, numLocs)
+    df = pd.DataFrame({
+        'sigma_x': 0.0005 * (z - 150)**2 + 150 + rng.normal(0, 1, numLocs),
+        'sigma_y': 0.0005 * (z + 150)**2 + 150 + rng.normal(0, 1, numLocs)})
+    return (fx, fy), df, z
+
+
+def benchmark(numLocs=1000):
+    """Fits numLocs localizations with both fittypes and reports the results.
+
+    Parameters
+    ----------
+    numLocs : int
+
+    """
+    zFunc, df, z = makeLocalizations(numLocs)
+    print('{0:d} localizations\n'.format(numLocs))
+    print('{0:<16s}{1:>12s}{2:>14s}{3:>16s}'.format(
+        'fittype', 'time [s]', 'locs/s', 'rms error [nm]'))
+
+    for fittype in ['huang', 'huang_minimize']:
+        cz = proc.ComputeZPosition(zFunc, sigmaCols=['sigma_x', 'sigma_y'],
+                                   fittype=fittype)
+        start = time.perf_counter()
+        procdf = cz(df)
+        elapsed = time.perf_counter() - start
+        error = np.sqrt(np.nanmean((procdf['z'].values - z)**2))
+        print('{0:<16s}{1:>12.3f}{2:>14.0f}{3:>16.2f}'.format(
+            fittype, elapsed, numLocs / elapsed, error))
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,76 @@
+# © All rights reserved. ECOLE POLYTECHNIQUE FEDERALE DE LAUSANNE,
+# Switzerland, Laboratory of Experimental Biophysics, 2016-2018
+# See the LICENSE.txt file for more details.
+
+"""Benchmark of the encoding and decoding of HDFDatastore keys.
+
+Encodes random DatasetIDs into HDF keys and decodes them again, once with
+the precompiled pattern of decodeKey() and once with the field-by-field
+parsing that is used for keys that do not match it, which is how keys were
+parsed by older versions of B-Store.
+
+Usage
+-----
+python key_codec.py [numKeys]
+
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from bstore import database
+
+
+def makeIDs(numKeys):
+    """Returns a list of random DatasetIDs with every optional field."""
+    rng = np.random.RandomState(42)
+    channels = ['A488', 'A647', 'A750', 'DAPI']
+    return [database.DatasetID(
+        'HeLa_Control', int(acqID), 'Localizations', None,
+        channels[rng.randint(len(channels))],
+        '2016-{0:02d}-{1:02d}'.format(rng.randint(1, 13), rng.randint(1, 29)),
+        (int(rng.randint(100)), int(rng.randint(100))),
+        int(rng.randint(50)), int(rng.randint(10)))
+        for acqID in rng.randint(1, 10000, numKeys)]
+
+
+def decodeKeyLoose(key):
+    """Decodes a key field by field, like older versions of B-Store."""
+    splitStr = key.split(sep='/')
+    return database._decodeKeyLoose(
+        splitStr[0], int(splitStr[1].rsplit(sep='_', maxsplit=1)[-1]),
+        splitStr[2])
+
+
+def benchmark(numKeys=100000):
+    """Encodes and decodes numKeys keys and reports the time of each step.
+
+    Parameters
+    ----------
+    numKeys : int
+
+    """
+    dsIDs = makeIDs(numKeys)
+    print('{0:d} keys\n'.format(numKeys))
+    print('{0:<22s}{1:>12s}{2:>14s}'.format('step', 'time [s]', 'keys/s'))
+
+    start = time.perf_counter()
+    keys = [database.encodeKey(ids, ids.datasetType) for ids in dsIDs]
+    elapsed = time.perf_counter() - start
+    print('{0:<22s}{1:>12.3f}{2:>14.0f}'.format(
+        'encodeKey', elapsed, numKeys / elapsed))
+
+    for name, decode in [('decodeKey', database.decodeKey),
+                         ('field-by-field', decodeKeyLoose)]:
+        start = time.perf_counter()
+        decoded = [decode(key) for key in keys]
+        elapsed = time.perf_counter() - start
+        print('{0:<22s}{1:>12.3f}{2:>14.0f}'.format(
+            name, elapsed, numKeys / elapsed))
+
+        assert decoded == dsIDs, 'Keys did not round-trip.'
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
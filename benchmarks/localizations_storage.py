@@ -0,0 +1,95 @@
+# © All rights reserved. ECOLE POLYTECHNIQUE FEDERALE DE LAUSANNE,
+# Switzerland, Laboratory of Experimental Biophysics, 2016-2018
+# See the LICENSE.txt file for more details.
+
+"""Benchmark of the storage options for Localizations.
+
+Writes the same table of random localizations with different compression,
+data column and downcasting options and reports the write throughput and
+the size of the resulting file.
+
+Usage
+-----
+python localizations_storage.py [numRows]
+
+"""
+
+import sys
+import time
+import tempfile
+from os import remove
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bstore import database
+from bstore.datasetTypes.Localizations import Localizations
+
+options = [
+    ('default',               {}),
+    ('x, y, frame indexed',   {'dataColumns': ['x', 'y', 'frame']}),
+    ('no indexed columns',    {'dataColumns': None}),
+    ('zlib 5',                {'complib': 'zlib', 'complevel': 5,
+                               'dataColumns': ['x', 'y', 'frame']}),
+    ('blosc 5',               {'complib': 'blosc', 'complevel': 5,
+                               'dataColumns': ['x', 'y', 'frame']}),
+    ('blosc 5, float32',      {'complib': 'blosc', 'complevel': 5,
+                               'dataColumns': ['x', 'y', 'frame'],
+                               'downcast': True}),
+]
+
+
+def makeLocalizations(numRows):
+    """Returns a DataFrame of random localizations."""
+    rng = np.random.RandomState(42)
+    return pd.DataFrame({
+        'x':             rng.uniform(0, 50000, numRows),
+        'y':             rng.uniform(0, 50000, numRows),
+        'z':             rng.normal(0, 200, numRows),
+        'frame':         np.sort(rng.randint(0, 20000, numRows)),
+        'photons':       rng.exponential(2000, numRows),
+        'background':    rng.normal(100, 10, numRows),
+        'precision':     rng.uniform(5, 30, numRows),
+        'sigma':         rng.normal(150, 20, numRows),
+        'loglikelihood': rng.normal(100, 30, numRows)})
+
+
+def benchmark(numRows=1000000):
+    """Writes numRows localizations with each set of options.
+
+    Parameters
+    ----------
+    numRows : int
+
+    """
+    df = makeLocalizations(numRows)
+    inMemoryMB = df.memory_usage(index=False).sum() / 1e6
+    print('{0:d} localizations, {1:.1f} MB in memory\n'.format(numRows,
+                                                             inMemoryMB))
+    print('{0:<22s}{1:>12s}{2:>12s}{3:>12s}'.format(
+        'options', 'time [s]', 'MB/s', 'size [MB]'))
+
+    tempDir = Path(tempfile.mkdtemp())
+    for name, kwargs in options:
+        dsName = tempDir / 'benchmark.h5'
+        ds = Localizations(datasetIDs={'prefix': 'Benchmark', 'acqID': 1})
+        ds.data = df
+
+        start = time.perf_counter()
+        with database.HDFDatastore(dsName) as myDB:
+            myDB.put(ds, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        sizeMB = dsName.stat().st_size / 1e6
+        print('{0:<22s}{1:>12.2f}{2:>12.1f}{3:>12.1f}'.format(
+            name, elapsed, inMemoryMB / elapsed, sizeMB))
+
+        for file in (dsName, Path(str(dsName) + '.lock')):
+            if file.exists():
+                remove(str(file))
+
+    tempDir.rmdir()
+
+if __name__ == '__main__':
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
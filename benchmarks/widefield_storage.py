@@ -0,0 +1,107 @@
+# © All rights reserved. ECOLE POLYTECHNIQUE FEDERALE DE LAUSANNE,
+# Switzerland, Laboratory of Experimental Biophysics, 2016-2018
+# See the LICENSE.txt file for more details.
+
+"""Benchmark of the storage options for WidefieldImages.
+
+Writes the same stack of simulated camera frames with different chunk shapes
+and compression filters and reports the write throughput, the size of the
+resulting file, and the time needed to read a single frame and a 64 x 64
+pixel region of interest from every frame.
+
+Usage
+-----
+python widefield_storage.py [numFrames] [frameSize]
+
+"""
+
+import sys
+import time
+import tempfile
+from os import remove
+from pathlib import Path
+
+import numpy as np
+
+from bstore import database
+from bstore.datasetTypes.WidefieldImage import WidefieldImage
+
+options = [
+    ('contiguous',            {'chunks': False}),
+    ('1 frame per chunk',     {'chunks': 'frame'}),
+    ('256 x 256 tiles',       {}),
+    ('tiles, lzf',            {'compression': 'lzf'}),
+    ('tiles, gzip 4',         {'compression': 'gzip', 'compressionOpts': 4}),
+    ('tiles, gzip 4, shuffle', {'compression': 'gzip', 'compressionOpts': 4,
+                                'shuffle': True}),
+]
+
+
+def makeStack(numFrames, frameSize):
+    """Returns a stack of frames with spots, background and shot noise."""
+    rng = np.random.RandomState(42)
+    y, x = np.mgrid[0:frameSize, 0:frameSize]
+    spots = np.zeros((frameSize, frameSize))
+    for x0, y0 in rng.uniform(0, frameSize, (frameSize // 4, 2)):
+        spots += 2000 * np.exp(-((x - x0)**2 + (y - y0)**2) / 8)
+
+    stack = rng.poisson(spots + 100, (numFrames, frameSize, frameSize))
+    return stack.astype('uint16')
+
+
+def benchmark(numFrames=100, frameSize=1024):
+    """Writes and reads a stack of frames with each set of options.
+
+    Parameters
+    ----------
+    numFrames : int
+    frameSize : int
+        The height and width of each frame in pixels.
+
+    """
+    stack = makeStack(numFrames, frameSize)
+    inMemoryMB = stack.nbytes / 1e6
+    print('{0:d} frames of {1:d} x {1:d} pixels, {2:.1f} MB in memory\n'.format(
+        numFrames, frameSize, inMemoryMB))
+    print('{0:<24s}{1:>10s}{2:>10s}{3:>12s}{4:>12s}{5:>12s}'.format(
+        'options', 'write [s]', 'MB/s', 'size [MB]', 'frame [ms]',
+        'ROI [ms]'))
+
+    tempDir = Path(tempfile.mkdtemp())
+    for name, kwargs in options:
+        dsName = tempDir / 'benchmark.h5'
+        ds = WidefieldImage(datasetIDs={'prefix': 'Benchmark', 'acqID': 1})
+        ds.data = stack
+        if kwargs.get('chunks') == 'frame':
+            kwargs = dict(kwargs, chunks=(1, frameSize, frameSize))
+
+        start = time.perf_counter()
+        with database.HDFDatastore(dsName) as myDB:
+            myDB.put(ds, **kwargs)
+        elapsed = time.perf_counter() - start
+        sizeMB = dsName.stat().st_size / 1e6
+
+        dsID = myDB.query(datasetType='WidefieldImage')[0]
+        img = myDB.get(dsID, lazy=True).data
+
+        start = time.perf_counter()
+        np.array(img[numFrames // 2])
+        frameTime = time.perf_counter() - start
+
+        start = time.perf_counter()
+        np.array(img[:, 0:64, 0:64])
+        roiTime = time.perf_counter() - start
+        del img
+
+        print('{0:<24s}{1:>10.2f}{2:>10.1f}{3:>12.1f}{4:>12.2f}{5:>12.2f}'
+              .format(name, elapsed, inMemoryMB / elapsed, sizeMB,
+                      1000 * frameTime, 1000 * roiTime))
+
+        for file in (dsName, Path(str(dsName) + '.lock')):
+            if file.exists():
+                remove(str(file))
+
+    tempDir.rmdir()
+
+if __name__ == '__main__':
+    benchmark(*[int(arg) for arg in sys.argv[1:3]])
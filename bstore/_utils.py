@@ -12,6 +12,8 @@ import ast
 import _ast
 import bstore.config as cfg
 import importlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
 
 
 def findPlugins(classType):
@@ -99,3 +101,46 @@ def _filterClassBases(classes, match):
             continue
 
     return rClasses
+
+
+def mapBounded(func, jobs, workers, ahead=2):
+    """Runs a function on jobs in a pool of processes, a few at a time.
+
+    Only `ahead` jobs per process are submitted before the result of the
+    first one is yielded, so that the jobs are produced lazily and few of
+    them and their results are held in memory at once.
+
+    Parameters
+    ----------
+    func    : function
+        A picklable function that is called as func(*args) in the workers.
+    jobs    : iterable of tuple of (object, tuple)
+        A key identifying each job and the arguments of func for it. The
+        iterable is consumed only as fast as jobs are submitted.
+    workers : int
+        The number of processes.
+    ahead   : int
+        The number of jobs per process that are submitted ahead.
+
+    Yields
+    ------
+    key    : object
+        The key of each job, in the same order as jobs.
+    future : concurrent.futures.Future
+        The job; its result() waits for it and returns the value of func or
+        raises the exception that func raised.
+
+    """
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def submit(job):
+            key, args = job
+            return key, pool.submit(func, *args)
+
+        pending = [submit(job)
+                   for job in itertools.islice(jobs, ahead * workers)]
+        while pending:
+            key, future = pending.pop(0)
+            pending.extend(submit(job) for job in itertools.islice(jobs, 1))
+
+            yield key, future
@@ -10,6 +10,8 @@ from pathlib import Path
 from abc import ABCMeta, abstractmethod, abstractproperty
 import bstore.database as dsdb
 import json
+import bstore._utils as _utils
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 
 class BatchProcessor(metaclass=ABCMeta):
@@ -84,9 +86,16 @@ class CSVBatchProcessor(BatchProcessor):
         self._suffix = suffix
         self._delimiter = delimiter
 
-    def go(self, processedFlag='processed'):
+    def go(self, processedFlag='processed', workers=None, maxInFlight=None,
+           outputFormat='csv'):
         """Initiate batch processing on all the files.
 
+        By default, each file is read, processed and written before the next
+        one. If workers is given, the files are processed in a pipeline
+        instead: up to maxInFlight files are read and written at the same
+        time on threads, while a pool of processes runs the Processors on
+        the files that have already been read.
+
         Parameters
         ----------
         processedFlag : str
@@ -95,8 +104,20 @@ class CSVBatchProcessor(BatchProcessor):
             string appended to the end. For example, an input of
             "Cells_Results.dat" will produce an output named
             "Cells_Results_processed.dat".
+        workers       : int or None
+            The number of processes that run the pipeline. The processors in
+            the pipeline must be picklable to use more than one process.
+        maxInFlight   : int or None
+            The largest number of files that are read, processed or written
+            at the same time. This limits the number of DataFrames in memory
+            to about twice this number. Defaults to 2 * workers.
+        outputFormat  : str
+            The format of the output files: 'csv', or the columnar formats
+            'parquet' or 'feather', which require the pyarrow package.
 
         """
+        _checkOutputFormat(outputFormat, ('csv', 'parquet', 'feather'))
+
         if (not self._outputDirectory.exists()) and (not self._useSameFolder):
             print('Output directory does not exist. Creating it...')
             self._outputDirectory.mkdir()
@@ -104,29 +125,67 @@ class CSVBatchProcessor(BatchProcessor):
                 str(self._outputDirectory.resolve())))
 
         # Perform batch processing on all files
-        for file in self.datasetList:
-            inputFile = str(file.resolve())
+        if not workers:
+            for file in self.datasetList:
+                df = _runPipeline(self.pipeline, self._readFile(file))
+                self._writeFile(df, file, processedFlag, outputFormat)
+            return
+
+        maxInFlight = maxInFlight or 2 * workers
+        with ProcessPoolExecutor(max_workers=workers) as pool, \
+                ThreadPoolExecutor(max_workers=maxInFlight) as io:
+            def processFile(file):
+                df = self._readFile(file)
+                df = pool.submit(_runPipeline, self.pipeline, df).result()
+                self._writeFile(df, file, processedFlag, outputFormat)
+
+            # Each thread holds one file from reading to writing, so reads
+            # and writes overlap with the processing of other files.
+            futures = [io.submit(processFile, file)
+                       for file in self.datasetList]
+            for future in futures:
+                future.result()
+
+    def _readFile(self, file):
+        """Reads one input file.
 
-            df = pd.read_csv(inputFile, sep=self._delimiter)
+        Parameters
+        ----------
+        file : Path
 
-            # Run each processor on the DataFrame
-            for proc in self.pipeline:
-                df = proc(df)
+        Returns
+        -------
+        df : DataFrame
 
-            # Save the final DataFrame
-            if self._useSameFolder:
-                fileStem = file.resolve().parent / file.stem
-            else:
-                fileStem = self._outputDirectory / file.stem
+        """
+        return pd.read_csv(str(file.resolve()), sep=self._delimiter)
 
-            outputFile = str(fileStem) + '_' + processedFlag + '.csv'
+    def _writeFile(self, df, file, processedFlag, outputFormat='csv'):
+        """Writes the processed data of one input file.
 
-            # Output the results to a file.
-            # This will overwrite any existing files (mode = 'w').
-            df.to_csv(outputFile,
-                      sep=self._delimiter,
-                      mode='w',
-                      index=False)
+        Parameters
+        ----------
+        df            : DataFrame
+            The processed data.
+        file          : Path
+            The input file that the data was read from.
+        processedFlag : str
+            The string to append to the input filename; see go().
+        outputFormat  : str
+            'csv', 'parquet' or 'feather'.
+
+        """
+        # Save the final DataFrame
+        if self._useSameFolder:
+            fileStem = file.resolve().parent / file.stem
+        else:
+            fileStem = self._outputDirectory / file.stem
+
+        outputFile = str(fileStem) + '_' + processedFlag
+
+        # Output the results to a file.
+        # This will overwrite any existing files.
+        _writeOutput(df, outputFile, outputFormat, sep=self._delimiter)
 
     @property
     def datasetList(self):
@@ -210,6 +269,7 @@ class HDFBatchProcessor(BatchProcessor):
         except UserWarning:
             print('Warning: Pipeline contains no Processors.')
 
+        self._inputDatastore = inputDatastore
         self._outputDirectory = Path(outputDirectory)
         self._searchString = searchString
 
@@ -225,38 +285,10 @@ class HDFBatchProcessor(BatchProcessor):
         fileName : Path
 
         """
-        acqKey    = '/'.join([dsID.prefix, dsID.prefix]) + \
-                    '_' + str(dsID.acqID)
-
-        otherIDs = ''
-        if dsID.channelID is not None:
-            otherIDs += '_Channel' + dsID.channelID
-        if dsID.posID is not None:
-            if len(dsID.posID) == 1:
-                posID = dsID.posID[0]
-                otherIDs += '_Pos{:d}'.format(posID)
-            else:
-                otherIDs += '_Pos_{0:0>3d}_{1:0>3d}'.format(dsID.posID[0],
-                                                            dsID.posID[1])
-        if dsID.sliceID is not None:
-            otherIDs += '_Slice{:d}'.format(dsID.sliceID)
-
-        fileName = acqKey + '/' + dsID.datasetType + otherIDs
+        fileName = dsdb.encodeKey(dsID, dsID.datasetType)
 
         return Path(fileName)
 
-    def _writeAtomicIDs(self, filename, dsID):
-        """Writes the atomic ID information to a text file.
-
-        Parameters
-        ----------
-        filename : str
-        dsID     : datasetID
-        """
-
-        with open(filename, 'w') as outfile:
-            json.dump(dsID, outfile)
-
     @property
     def datasetList(self):
         """A list of all datasets to process.
@@ -268,7 +300,43 @@ class HDFBatchProcessor(BatchProcessor):
     def datasetList(self, paths):
         self._datasetList = paths
 
-    def go(self):
+    def go(self, batchSize=10, workers=None, outputFormat='csv'):
+        """Initiate batch processing on all the datasets.
+
+        In this process, the first dataset that cannot be read, processed or
+        written raises an error, which stops the batch. In a pool of
+        processes, such datasets are reported and skipped instead, and the
+        others are still processed.
+
+        Parameters
+        ----------
+        batchSize : int
+            The number of datasets that are read from the datastore together
+            with getMany() and held in memory at the same time.
+        workers   : int or None
+            The number of processes that run the pipeline and write the
+            results. The datasets are read from the datastore by this
+            process only and sent to the workers. If None, the datasets are
+            processed in this process. The processors in the pipeline must
+            be picklable to use more than one process.
+        outputFormat : str
+            The format of the results. 'csv' writes one CSV file per dataset
+            and its IDs to a JSON file next to it. 'parquet' and 'feather'
+            write one file per dataset in these columnar formats, which
+            require the pyarrow package; the IDs are stored in the file's
+            metadata under the key 'bstore'. 'hdf' puts all the results into
+            a single HDFDatastore in the output directory under the same IDs
+            as their inputs; it is written by this process only.
+
+        Returns
+        -------
+        failed : list of tuple of (DatasetID, Exception)
+            The datasets that were not processed by the pool of processes and
+            the reason why. This is always empty if workers is None.
+
+        """
+        _checkOutputFormat(outputFormat, ('csv', 'parquet', 'feather', 'hdf'))
+
         if (not self._outputDirectory.exists()):
             print('Output directory does not exist. Creating it...')
             self._outputDirectory.mkdir()
@@ -279,35 +347,229 @@ class HDFBatchProcessor(BatchProcessor):
                 ('Error: the output directory already '
                  'exists. Please remove it or choose a new directory.'))
 
-        # Perform batch processing on all datasets
-        for currDataset in self.datasetList:
+        failed = []
+        serial = not workers or workers == 1
+
+        def fail(currDataset, err):
+            if serial:
+                raise err
 
-            atom = self._db.get(currDataset)
-            df = atom.data
+            print('Error: {0} could not be processed.'.format(currDataset))
+            print(err)
+            failed.append((currDataset, err))
 
-            # Run each processor on the DataFrame
-            for proc in self.pipeline:
-                df = proc(df)
+        jobs = ((currDataset, df, self._outputDirectory /
+                 self._genFileName(currDataset))
+                for currDataset, df in self._readDatasets(batchSize, fail))
 
-            # Build the directory structure
-            outputFile = self._outputDirectory / self._genFileName(currDataset)
-            if not outputFile.parent.parent.exists():
-                outputFile.parent.parent.mkdir()
-            if not outputFile.parent.exists():
-                outputFile.parent.mkdir()
+        if outputFormat == 'hdf':
+            outputDatastore = dsdb.HDFDatastore(
+                self._outputDirectory /
+                (Path(self._inputDatastore).stem + '_processed.h5'))
+        else:
+            outputDatastore = None
+
+        def finish(currDataset, df):
+            # Results in the 'hdf' format are returned to this process
+            if outputDatastore is not None:
+                idDict = dict(currDataset._asdict())
+                del(idDict['datasetType'])
+                del(idDict['attributeOf'])
+
+                dsType = dsdb.datasetTypeInfo(currDataset.datasetType).cls
+                ds = dsType(datasetIDs=idDict)
+                ds.data = df
+                with outputDatastore:
+                    outputDatastore.put(ds)
+
+        if serial:
+            for currDataset, df, outputFile in jobs:
+                finish(currDataset, _processDataset(
+                    self.pipeline, currDataset, df, outputFile,
+                    outputFormat))
+            return failed
+
+        jobs = ((currDataset, (self.pipeline, currDataset, df, outputFile,
+                               outputFormat))
+                for currDataset, df, outputFile in jobs)
+        for currDataset, future in _utils.mapBounded(_processDataset, jobs,
+                                                     workers):
+            try:
+                finish(currDataset, future.result())
+            except Exception as err:
+                fail(currDataset, err)
+
+        return failed
+
+    def _readDatasets(self, batchSize, fail):
+        """Reads the datasets to process from the datastore in batches.
+
+        Parameters
+        ----------
+        batchSize : int
+            The number of datasets to read with each call to getMany().
+        fail      : function
+            Called with the ID of a dataset that cannot be read and the
+            error.
+
+        Yields
+        ------
+        currDataset : DatasetID
+        df          : DataFrame
+            The dataset's data.
+
+        """
+        for start in range(0, len(self.datasetList), batchSize):
+            batch = self.datasetList[start:start + batchSize]
+            try:
+                atoms = self._db.getMany(batch)
+            except Exception:
+                # Find the datasets that cannot be read one at a time
+                atoms = []
+                for currDataset in batch:
+                    try:
+                        atoms.append(self._db.get(currDataset))
+                    except Exception as err:
+                        atoms.append(None)
+                        fail(currDataset, err)
+
+            for currDataset, atom in zip(batch, atoms):
+                if atom is not None:
+                    yield currDataset, atom.data
+
+
+def _checkOutputFormat(outputFormat, formats):
+    """Raises an error if an output format is not one of the known formats.
+
+    Parameters
+    ----------
+    outputFormat : str
+    formats      : tuple of str
+
+    """
+    if outputFormat not in formats:
+        raise ValueError(
+            'Error: Unknown output format {0}. Choose one of {1}.'.format(
+                outputFormat, ', '.join(formats)))
+
+
+def _processDataset(pipeline, currDataset, df, outputFile,
+                    outputFormat='csv'):
+    """Runs the pipeline on one dataset and writes the results.
+
+    This runs in the worker processes of HDFBatchProcessor.go().
+
+    Parameters
+    ----------
+    pipeline     : list of Processors
+    currDataset  : DatasetID
+    df           : DataFrame
+        The dataset's data.
+    outputFile   : Path
+        The name of the output files without their suffix.
+    outputFormat : str
+        'csv', 'parquet', 'feather' or 'hdf'.
+
+    Returns
+    -------
+    df : DataFrame or None
+        The processed data if the format is 'hdf', in which case nothing is
+        written because the results go into a single datastore.
+
+    """
+    df = _runPipeline(pipeline, df)
+    if outputFormat == 'hdf':
+        return df
+
+    # Build the directory structure; other processes may be creating it
+    # at the same time.
+    outputFile.parent.mkdir(parents=True, exist_ok=True)
 
-            outputFileString = str(outputFile) + '.csv'
+    # Output the results to a file.
+    # This will overwrite any existing files.
+    ids = dict(currDataset._asdict())
+    _writeOutput(df, str(outputFile), outputFormat, sep=',', metadata=ids)
 
-            # Output the results to a file.
-            # This will overwrite any existing files (mode = 'w').
-            df.to_csv(outputFileString,
-                      sep=',',
-                      mode='w',
-                      index=False)
+    # CSV files cannot hold metadata, so write the datastore atomic IDs to
+    # the same folder
+    if outputFormat == 'csv':
+        idFilename = str(outputFile) + '.json'
+        _writeAtomicIDs(idFilename, currDataset)
+
+
+def _runPipeline(pipeline, df):
+    """Runs each processor of a pipeline on a DataFrame.
+
+    Parameters
+    ----------
+    pipeline : list of Processors
+    df       : DataFrame
+
+    Returns
+    -------
+    df : DataFrame
+        The processed DataFrame.
+
+    """
+    for proc in pipeline:
+        df = proc(df)
+
+    return df
+
+
+def _writeOutput(df, outputFile, outputFormat, sep=',', metadata=None):
+    """Writes a processed DataFrame to a file.
+
+    Parameters
+    ----------
+    df           : DataFrame
+    outputFile   : str
+        The name of the output file without its suffix.
+    outputFormat : str
+        'csv', 'parquet' or 'feather'.
+    sep          : str
+        The delimiter of CSV files.
+    metadata     : dict or None
+        JSON-serializable metadata, such as dataset IDs, that is stored in
+        the schema of parquet and feather files under the key 'bstore'. It
+        is not written to CSV files.
+
+    """
+    if outputFormat == 'csv':
+        df.to_csv(outputFile + '.csv',
+                  sep=sep,
+                  mode='w',
+                  index=False)
+        return
+
+    # pyarrow is only required for the columnar formats
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if metadata is not None:
+        schemaMetadata = dict(table.schema.metadata or {})
+        schemaMetadata[b'bstore'] = json.dumps(metadata).encode('utf-8')
+        table = table.replace_schema_metadata(schemaMetadata)
+
+    if outputFormat == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, outputFile + '.parquet')
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, outputFile + '.feather')
+
+
+def _writeAtomicIDs(filename, dsID):
+    """Writes the atomic ID information to a text file.
+
+    Parameters
+    ----------
+    filename : str
+    dsID     : datasetID
+    """
 
-            # Write the datastore atomic IDs to the same folder
-            idFilename = str(outputFile) + '.json'
-            self._writeAtomicIDs(idFilename, currDataset)
+    with open(filename, 'w') as outfile:
+        json.dump(dsID, outfile)
 
 
 class ProcessedFolderExists(Exception):
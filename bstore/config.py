@@ -75,3 +75,15 @@ __Verbose__ = False
     The location in the HDF file where the HDFDatastore object's state is kept.
 """
 __Persistence_Key__ = '/bstore'
+
+"""__Index_Key__ : str
+    The location in the HDF file of the index tables that hold the IDs of
+    every dataset in the datastore. There is one table per datasetType.
+"""
+__Index_Key__ = '/bstore_index'
+
+"""__Sources_Key__ : str
+    The location in the HDF file of the table recording the paths, sizes and
+    modification times of the files that datasets were read from.
+"""
+__Sources_Key__ = '/bstore_sources'
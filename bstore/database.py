@@ -7,16 +7,21 @@ from abc import ABCMeta, abstractmethod, abstractproperty
 import numpy as np
 import h5py
 import bstore.config as config
+import bstore._utils as _utils
 import sys
 import pprint
 import re
 import pandas as pd
 from dateutil.parser import parse
+from datetime import datetime
 import importlib
 from collections import namedtuple, OrderedDict
 import traceback
 import pickle
+import json
 import filelock
+import time
+from contextlib import contextmanager
 
 __version__ = config.__bstore_Version__
 
@@ -52,6 +57,10 @@ def hdfLockCheck(writeFunc):
         self : HDFDatastore instance
 
         """
+        if self.readOnly:
+            raise FileIsReadOnly('Error: This Datastore was opened in '
+                                 'read-only mode.')
+
         if not self._lock.is_locked:
             raise FileNotLocked('Error: File is not locked for writing. Use '
                                 'this Datastore inside a with...as block.')
@@ -130,8 +139,14 @@ class Dataset(metaclass=ABCMeta):
     datasetIDs : dict
         The ID fields and their values that identify the datset inside the
         datastore.
+    HANDLETYPE : str or None
+        The kind of open file handle that the get() and put() methods accept
+        in place of the datastore's file name, i.e. 'h5py' for h5py.File or
+        'pandas' for pandas.HDFStore. If None, they always receive the file
+        name and open the file themselves.
 
     """
+    HANDLETYPE = None
 
     def __init__(self, datasetIDs={}):
         self._data = None
@@ -210,6 +225,66 @@ replicateID = (optional) Integer specifying a replicate expierment.
 """
 _optionalIDs = ('channelID', 'dateID', 'posID', 'sliceID', 'replicateID')
 
+DatasetTypeInfo = namedtuple('DatasetTypeInfo', ('cls attributeOf handleType '
+                                                 'internalType'))
+"""Class and metadata of a DatasetType, as returned by datasetTypeInfo()
+
+cls          = The class of the DatasetType.
+attributeOf  = The DatasetType that this type describes, or None.
+handleType   = The HANDLETYPE of the class; see Dataset.
+internalType = The INTERNALTYPE of the class if it has one, e.g. DataFrame.
+
+"""
+
+_datasetTypeRegistry = {}
+"""Cache of DatasetTypeInfo for every DatasetType looked up so far.
+
+"""
+
+_indexDtype = np.dtype([('prefix',      h5py.special_dtype(vlen=str)),
+                        ('acqID',       h5py.special_dtype(vlen=str)),
+                        ('channelID',   h5py.special_dtype(vlen=str)),
+                        ('dateID',      h5py.special_dtype(vlen=str)),
+                        ('posID',       np.int64, (2,)),
+                        ('sliceID',     np.int64),
+                        ('replicateID', np.int64)])
+"""Row layout of the index tables kept by the HDFDatastore.
+
+One table exists per datasetType. Missing string IDs are stored as 'None',
+like the attributes written by _writeDatasetIDs(), and missing integer IDs are
+stored as -1. A one-tuple posID is padded with -1.
+
+"""
+
+_sourceDtype = np.dtype([('datasetType', h5py.special_dtype(vlen=str)),
+                         ('path',        h5py.special_dtype(vlen=str)),
+                         ('size',        np.int64),
+                         ('mtime',       np.float64)])
+"""Row layout of the table of files that datasets were read from.
+
+"""
+
+_keyPattern = re.compile(r'(?P<datasetType>[^_]+)'
+                         r'(?:_Channel(?P<channelID>[^_]+))?'
+                         r'(?:_Pos(?:_(?P<posX>\d+)_(?P<posY>\d+)|'
+                         r'(?P<pos>\d+)))?'
+                         r'(?:_Slice(?P<sliceID>\d+))?'
+                         r'(?:_Date(?P<dateID>\d{8}))?'
+                         r'(?:_Replicate(?P<replicateID>\d+))?')
+"""Pattern matching the last part of the keys written by encodeKey().
+
+"""
+
+_channelPattern   = re.compile(r'Channel(.*)')
+_positionPattern  = re.compile(r'Pos\_\d{1,3}\_\d{1,3}|Pos\d{1,}')
+_slicePattern     = re.compile(r'Slice\d+')
+_datePattern      = re.compile(r'Date\d+')
+_replicatePattern = re.compile(r'Replicate\d+')
+_digitsPattern    = re.compile(r'\d+')
+"""Patterns for keys that do not match _keyPattern; see _decodeKeyLoose().
+
+"""
+
 
 class HDFDatastore(Datastore):
     """A HDFDatastore structure for managing SMLM data.
@@ -223,6 +298,17 @@ class HDFDatastore(Datastore):
         information is used to write attributes to the widefield image for
         opening with other software libraries, such as the HDF5 Plugin for
         ImageJ and FIJI. Setting it will override all metadata information.
+    storageOptions       : dict of dict or None
+        Default keyword arguments for the put() method of each DatasetType,
+        such as the compression of Localizations. Keys are the names of
+        DatasetTypes. Keyword arguments passed to put() take precedence.
+    readOnly             : bool
+        Open the datastore for reading only? Read-only datastores do not
+        lock the file, so any number of them may read from a datastore while
+        another process writes to it.
+    timeout              : float
+        The time in seconds to wait for another process to close the HDF
+        file before raising an error.
 
     Attributes
     ----------
@@ -230,6 +316,13 @@ class HDFDatastore(Datastore):
         The x- and y-size of a widefield pixel in microns. This
         informationis used to write attributes to the widefield image for
         opening with other software libraries.
+    storageOptions       : dict of dict
+        Default keyword arguments for the put() method of each DatasetType.
+    readOnly             : bool
+        Is the datastore open for reading only?
+    timeout              : float
+        The time in seconds to wait for another process to close the HDF
+        file before raising an error.
 
     Notes
     -----
@@ -241,20 +334,49 @@ class HDFDatastore(Datastore):
     which is required for opening images directly from the HDF file by the
     HDF5 Plugin for ImageJ and FIJI[1]_.
 
+    One process may write to a datastore while others read from it in
+    read-only mode. HDF5 does not allow other processes to open a file
+    while it is open for writing, and its single-writer/multiple-reader mode
+    does not allow new groups to be created, which every put() does.
+    Instead, the writer closes the file after each put(), putMany(), or
+    batch of a build, and the readers close the file after each call, even
+    inside a with...as block. Processes that find
+    the file open by another wait for up to `timeout` seconds. Readers see
+    only the datasets in the index, which is written after the datasets'
+    data, so they never read a partially written dataset.
+
     References
     ----------
     .. [1] http://lmb.informatik.uni-freiburg.de/resources/opensource/imagej_plugins/hdf5.html
 
     """
 
-    def __init__(self, dsName, widefieldPixelSize=None):
+    def __init__(self, dsName, widefieldPixelSize=None, storageOptions=None,
+                 readOnly=False, timeout=10.0):
         self.widefieldPixelSize = widefieldPixelSize
+        self.storageOptions = storageOptions if storageOptions else {}
+        self.readOnly = readOnly
+        self.timeout = timeout
         super(HDFDatastore, self).__init__(dsName)
 
-        self._datasets = []
+        # The IDs of the datasets in the file; read from the index tables
+        # the first time that they are needed.
+        self._idCache = None
+
+        # The keys and datasetTypes of the datasets in the file, built from
+        # the IDs, and whether the file's index lists every dataset
+        self._keyCache = None
+        self._keyIndexed = False
+
+        # The datasetTypes that have a table in the file's index
+        self._typeCache = None
 
-        # Used to store a persistent copy of an HDFDatastore instance
-        # in the HDF file
+        # Open file handles, keyed by handle type, that are reused inside a
+        # with...as block; None outside of it.
+        self._handles = None
+
+        # Location of the pickled HDFDatastore instance in the files written
+        # by older versions of B-Store
         self._persistenceKey = config.__Persistence_Key__
         
         # Read the persistence data from the HDF file
@@ -266,16 +388,29 @@ class HDFDatastore(Datastore):
     def __enter__(self):
         """For context managers; updates self._datasets then locks HDF file.
 
+        Files that are opened inside the with...as block are kept open and
+        reused until the block is exited. Read-only datastores do not lock
+        the file and do not keep it open between calls, so that they do not
+        keep a writer in another process from opening it.
+
         """
         self._loads()
-        self._lock.acquire(timeout=0)  # timeout = 0 -> try acquire only once
+        if not self.readOnly:
+            # timeout = 0 -> try acquire only once
+            self._lock.acquire(timeout=0)
+            self._handles = {}
         return self
 
     def __exit__(self, *args):
-        """Releases the lock on the file.
+        """Closes the open file handles and releases the lock on the file.
 
         """
-        self._lock.release()
+        try:
+            self._closeHandles()
+        finally:
+            self._handles = None
+            if not self.readOnly:
+                self._lock.release()
 
     def __getitem__(self, key):
         return self._datasets[key]
@@ -283,18 +418,34 @@ class HDFDatastore(Datastore):
     def __getstate__(self):
         """Returns the properties of the HDFDatastore to pickle.
 
-        This returns the attributes of the HDFDatastore that should be saved
-        in the persistent state inside the HDF file. Without this function,
-        pickle would try to pickle the FileLock object, which would raise an
-        exception.
+        Without this function, pickle would try to pickle the FileLock object,
+        which would raise an exception.
 
         For this reason, '_lock' is not returned as part of the class's state.
-        '_dsName' is not returned because it's a property of the file, not the
-        class.
+        Open file handles in '_handles' cannot be pickled either. '_dsName' is
+        not returned because it's a property of the file, not the class.
 
         """
         return {k: v for k, v in self.__dict__.items()
-                if (k != '_lock') and (k != '_dsName')}
+                if k not in ('_lock', '_handles', '_dsName')}
+
+    def __setstate__(self, state):
+        """Restores the properties of a pickled HDFDatastore.
+
+        Older versions of B-Store kept their dataset IDs in a list named
+        '_datasets'. It is used as the cache of IDs so that these pickles
+        may still be read.
+
+        """
+        state = dict(state)
+        if '_datasets' in state:
+            state['_idCache'] = state.pop('_datasets')
+
+        self._handles = None
+        self._keyCache = None
+        self._keyIndexed = False
+        self._typeCache = None
+        self.__dict__.update(state)
 
     def __iter__(self):
         return (x for x in self._datasets)
@@ -317,9 +468,59 @@ class HDFDatastore(Datastore):
     def attrPrefix(self):
         return config.__HDF_AtomID_Prefix__
 
+    @property
+    def _datasets(self):
+        """The IDs of all the datasets in the datastore.
+
+        The IDs are read from the file on first access and cached until the
+        next time that the datastore is entered in a with...as block.
+
+        """
+        if self._idCache is None:
+            self._idCache = self._loadDatasetIDs()
+
+        return self._idCache
+
+    @property
+    def _keys(self):
+        """The keys and datasetTypes of all the datasets in the datastore.
+
+        This is a set of tuples of (key, datasetType) that is built from the
+        IDs in _datasets and cached with them.
+
+        """
+        if self._keyCache is None:
+            self._keyCache = set(self._keyOf(ids) for ids in self._datasets)
+
+        return self._keyCache
+
+    @property
+    def _indexedTypes(self):
+        """The datasetTypes that have a table in the index of the file.
+
+        The set of keys is complete only for these types; see
+        _checkKeyExistence(). The set is read from the file on first access
+        and cached with the IDs.
+
+        """
+        if self._typeCache is None:
+            try:
+                with self._handle('h5py') as file:
+                    indexKey = config.__Index_Key__
+                    self._typeCache = set(file[indexKey].keys()) \
+                        if indexKey in file else set()
+            except OSError:
+                if not self._isMissing():
+                    raise
+                # File doesn't exist
+                self._typeCache = set()
+
+        return self._typeCache
+
     @hdfLockCheck
     def build(self, parser, searchDirectory, filenameStrings, readers={},
-              dryRun=False, **kwargs):
+              dryRun=False, batchSize=100, workers=None, incremental=False,
+              **kwargs):
         """Builds a datastore by traversing a directory for experimental files.
 
         Parameters
@@ -341,6 +542,21 @@ class HDFDatastore(Datastore):
             defined in each DatasetType.
         dryRun               : bool
             Test the datastore build without actually creating the datastore.
+        batchSize            : int
+            The number of parsed files that are held in memory and written
+            together to the datastore with putMany().
+        workers              : int or None
+            The number of processes that parse and read the files. The
+            datasets are sent back to this process, which is the only one
+            that writes to the datastore. If None, the files are parsed in
+            this process. The parser, the readers and the parsed datasets
+            must be picklable to use more than one process.
+        incremental          : bool
+            If True, files that were already put into the datastore are
+            skipped before they are read, unless their size or modification
+            time have changed since. This allows an interrupted build to be
+            resumed. Changed files are reported but not written because their
+            datasets already exist.
         **kwargs
             Keyword arguments to pass to the parser's readFromFile() method.
 
@@ -359,33 +575,43 @@ class HDFDatastore(Datastore):
         # Sorting them like this prevents errors that would occur when writing
         # attributes to non-existent keys in the HDF file.
         files = self._buildFileList(searchDirectory, filenameStrings)
+        if incremental:
+            files = self._removeIngestedFiles(files)
 
         # Keep a running record of what datasets were succesffully parsed
         datasets = []
 
+        # Parsed datasets waiting to be written to the datastore
+        batch = []
+
+        def writeBatch():
+            if dryRun:
+                datasets.extend(self._unpackDatasetIDs(ds) for ds, _ in batch)
+            elif batch:
+                datasets.extend(self.putMany(
+                    [ds for ds, _ in batch], raiseErrors=False,
+                    sourceFiles=[currFile for _, currFile in batch]))
+            batch.clear()
+
         # files is an OrderedDict. Non-attributes are built before attributes.
-        for currType in files.keys():
-            # Extract the reader object for the currType if specified
-            reader = readers.get(currType)
-            
-            # files[currType] returns a list of string
-            for currFile in files[currType]:
-                try:
-                    parser.parseFilename(
-                        currFile, datasetType=currType, reader=reader,
-                        **kwargs)
+        # The parsed datasets arrive in the same order.
+        parsed = self._parseFiles(parser, files, readers, workers, **kwargs)
+        for dataset, currFile in parsed:
+            # Write all datasets of one type before the next type
+            if batch and batch[-1][0].datasetType != dataset.datasetType:
+                writeBatch()
 
-                    if not dryRun:
-                        self.put(parser.dataset)
+            try:
+                # Raises an error on bad IDs before the data is written
+                self._unpackDatasetIDs(dataset)
+                batch.append((dataset, currFile))
+            except Exception as err:
+                self._printError(err, 'build')
 
-                    datasets.append(self._unpackDatasetIDs(parser.dataset))
-                except Exception as err:
-                    print(("Unexpected error in build():"),
-                          sys.exc_info()[0])
-                    print(err)
+            if len(batch) >= batchSize:
+                writeBatch()
 
-                    if config.__Verbose__:
-                        print(traceback.format_exc())
+        writeBatch()
 
         # Report on all the datasets that were parsed
         buildResults = self._sortDatasets(datasets)
@@ -436,13 +662,8 @@ class HDFDatastore(Datastore):
                     '**/*{:s}'.format(fileID)))
 
         def sortKey(x):
-            # Create instances of datasetType to place attribute types
-            # after non-attributes
-            dsTypeString = x[0]
-            mod = importlib.import_module('bstore.datasetTypes.{0:s}'.format(
-                dsTypeString))
-            ds = getattr(mod, dsTypeString)()  # Note () for instantiation
-            if ds.attributeOf:
+            # Place attribute types after non-attributes
+            if datasetTypeInfo(x[0]).attributeOf:
                 return 1
             else:
                 return 0
@@ -450,6 +671,45 @@ class HDFDatastore(Datastore):
         files = OrderedDict(sorted(files.items(), key=sortKey))
         return files
 
+    def _buildIndex(self, hdf):
+        """(Re)builds the ID index tables by walking the whole HDF file.
+
+        Every type that is registered or that has datasets in the file is
+        indexed, so that the index does not depend on the types that the
+        indexing session registered. An empty table is written for each
+        registered type that has no datasets so that query() can tell it
+        apart from types that were not registered when the index was built.
+        Types in the file whose class cannot be found are not indexed, and
+        the index is marked as partial; see _loads().
+
+        Parameters
+        ----------
+        hdf : h5py.File
+            The datastore file, opened for writing.
+
+        """
+        indexKey = config.__Index_Key__
+        if indexKey in hdf:
+            del(hdf[indexKey])
+
+        # A type may be registered more than once
+        datasetTypes = OrderedDict.fromkeys(config.__Registered_DatasetTypes__)
+        datasetTypes.update(OrderedDict.fromkeys(self._findDatasetTypes(hdf)))
+
+        partial = False
+        for datasetType in datasetTypes:
+            try:
+                dsIDs = self._scanDatasets(hdf, datasetType)
+            except DatasetTypeError:
+                partial = True
+                continue
+
+            rows = self._packIndexRows(dsIDs)
+            hdf.create_dataset('{0:s}/{1:s}'.format(indexKey, datasetType),
+                               data=rows, maxshape=(None,), chunks=True)
+
+        hdf.require_group(indexKey).attrs['partial'] = partial
+
     def _checkForRegisteredTypes(self, typeList):
         """Verifies that each type in typeList is registered.
 
@@ -462,7 +722,7 @@ class HDFDatastore(Datastore):
             if typeName not in config.__Registered_DatasetTypes__:
                 raise DatasetTypeError(typeName)
 
-    def _checkKeyExistence(self, ds, raiseException=True):
+    def _checkKeyExistence(self, ds, raiseException=True, hdf=None):
         """Checks for the existence of a key.
 
         This is required for checking whether attributes are attached to a
@@ -470,12 +730,22 @@ class HDFDatastore(Datastore):
         have B-Store attributes. In this case, a key *would not* exist for the
         Dataset's attributes.
 
+        The key is first looked up in the set of keys of the indexed
+        datasets, which requires no file access. This set is complete for
+        the types that have an index table while the file is locked for
+        writing; otherwise, keys that are not in the set are looked for in
+        the file because another process may have written them since the
+        set was loaded, or because their type was not indexed.
+
         Parameters
         ----------
         ds             : Dataset
         raiseException : bool
             Should the function raise an exception or only return a bool
             that is True if the key exists?
+        hdf            : h5py.File, pandas.HDFStore, or None
+            An already opened datastore file. If None, the file is opened by
+            this function.
 
         Returns
         -------
@@ -487,55 +757,189 @@ class HDFDatastore(Datastore):
 
         """
         key, ids = self._genKey(ds)
-        keyExists = False
 
-        # If Datastore file doesn't exist, return without checking
-        try:
-            with h5py.File(self._dsName, mode='r') as dbFile:
-                # First check atoms that are not attributes
-                if key in dbFile and ds.attributeOf is None:
-                    raise HDF5KeyExists(
-                        'Error: {0:s} already exists.'.format(key))
-
-                # Next search for *any* occurence of the attribute flag
-                # in the attribute names of dataset that key points to.
-                elif key in dbFile and ds.attributeOf is not None:
-                    attrID = config.__HDF_Metadata_Prefix__
-                    mdKeys = dbFile[key].attrs.keys()
-                    for currKey in mdKeys:
-                        if attrID in currKey:
-                            raise HDF5KeyExists(
-                                'Error: {0:s} already exists.'.format(key))
-
-        except IOError:
-            # File doesn't exist
-            keyExists = False
-        except HDF5KeyExists:
+        if self._keyIndexed and (key, ids.datasetType) in self._keys:
             keyExists = True
-            if raiseException:
-                raise HDF5KeyExists(
-                    ('Error: Attributes for {0:s} already exist.'.format(key)))
+        elif self._keyIndexed and self._lock.is_locked \
+                and ids.datasetType in self._indexedTypes:
+            keyExists = False
+        else:
+            keyExists = self._findKey(ds, key, hdf)
+
+        if keyExists and raiseException:
+            raise HDF5KeyExists(
+                ('Error: Attributes for {0:s} already exist.'.format(key)))
 
         return keyExists, key, ids
 
-    def _dumps(self):
+    def _closeHandles(self, keep=None):
+        """Closes the file handles that are cached inside a with...as block.
+
+        Parameters
+        ----------
+        keep : str or None
+            The type of handle to leave open, if any.
+
+        """
+        if not self._handles:
+            return
+
+        for handleType in list(self._handles):
+            if handleType != keep:
+                self._handles.pop(handleType).close()
+
+    def _concatData(self, dsIDs, frames):
+        """Concatenates the DataFrames of many datasets for getMany().
+
+        Parameters
+        ----------
+        dsIDs  : list of DatasetID
+        frames : list of DataFrame
+            The data of each dataset in dsIDs.
+
+        Returns
+        -------
+        df : DataFrame
+            The rows of all the frames. The outer levels of the index are the
+            ID fields of each row's dataset; the innermost level is the
+            row's index in its own frame.
+
+        """
+        if not all(isinstance(frame, pd.DataFrame) for frame in frames):
+            raise TypeError('Only datasets whose data are DataFrames may be '
+                            'concatenated.')
+
+        fields = [field for field in DatasetID._fields
+                  if field not in ('datasetType', 'attributeOf')]
+        lengths = [len(frame) for frame in frames]
+
+        # Object arrays keep tuples such as posID from being split into
+        # separate elements by NumPy.
+        levels = []
+        for field in fields:
+            values = np.empty(len(dsIDs), dtype=object)
+            for index, dsID in enumerate(dsIDs):
+                values[index] = getattr(dsID, field)
+            levels.append(pd.Series(np.repeat(values, lengths)))
+
+        if frames:
+            df = pd.concat(frames)
+            rowIndex = df.index
+        else:
+            df, rowIndex = pd.DataFrame(), pd.Index([])
+
+        df.index = pd.MultiIndex.from_arrays(
+            levels + [rowIndex], names=fields + [rowIndex.name])
+        return df
+
+    def _dumps(self, hdf=None):
         """Writes the state of the HDFDatastore object to the HDF file.
 
+        The dataset IDs themselves are kept in the index tables by
+        _updateIndex(); this writes the remaining state as attributes of the
+        index and removes the pickled state left by older versions of B-Store.
+        Nothing is written to files that have not been indexed yet.
+
+        Parameters
+        ----------
+        hdf : h5py.File or None
+            The datastore file, opened for writing. If None, the file is
+            opened and closed by this function.
+
         """
-        with h5py.File(self._dsName, mode='a') as file:
-            try:
-                # Remove the old dataset containing the persistence information
-                del(file[self._persistenceKey])
-            except KeyError:
-                pass  # key doesn't exist yet
-
-            # Pickle this instance and write the byte string to the HDF file
-            # See https://docs.python.org/3/library/pickle.html#data-stream-format
-            # for an explanation of the pickle format levels.
-            # np.void is necessary for writing byte strings, see
-            # http://docs.h5py.org/en/latest/strings.html#how-to-store-raw-binary-data
-            picklestring = pickle.dumps(self, protocol=3)
-            file[self._persistenceKey] = np.void(picklestring)
+        if hdf is None:
+            with self._handle('h5py', mode='a') as file:
+                self._dumps(file)
+            return
+
+        indexKey = config.__Index_Key__
+        if indexKey not in hdf:
+            return
+
+        if self.widefieldPixelSize is not None:
+            hdf[indexKey].attrs['widefieldPixelSize'] = \
+                self.widefieldPixelSize
+
+        if self._persistenceKey in hdf:
+            del(hdf[self._persistenceKey])
+
+    def _findDatasetTypes(self, hdf):
+        """Finds the names of the types of all the datasets in the file.
+
+        Parameters
+        ----------
+        hdf : h5py.File
+            The open datastore file.
+
+        Returns
+        -------
+        datasetTypes : list of str
+            The types in the order in which they are first found, including
+            the types of datasets that are attributes.
+
+        """
+        typeKey = config.__HDF_AtomID_Prefix__ + 'datasetType'
+        attrKey = config.__HDF_Metadata_Prefix__ + typeKey
+        datasetTypes = OrderedDict()
+
+        def find_types(name):
+            """Records the datasetTypes in the attributes of one node."""
+            attrs = hdf[name].attrs
+            if typeKey in attrs:
+                datasetTypes[_toStr(attrs[typeKey])] = None
+            if attrKey in attrs:
+                # Attributes store their type as JSON
+                datasetTypes[json.loads(_toStr(attrs[attrKey]))] = None
+
+        hdf.visit(find_types)
+        return list(datasetTypes)
+
+    def _findKey(self, ds, key, hdf=None):
+        """Looks for the key of a dataset in the datastore file.
+
+        Parameters
+        ----------
+        ds  : Dataset or DatasetID
+        key : str
+            The HDF key pointing to the dataset.
+        hdf : h5py.File, pandas.HDFStore, or None
+            An already opened datastore file. If None, the file is opened by
+            this function.
+
+        Returns
+        -------
+        keyExists : bool
+
+        """
+        try:
+            with self._handle('h5py') if hdf is None else openHandle(hdf) \
+                    as dbFile:
+                # The names of the attributes of the node that key points to,
+                # or None if there is no such node
+                if isinstance(dbFile, pd.HDFStore):
+                    node = dbFile.get_node(key)
+                    mdKeys = None if node is None \
+                        else node._v_attrs._v_attrnamesuser
+                else:
+                    mdKeys = dbFile[key].attrs.keys() if key in dbFile \
+                        else None
+        except OSError:
+            if not self._isMissing():
+                raise
+            # File doesn't exist
+            return False
+
+        if mdKeys is None:
+            return False
+
+        # Atoms that are not attributes exist if the node exists
+        if ds.attributeOf is None:
+            return True
+
+        # Next search for *any* occurence of the attribute flag in the
+        # attribute names of dataset that key points to.
+        attrID = config.__HDF_Metadata_Prefix__
+        return any(attrID in currKey for currKey in mdKeys)
 
     def _genDataset(self, dsID):
         """Generate a Dataset with an empty data attribute from a DatasetID.
@@ -559,11 +963,7 @@ class HDFDatastore(Datastore):
         del(idDict['attributeOf'])
 
         # Build the return dataset
-        mod = importlib.import_module('bstore.datasetTypes.{0:s}'.format(
-            datasetType))
-        dType = getattr(mod, datasetType)
-
-        return dType(datasetIDs=idDict)
+        return datasetTypeInfo(datasetType).cls(datasetIDs=idDict)
 
     def _genDatasetID(self, key):
         """Generates an dataset ID (dsID) from a HDF key. Inverse of _genKey.
@@ -582,62 +982,7 @@ class HDFDatastore(Datastore):
             The ID's of one dataset.
 
         """
-        # Parse key for atomic IDs
-        splitStr = key.split(sep='/')
-        prefix = splitStr[0]
-
-        acqID = int(splitStr[1].split(sep='_')[-1])
-
-        otherIDs = splitStr[2]
-        datasetType = otherIDs.split('_')[0]
-
-        channelRaw = re.search(r'Channel(.*)', otherIDs)
-        if channelRaw is None:
-            channelID = None
-        else:
-            # 'Channel...' will always be the first item in the split, ergo [0]
-            channelID = channelRaw.group(0).split('_')[0]
-            channelID = channelID[len('Channel'):]
-
-        # Obtain the position ID using regular expressions
-        # First, extract strings like 'Pos0' or 'Pos_003_002
-        positionRaw = re.search(r'Pos\_\d{1,3}\_\d{1,3}|Pos\d{1,}', otherIDs)
-        if positionRaw is None:
-            posID = None
-        else:
-            # Next, extract the digits and convert them to a tuple
-            indexes = re.findall(r'\d{1,}', positionRaw.group(0))
-            posID = tuple([int(index) for index in indexes])
-
-        # Obtain the slice ID if it exists
-        sliceRaw = re.search(r'Slice\d+', otherIDs)
-        if sliceRaw is None:
-            sliceID = None
-        else:
-            index = re.findall(r'\d+', sliceRaw.group(0))
-            sliceID = int(index[0])
-            
-        # Obtain dateID if it exists
-        dateRaw = re.search(r'Date\d+', otherIDs)
-        if dateRaw is None:
-            dateID = None
-        else:
-            index = re.findall(r'\d+', dateRaw.group(0))
-            datetimeObject = parse(index[0])
-            dateID = datetimeObject.strftime('%Y-%m-%d')
-        
-        replicateRaw = re.search(r'Replicate\d+', otherIDs)
-        if replicateRaw is None:
-            replicateID = None
-        else:
-            index = re.findall(r'\d+', replicateRaw.group(0))
-            replicateID = int(index[0])
-
-        # Build the return dataset
-        returnDS = DatasetID(prefix, acqID, datasetType, None,
-                             channelID, dateID, posID, sliceID,
-                             replicateID)
-        return returnDS
+        return decodeKey(key)
 
     def _genKey(self, ds):
         """Generate a key name for a dataset. The inverse of _genDatasetID.
@@ -659,39 +1004,19 @@ class HDFDatastore(Datastore):
         else:
             ids = ds
 
-        acqKey = '/'.join([ids.prefix, ids.prefix]) + \
-                 '_' + str(ids.acqID)
-
-        otherIDs = ''
-        if ids.channelID is not None:
-            otherIDs += '_Channel' + ids.channelID
-        if ids.posID is not None:
-            if len(ids.posID) == 1:
-                posID = ids.posID[0]
-                otherIDs += '_Pos{:d}'.format(posID)
-            else:
-                otherIDs += '_Pos_{0:0>3d}_{1:0>3d}'.format(ids.posID[0],
-                                                            ids.posID[1])
-        if ids.sliceID is not None:
-            otherIDs += '_Slice{:d}'.format(ids.sliceID)
-        if ids.dateID is not None:
-            # hyphens not allowed in names for PyTables
-            otherIDs += '_Date{:s}'.format(ids.dateID.replace('-', ''))
-        if ids.replicateID is not None:
-            otherIDs += '_Replicate{:d}'.format(ids.replicateID)
-
         # If an attribute, use the name of the DatasetType that this type is
         # an attribute of.
-        if ids.attributeOf:
-            key = acqKey + '/' + ds.attributeOf + otherIDs
-        else:
-            key = acqKey + '/' + ds.datasetType + otherIDs
+        return encodeKey(ids, ids.attributeOf or ids.datasetType), ids
 
-        return key, ids
-
-    def get(self, dsID):
+    def get(self, dsID, **kwargs):
         """Returns a Dataset from the datastore.
 
+        Keyword arguments are passed to the get() method of the dataset's
+        DatasetType. For example, Localizations accept the `where` and
+        `columns` arguments to read only some rows and columns of the table:
+
+        >>> ds.get(dsID, where='frame > 100', columns=['x', 'y'])
+
         Parameters
         ----------
         dsID : DatasetID
@@ -706,191 +1031,958 @@ class HDFDatastore(Datastore):
         self._checkForRegisteredTypes(config.__Registered_DatasetTypes__)
         #assert dsID.datasetType in config.__Registered_DatasetTypes__
 
-        # Ensure that the key exists
-        keyExists, hdfKey, _ = self._checkKeyExistence(
-            dsID, raiseException=False)
-
-        if not keyExists:
-            raise HDF5KeyDoesNotExist(
-                'Dataset does not exist: ' + dsID.__repr__())
-
-        # Generate the dataset and retrieve the data
         dataset = self._genDataset(dsID)
-        dataset.data = dataset.get(self._dsName, hdfKey)
+        self._readDataset(dsID, dataset, **kwargs)
 
         return dataset
 
-    def _loads(self):
-        """Loads and updates the dataset ID information from the HDF file.
+    def getMany(self, dsIDs, concat=False, **kwargs):
+        """Returns many Datasets from the datastore at once.
 
-        """
-        try:
-            with h5py.File(str(self._dsName), mode='r') as file:
-                serialObject = file[self._persistenceKey]
-                objFromHDF = pickle.loads(serialObject.value)
-                self.__dict__.update(objFromHDF.__dict__)
-        except OSError:
-            # File doesn't exist, so don't try to update
-            pass
-        except:
-            print('Unexpected error when loading the Datastore\'s persistent '
-                  'state:', sys.exc_info()[0])
-            raise
+        The registered types are checked once and the file is opened once for
+        all of the datasets, even outside of a with...as block. Datasets are
+        read in groups of the same handle type so that the open file is
+        switched between h5py and PyTables as few times as possible. Keyword
+        arguments are passed to the get() method of every dataset, so they
+        should be accepted by all of their DatasetTypes:
 
-    @hdfLockCheck
-    def put(self, dataset, **kwargs):
-        """Writes data from a single dataset into the datastore.
+        >>> locs = ds.getMany(ds.query('Localizations'), columns=['x', 'y'])
 
         Parameters
         ----------
-        dataset : Dataset
+        dsIDs  : list of DatasetID
+            Namedtuples belonging to the HDFDatastore class.
+        concat : bool
+            If True, the data of the datasets, which must all be DataFrames
+            such as Localizations, are concatenated into one DataFrame. The
+            ID fields of each dataset become the outer levels of its index.
+
+        Returns
+        -------
+        datasets : list of Dataset or DataFrame
+            The complete datasets in the same order as dsIDs, or their
+            concatenated data if concat is True.
 
         """
-        assert dataset.datasetType in config.__Registered_DatasetTypes__,\
-            'Type {0} is unregistered.'.format(dataset.datasetType)
-        if dataset.attributeOf:
-            assert dataset.attributeOf in config.__Registered_DatasetTypes__,\
-                'Type {0} is unregistered.'.format(dataset.attributeOf)
+        self._checkForRegisteredTypes(config.__Registered_DatasetTypes__)
 
-        # Key generation automatically handles datasets that are attributes
-        _, key, ids = self._checkKeyExistence(dataset)
+        datasets = [self._genDataset(dsID) for dsID in dsIDs]
+        order = sorted(range(len(datasets)),
+                       key=lambda i: datasets[i].HANDLETYPE or '')
 
-        dataset.put(self._dsName, key, **kwargs)
-        self._datasets.append(ids)
+        inSession = self._handles is not None
+        if not inSession:
+            self._handles = {}
+        try:
+            for index in order:
+                self._readDataset(dsIDs[index], datasets[index], **kwargs)
+        finally:
+            if not inSession:
+                self._closeHandles()
+                self._handles = None
 
-        # Don't write IDs for attributes
-        if not dataset.attributeOf:
-            self._writeDatasetIDs(dataset, key=key, ids=ids)
+        if concat:
+            return self._concatData(dsIDs, [ds.data for ds in datasets])
 
-        # Dump the serialized bytestring of the class to the HDF file
-        self._dumps()
+        return datasets
 
-    def query(self, datasetType='Localizations'):
-        """Returns a list of datasets inside this datastore.
+    @contextmanager
+    def _handle(self, handleType='h5py', mode='r'):
+        """Provides an open handle to the datastore file.
+
+        Inside a with...as block, the handle is opened in append mode the
+        first time it is needed and is kept open for the rest of the block.
+        Because h5py and PyTables do not share open files, cached handles of
+        the other type are closed first. Outside of a with...as block, the
+        file is opened with the given mode and closed afterwards. Reading
+        from a file that does not exist raises an OSError in both cases.
 
         Parameters
         ----------
-        datasetType     : str
-            The type of data to search for..
-
-        Returns
-        -------
-        dsIDs   : list of Dataset
-            All of the dataset ids matching the datasetType
+        handleType : str or None
+            'h5py' for a h5py.File or 'pandas' for a pandas.HDFStore. If None,
+            the cached handles are closed and the name of the file is
+            provided instead, e.g. for DatasetTypes that open the file
+            themselves.
+        mode       : str
+            The mode in which to open the file outside of a with...as block.
+
+        Yields
+        ------
+        hdf : h5py.File, pandas.HDFStore, or str
 
         """
-        self._checkForRegisteredTypes([datasetType])
-        searchString = datasetType
-        ap = config.__HDF_AtomID_Prefix__
-        mp = config.__HDF_Metadata_Prefix__
-        mod = importlib.import_module('bstore.datasetTypes.{0:s}'.format(
-            datasetType))
-        tempDS = getattr(mod, datasetType)()
-
-        # Open the hdf file
-        with h5py.File(self._dsName, 'r') as f:
-            # Extract all localization datasets from the HDF5 file by matching
-            # each group to the search string.
-            # ('table' not in name) excludes the subgroup inside every
-            # processed_localization parent group.
-            resultGroups = []
-
-            def find_datasets(name):
-                """Finds datasets matching the name pattern."""
-                # Finds only datasets with the SMLM_datasetType attribute.
-                if (ap +
-                    'datasetType' in f[name].attrs) and (f[name].attrs[ap +
-                                                                       'datasetType'] == searchString):
-                    resultGroups.append(name)
-
-                # Read datasets that are attributes here.
-                if (ap + 'datasetType' in f[name].attrs) \
-                        and (tempDS.attributeOf is not None) \
-                        and (f[name].attrs[ap + 'datasetType']
-                             == tempDS.attributeOf) \
-                        and (mp + ap + 'datasetType') in f[name].attrs:
-                    resultGroups.append(name)
-
-            f.visit(find_datasets)
+        if handleType is None:
+            self._closeHandles()
+            yield str(self._dsName)
+        elif self._handles is not None and \
+                (mode != 'r' or Path(self._dsName).exists()):
+            yield self._sessionHandle(handleType)
+        else:
+            mode = 'r' if self.readOnly else mode
+            with openHandle(self._dsName, handleType, mode,
+                            timeout=self.timeout) as hdf:
+                yield hdf
 
-        # Read attributes of each key in resultGroups for SMLM_*
-        # and convert them to a dataset ID.
-        # Note: If you use Path and Not PurePosixPath, '/' will
-        # become '\\' on Windows and you won't get the right keys.
-        resultKeys = list(map(PurePosixPath, resultGroups))
-        dsIDs = [self._genDatasetID(str(key)) for key in resultKeys]
+    def _isIndexed(self, hdf):
+        """Does the index of the file list every dataset in it?
 
-        # Convert datasetType for the attributes special case
-        if tempDS.attributeOf:
-            for (index, atom) in enumerate(dsIDs):
-                # Can't set atom attributes directly, so make new ones
-                dsIDs[index] = DatasetID(
-                    atom.prefix,
-                    atom.acqID,
-                    tempDS.datasetType,
-                    tempDS.attributeOf,
-                    atom.channelID,
-                    atom.dateID,
-                    atom.posID,
-                    atom.sliceID,
-                    atom.replicateID)
+        Parameters
+        ----------
+        hdf : h5py.File
+            The open datastore file.
 
-        return dsIDs
+        Returns
+        -------
+        indexed : bool
 
-    def _sortDatasets(self, dsInfo):
-        """Sorts and organizes all datasets before a Datastore build.
+        """
+        indexKey = config.__Index_Key__
+        return indexKey in hdf \
+            and not hdf[indexKey].attrs.get('partial', False)
 
-        _sortDatasets() accepts a list of dicts containing dataset
-        information. It then sorts and organizes the information in a
-        human-readable format, allowing both humans and computers to
-        locate possible errors before and after the datastore is built.
+    def _isMissing(self):
+        """Is the datastore file missing?
 
-        Parameters
-        ----------
-        dsInfo : list of dict
-            Each element of dsInfo is a dictionary containing the IDs
-            for a particular dataset.
+        Reads of a file that does not exist yet return an empty datastore.
+        Every other OSError, such as a file that another process keeps open
+        for longer than the timeout, is raised instead.
 
         Returns
         -------
-        df     : DataFrame
+        missing : bool
 
         """
-        # If any datasets at all were correctly parsed, then dsInfo
-        # will not be empty.
-        if dsInfo:
-            # Build the DataFrame with indexes prefix and acqID. These are
-            # the primary identifiers for a dataset and are always required;
-            df = pd.DataFrame(dsInfo)
+        return not Path(self._dsName).exists()
 
-            # Prevents an error comparing acqID's of different types.
-            df['acqID'] = df['acqID'].astype(str)
+    def iterChunks(self, dsID, chunksize=100000, **kwargs):
+        """Iterates over the data of a dataset in chunks of rows.
 
-            df.set_index(['prefix', 'acqID'])
-            df.sort_index(inplace=True)
+        Only the current chunk is held in memory, so datasets that are larger
+        than the available memory may be processed one chunk at a time.
+        Processors that act on each row independently of the others, such as
+        Filter, ConvertHeader, AddColumn and CleanUp, may be applied to every
+        chunk:
 
-            return df
-        else:
-            return None
+        >>> for chunk in ds.iterChunks(dsID, chunksize=500000):
+        ...     chunk = cleanup(filter(chunk))
 
-    def _unpackDatasetIDs(self, ds):
-        """Unpack the dataset IDs into a format usable by this datastore.
+        Processors that reset the index do so separately for each chunk.
+        Inside a with...as block, the iterator reads from the datastore's
+        cached file handle, so it should be exhausted before datasets of
+        other types are read from or put into the datastore.
 
         Parameters
         ----------
-        ds  : Dataset
+        dsID      : DatasetID
+            A namedtuple belonging to the HDFDatastore class.
+        chunksize : int
+            The number of rows in each chunk.
+
+        Other keyword arguments are passed to the iterChunks() method of the
+        dataset's DatasetType, e.g. `columns` and `where` for Localizations.
 
         Returns
         -------
-        ids : DatasetID
-            The ids for the dataset; a namedtuple of the HDFDatastore class.
+        chunks : iterator of DataFrame
+            An iterator over the chunks of the dataset's data.
 
         """
-        idDict = ds.datasetIDs.copy()
+        self._checkForRegisteredTypes(config.__Registered_DatasetTypes__)
 
-        # Preconditioning of the IDs
-        # Require prefix and acqID to be specified
-        if ('prefix' not in idDict) | ('acqID' not in idDict):
+        keyExists, hdfKey, _ = self._checkKeyExistence(
+            dsID, raiseException=False)
+        if not keyExists:
+            raise HDF5KeyDoesNotExist(
+                'Dataset does not exist: ' + dsID.__repr__())
+
+        dataset = self._genDataset(dsID)
+        if not hasattr(dataset, 'iterChunks'):
+            raise DatasetTypeError(
+                '{:s} datasets cannot be read in chunks.'.format(
+                    dsID.datasetType))
+
+        # Outside of a with...as block, the iterator opens the file itself so
+        # that it remains open until the last chunk has been read.
+        if self._handles is not None and dataset.HANDLETYPE is not None:
+            source = self._sessionHandle(dataset.HANDLETYPE)
+        else:
+            self._closeHandles()
+            source = str(self._dsName)
+
+        return dataset.iterChunks(source, hdfKey, chunksize=chunksize,
+                                  **kwargs)
+
+    def _keyOf(self, ids):
+        """Returns the entry of a dataset in the set of keys; see _keys.
+
+        Parameters
+        ----------
+        ids : DatasetID
+
+        Returns
+        -------
+        : tuple of (str, str)
+            The HDF key and the datasetType of the dataset.
+
+        """
+        return (encodeKey(ids, ids.attributeOf or ids.datasetType),
+                ids.datasetType)
+
+    def _loadDatasetIDs(self):
+        """Reads the IDs of every dataset from the index tables.
+
+        Returns
+        -------
+        dsIDs : list of DatasetID
+
+        """
+        try:
+            with self._handle('h5py') as file:
+                indexKey = config.__Index_Key__
+                if indexKey not in file:
+                    return []
+
+                dsIDs = []
+                for datasetType in file[indexKey].keys():
+                    dsIDs.extend(self._readIndex(file, datasetType))
+        except OSError:
+            if not self._isMissing():
+                raise
+            # File doesn't exist
+            return []
+
+        return dsIDs
+
+    def _loads(self):
+        """Loads and updates the persistent state from the HDF file.
+
+        The dataset IDs are not read here. Instead, they are read from the
+        file the next time they are needed.
+
+        """
+        self._idCache = None
+        self._keyCache = None
+        self._typeCache = None
+
+        # Files that do not exist yet are indexed as soon as they are written
+        self._keyIndexed = True
+        try:
+            with self._handle('h5py') as file:
+                indexKey = config.__Index_Key__
+                if indexKey in file:
+                    attrs = file[indexKey].attrs
+                    if 'widefieldPixelSize' in attrs:
+                        self.widefieldPixelSize = tuple(
+                            float(x) for x in attrs['widefieldPixelSize'])
+
+                    # Datasets of types that could not be indexed are found
+                    # only by searching the file
+                    if attrs.get('partial', False):
+                        self._keyIndexed = False
+
+                elif self._persistenceKey in file:
+                    # Migrate the pickled state of older versions of
+                    # B-Store. The pickle is replaced by the index the next
+                    # time the datastore is written to.
+                    serialObject = file[self._persistenceKey][()]
+                    objFromHDF = pickle.loads(serialObject.tobytes())
+                    self.widefieldPixelSize = objFromHDF.widefieldPixelSize
+                    self._idCache = objFromHDF._idCache
+
+                else:
+                    # Only the groups of the file list its datasets
+                    self._keyIndexed = False
+        except OSError:
+            if not self._isMissing():
+                raise
+            # File doesn't exist, so don't try to update
+            pass
+        except:
+            print('Unexpected error when loading the Datastore\'s persistent '
+                  'state:', sys.exc_info()[0])
+            raise
+
+    def _packIndexRows(self, dsIDs):
+        """Converts DatasetIDs into rows of an index table.
+
+        Parameters
+        ----------
+        dsIDs : list of DatasetID
+
+        Returns
+        -------
+        rows : NumPy structured array
+            The rows to write into the index table; see _indexDtype.
+
+        """
+        rows = np.empty(len(dsIDs), dtype=_indexDtype)
+        for index, ids in enumerate(dsIDs):
+            posID = [] if ids.posID is None else [int(p) for p in ids.posID]
+            posID += [-1] * (2 - len(posID))
+
+            rows[index] = (
+                ids.prefix,
+                str(ids.acqID),
+                'None' if ids.channelID is None else ids.channelID,
+                'None' if ids.dateID is None else ids.dateID,
+                posID,
+                -1 if ids.sliceID is None else ids.sliceID,
+                -1 if ids.replicateID is None else ids.replicateID)
+
+        return rows
+
+    def _parseFiles(self, parser, files, readers, workers=None, **kwargs):
+        """Parses the files of a build into Datasets.
+
+        Files that cannot be parsed are reported and skipped.
+
+        Parameters
+        ----------
+        parser  : Parser
+        files   : OrderedDict of list of str
+            The files to parse; see _buildFileList().
+        readers : dict
+            The Reader objects to use for each DatasetType.
+        workers : int or None
+            The number of processes that parse the files. If None, the files
+            are parsed in this process.
+        **kwargs
+            Keyword arguments to pass to the parser's readFromFile() method.
+
+        Yields
+        ------
+        dataset  : Dataset
+            The parsed datasets, in the same order as the files.
+        currFile : str or Path
+            The file that the dataset was read from.
+
+        """
+        jobs = [(currType, currFile)
+                for currType in files.keys() for currFile in files[currType]]
+
+        if not workers or workers == 1:
+            for currType, currFile in jobs:
+                try:
+                    parser.parseFilename(
+                        currFile, datasetType=currType,
+                        reader=readers.get(currType), **kwargs)
+                except Exception as err:
+                    self._printError(err, 'build')
+                    continue
+
+                yield parser.dataset, currFile
+            return
+
+        # The workers may not inherit the registered types
+        registeredTypes = list(config.__Registered_DatasetTypes__)
+        jobs = ((currFile, (parser, currFile, currType, readers.get(currType),
+                            registeredTypes, kwargs))
+                for currType, currFile in jobs)
+        for currFile, future in _utils.mapBounded(_parseFile, jobs, workers):
+            try:
+                dataset = future.result()
+            except Exception as err:
+                self._printError(err, 'build')
+                continue
+
+            yield dataset, currFile
+
+    def _printError(self, err, funcName):
+        """Reports an error that is skipped over when writing many files.
+
+        Parameters
+        ----------
+        err      : Exception
+        funcName : str
+            The name of the method in which the error occurred.
+
+        """
+        print(("Unexpected error in {0:s}():".format(funcName)),
+              sys.exc_info()[0])
+        print(err)
+
+        if config.__Verbose__:
+            print(traceback.format_exc())
+
+    @hdfLockCheck
+    def put(self, dataset, **kwargs):
+        """Writes data from a single dataset into the datastore.
+
+        Parameters
+        ----------
+        dataset : Dataset
+
+        """
+        self.putMany([dataset], **kwargs)
+
+    @hdfLockCheck
+    def putMany(self, datasets, raiseErrors=True, sourceFiles=None,
+                **kwargs):
+        """Writes data from many datasets into the datastore at once.
+
+        The keys of all the datasets are checked with a single read of the
+        file, and their IDs, index entries and the persistent state of the
+        datastore are written in a single write at the end. This is much
+        faster than calling put() on each dataset. Datasets that are
+        attributes are written after all the other datasets. If the IDs
+        cannot be written, e.g. because another process keeps the file open
+        for longer than the timeout, the data that was written is removed
+        again.
+
+        Parameters
+        ----------
+        datasets    : list of Dataset
+        raiseErrors : bool
+            If True, an exception is raised and nothing is written when any
+            dataset is unregistered or already exists in the datastore. If
+            False, datasets that cannot be written are reported and skipped.
+        sourceFiles : list of str or Path or None
+            The files from which each dataset was read, in the same order as
+            datasets. Their paths, sizes and modification times are recorded
+            so that incremental builds can skip them.
+        **kwargs
+            Keyword arguments to pass to the put() method of each dataset.
+
+        Returns
+        -------
+        dsIDs : list of DatasetID
+            The IDs of the datasets that were written to the datastore.
+
+        """
+        if sourceFiles is None:
+            sourceFiles = [None] * len(datasets)
+        datasets = sorted(zip(datasets, sourceFiles),
+                          key=lambda x: bool(x[0].attributeOf))
+
+        # Check for existing keys before writing any data; keys of datasets
+        # in the same batch are also compared to each other.
+        toWrite, newKeys = [], set()
+        for dataset, sourceFile in datasets:
+            try:
+                assert dataset.datasetType in \
+                    config.__Registered_DatasetTypes__,\
+                    'Type {0} is unregistered.'.format(dataset.datasetType)
+                if dataset.attributeOf:
+                    assert dataset.attributeOf in \
+                        config.__Registered_DatasetTypes__,\
+                        'Type {0} is unregistered.'.format(
+                            dataset.attributeOf)
+
+                # Key generation automatically handles attributes. The file
+                # stays open between the checks inside a with...as block.
+                _, key, ids = self._checkKeyExistence(dataset)
+
+                if (key, dataset.datasetType) in newKeys:
+                    raise HDF5KeyExists(
+                        'Error: {0:s} already exists.'.format(key))
+                newKeys.add((key, dataset.datasetType))
+                toWrite.append((dataset, key, ids, sourceFile))
+            except (AssertionError, HDF5KeyExists) as err:
+                if raiseErrors:
+                    raise
+                self._printError(err, 'putMany')
+
+        # Write the data, then the IDs and state of everything written
+        written, indexed = [], False
+        try:
+            for dataset, key, ids, sourceFile in toWrite:
+                try:
+                    putKwargs = dict(
+                        self.storageOptions.get(dataset.datasetType, {}))
+                    putKwargs.update(kwargs)
+                    with self._handle(dataset.HANDLETYPE, mode='a') as hdf:
+                        dataset.put(hdf, key, **putKwargs)
+                    written.append((dataset, key, ids, sourceFile))
+                except Exception as err:
+                    if raiseErrors:
+                        raise
+                    self._printError(err, 'putMany')
+        finally:
+            try:
+                if written:
+                    with self._handle('h5py', mode='a') as hdf:
+                        for dataset, key, ids, _ in written:
+                            # Don't write IDs for attributes
+                            if not dataset.attributeOf:
+                                self._writeDatasetIDs(dataset, key=key,
+                                                      ids=ids, hdf=hdf)
+
+                        dsIDs = [ids for _, _, ids, _ in written]
+                        indexed = True
+                        self._updateIndex(hdf, dsIDs)
+                        self._recordSources(hdf, [
+                            (ids.datasetType, sourceFile)
+                            for _, _, ids, sourceFile in written
+                            if sourceFile])
+                        self._dumps(hdf)
+                        self._updateCaches(hdf, dsIDs)
+            except Exception as err:
+                # Datasets without IDs and index rows could neither be read
+                # nor put again, so they are removed
+                self._removeDatasets(
+                    [(key, ids) for _, key, ids, _ in written], indexed)
+                written = []
+                if raiseErrors:
+                    raise
+                self._printError(err, 'putMany')
+            finally:
+                # Close the file so that readers in other processes may
+                # open it
+                self._closeHandles()
+
+        return [ids for _, _, ids, _ in written]
+
+    def query(self, datasetType='Localizations'):
+        """Returns a list of datasets inside this datastore.
+
+        The IDs are read from the index tables that are updated by put().
+        Datastores written by older versions of B-Store have no index and are
+        searched group-by-group instead; call reindex() once to speed up
+        their queries.
+
+        Parameters
+        ----------
+        datasetType     : str
+            The type of data to search for..
+
+        Returns
+        -------
+        dsIDs   : list of Dataset
+            All of the dataset ids matching the datasetType
+
+        """
+        self._checkForRegisteredTypes([datasetType])
+
+        with self._handle('h5py') as f:
+            dsIDs = self._readIndex(f, datasetType)
+
+            if dsIDs is None:
+                dsIDs = self._scanDatasets(f, datasetType)
+
+        return dsIDs
+
+    def _readDataset(self, dsID, dataset, **kwargs):
+        """Checks that a dataset exists and reads its data.
+
+        DatasetTypes with a HANDLETYPE are checked and read with a single
+        open handle. Otherwise, the file is opened for the check only if the
+        key is not answered by the set of keys, and the DatasetType opens
+        the file itself to read it.
+
+        Parameters
+        ----------
+        dsID    : DatasetID
+        dataset : Dataset
+            The empty dataset of dsID, whose data is set by this function.
+        **kwargs
+            Keyword arguments to pass to the get() method of the dataset.
+
+        """
+        if dataset.HANDLETYPE is None:
+            keyExists, hdfKey, _ = self._checkKeyExistence(
+                dsID, raiseException=False)
+            if not keyExists:
+                raise HDF5KeyDoesNotExist(
+                    'Dataset does not exist: ' + dsID.__repr__())
+
+            with self._handle(None) as hdf:
+                dataset.data = dataset.get(hdf, hdfKey, **kwargs)
+            return
+
+        with self._handle(dataset.HANDLETYPE) as hdf:
+            keyExists, hdfKey, _ = self._checkKeyExistence(
+                dsID, raiseException=False, hdf=hdf)
+            if not keyExists:
+                raise HDF5KeyDoesNotExist(
+                    'Dataset does not exist: ' + dsID.__repr__())
+
+            dataset.data = dataset.get(hdf, hdfKey, **kwargs)
+
+    def _readIndex(self, hdf, datasetType):
+        """Reads the IDs of one datasetType from the index tables.
+
+        Parameters
+        ----------
+        hdf         : h5py.File
+            The open datastore file.
+        datasetType : str
+
+        Returns
+        -------
+        dsIDs : list of DatasetID or None
+            None is returned when the file holds no index for this type.
+
+        """
+        indexKey = '{0:s}/{1:s}'.format(config.__Index_Key__, datasetType)
+        if indexKey not in hdf:
+            return None
+
+        return self._unpackIndexRows(hdf[indexKey][()], datasetType,
+                                     datasetTypeInfo(datasetType).attributeOf)
+
+    def _readSources(self):
+        """Reads the source files that were recorded by putMany().
+
+        Returns
+        -------
+        sources : dict
+            Keys are tuples of the datasetType and the resolved path to a
+            file; values are tuples of the file's size and modification time
+            when it was put into the datastore.
+
+        """
+        try:
+            with self._handle('h5py') as hdf:
+                if config.__Sources_Key__ not in hdf:
+                    return {}
+                rows = hdf[config.__Sources_Key__][()]
+        except OSError:
+            if not self._isMissing():
+                raise
+            # File doesn't exist
+            return {}
+
+        return {(_toStr(row['datasetType']), _toStr(row['path'])):
+                (int(row['size']), float(row['mtime'])) for row in rows}
+
+    def _recordSources(self, hdf, sources):
+        """Appends the paths, sizes and modification times of source files.
+
+        Parameters
+        ----------
+        hdf     : h5py.File
+            The datastore file, opened for writing.
+        sources : list of tuple of (str, str or Path)
+            The datasetType and the file from which a dataset was read.
+
+        """
+        if not sources:
+            return
+
+        rows = np.empty(len(sources), dtype=_sourceDtype)
+        for index, (datasetType, sourceFile) in enumerate(sources):
+            sourceFile = Path(sourceFile).resolve()
+            stat = sourceFile.stat()
+            rows[index] = (datasetType, str(sourceFile), stat.st_size,
+                           stat.st_mtime)
+
+        sourcesKey = config.__Sources_Key__
+        if sourcesKey not in hdf:
+            hdf.create_dataset(sourcesKey, data=rows, maxshape=(None,),
+                               chunks=True)
+        else:
+            table = hdf[sourcesKey]
+            numRows = table.shape[0]
+            table.resize((numRows + len(rows),))
+            table[numRows:] = rows
+
+    @hdfLockCheck
+    def reindex(self):
+        """Rebuilds the index tables of the datastore from its contents.
+
+        This is necessary only for datastores created by versions of B-Store
+        that did not maintain an index, or after registering a new
+        datasetType whose class could not be found when the file was last
+        indexed.
+
+        """
+        with self._handle('h5py', mode='a') as hdf:
+            self._buildIndex(hdf)
+            self._dumps(hdf)
+            self._keyIndexed = self._isIndexed(hdf)
+
+        self._closeHandles()
+        self._idCache = None
+        self._keyCache = None
+        self._typeCache = None
+
+    def _removeDatasets(self, keys, indexed=False):
+        """Removes datasets whose IDs could not be written by putMany().
+
+        The datasets' nodes are deleted, except for attributes, whose HDF
+        attributes are deleted from the node that they describe instead.
+
+        Parameters
+        ----------
+        keys    : list of tuple of (str, DatasetID)
+            The keys and IDs of the datasets to remove.
+        indexed : bool
+            Were some of the datasets possibly added to the index? If True,
+            the index is rebuilt from the file.
+
+        """
+        mdPrefix = config.__HDF_Metadata_Prefix__
+        with self._handle('h5py', mode='a') as hdf:
+            for key, ids in keys:
+                if key not in hdf:
+                    continue
+
+                if ids.attributeOf:
+                    attrs = hdf[key].attrs
+                    for name in [name for name in attrs
+                                 if name.startswith(mdPrefix)]:
+                        del(attrs[name])
+                else:
+                    del(hdf[key])
+
+            if indexed:
+                self._buildIndex(hdf)
+
+        self._closeHandles()
+        self._idCache = None
+        self._keyCache = None
+        self._typeCache = None
+
+    def _removeIngestedFiles(self, files):
+        """Removes files that were already put into the datastore.
+
+        Parameters
+        ----------
+        files : OrderedDict of list of str
+            The files found by _buildFileList().
+
+        Returns
+        -------
+        files : OrderedDict of list of str
+            The files that have not been put into the datastore yet.
+
+        """
+        sources = self._readSources()
+        numSkipped = 0
+        for currType in files.keys():
+            newFiles = []
+            for currFile in files[currType]:
+                currPath = Path(currFile).resolve()
+                recorded = sources.get((currType, str(currPath)))
+                if recorded is None:
+                    newFiles.append(currFile)
+                    continue
+
+                numSkipped += 1
+                stat = currPath.stat()
+                if recorded != (stat.st_size, stat.st_mtime):
+                    print(('{0:s} has changed since it was put into the '
+                           'datastore and was skipped.').format(str(currPath)))
+
+            files[currType] = newFiles
+
+        print('{0:d} files already in the datastore were skipped.'.format(
+            numSkipped))
+        return files
+
+    def _scanDatasets(self, hdf, datasetType):
+        """Finds the datasets of one type by visiting every node in the file.
+
+        Parameters
+        ----------
+        hdf         : h5py.File
+            The open datastore file.
+        datasetType : str
+
+        Returns
+        -------
+        dsIDs : list of DatasetID
+
+        """
+        searchString = datasetType
+        ap = config.__HDF_AtomID_Prefix__
+        mp = config.__HDF_Metadata_Prefix__
+        attributeOf = datasetTypeInfo(datasetType).attributeOf
+        f = hdf
+
+        # Extract all localization datasets from the HDF5 file by matching
+        # each group to the search string.
+        # ('table' not in name) excludes the subgroup inside every
+        # processed_localization parent group.
+        resultGroups = []
+
+        def find_datasets(name):
+            """Finds datasets matching the name pattern."""
+            # Finds only datasets with the SMLM_datasetType attribute.
+            if (ap +
+                'datasetType' in f[name].attrs) and (f[name].attrs[ap +
+                                                                   'datasetType'] == searchString):
+                resultGroups.append(name)
+
+            # Read datasets that are attributes here.
+            if (ap + 'datasetType' in f[name].attrs) \
+                    and (attributeOf is not None) \
+                    and (f[name].attrs[ap + 'datasetType']
+                         == attributeOf) \
+                    and (mp + ap + 'datasetType') in f[name].attrs:
+                resultGroups.append(name)
+
+        f.visit(find_datasets)
+
+        # Read attributes of each key in resultGroups for SMLM_*
+        # and convert them to a dataset ID.
+        # Note: If you use Path and Not PurePosixPath, '/' will
+        # become '\\' on Windows and you won't get the right keys.
+        resultKeys = list(map(PurePosixPath, resultGroups))
+        dsIDs = [self._genDatasetID(str(key)) for key in resultKeys]
+
+        # Convert datasetType for the attributes special case
+        if attributeOf:
+            for (index, atom) in enumerate(dsIDs):
+                # Can't set atom attributes directly, so make new ones
+                dsIDs[index] = DatasetID(
+                    atom.prefix,
+                    atom.acqID,
+                    datasetType,
+                    attributeOf,
+                    atom.channelID,
+                    atom.dateID,
+                    atom.posID,
+                    atom.sliceID,
+                    atom.replicateID)
+
+        return dsIDs
+
+    def select(self, datasetType=None, **conditions):
+        """Returns the IDs of the datasets that satisfy conditions on the IDs.
+
+        Each keyword is the name of an ID field. Its value is either the value
+        that the field must equal, a list or set of allowed values, or a
+        function that accepts the value of the field and returns True for
+        datasets to keep. All conditions must be satisfied:
+
+        >>> ds.select('Localizations', channelID='A647', replicateID=2,
+        ...           dateID=lambda d: d is not None and d[5:7] == '03')
+
+        Like query(), the IDs are read from the index tables instead of the
+        groups of the HDF file.
+
+        Parameters
+        ----------
+        datasetType : str or None
+            The type of data to search for. If None, all registered types
+            are searched.
+
+        Returns
+        -------
+        df : DataFrame
+            One row of IDs per matching dataset; the columns are the fields of
+            DatasetID. A row is converted back into a DatasetID with
+            DatasetID(*row).
+
+        """
+        for field in conditions:
+            if field not in DatasetID._fields:
+                raise DatasetIDError(
+                    'Unknown ID field: {0:s}'.format(field))
+
+        if datasetType is None:
+            datasetTypes = list(OrderedDict.fromkeys(
+                config.__Registered_DatasetTypes__))
+        else:
+            datasetTypes = [datasetType]
+        self._checkForRegisteredTypes(datasetTypes)
+
+        dsIDs = []
+        try:
+            with self._handle('h5py') as f:
+                for currType in datasetTypes:
+                    currIDs = self._readIndex(f, currType)
+                    if currIDs is None:
+                        currIDs = self._scanDatasets(f, currType)
+                    dsIDs.extend(currIDs)
+        except OSError:
+            if not self._isMissing():
+                raise
+            # File doesn't exist
+            pass
+
+        df = pd.DataFrame(dsIDs, columns=DatasetID._fields)
+        for field, condition in conditions.items():
+            if callable(condition):
+                mask = df[field].map(condition)
+            elif isinstance(condition, (list, set, frozenset)):
+                mask = df[field].map(lambda value: value in condition)
+            else:
+                mask = df[field].map(lambda value: value == condition)
+
+            df = df[mask.astype(bool)]
+
+        return df.reset_index(drop=True)
+
+    def _sessionHandle(self, handleType):
+        """Returns the cached handle of a type, opening it if necessary.
+
+        Parameters
+        ----------
+        handleType : str
+            'h5py' or 'pandas'.
+
+        Returns
+        -------
+        hdf : h5py.File or pandas.HDFStore
+
+        """
+        if handleType not in self._handles:
+            # Files are only opened for writing while they are locked
+            writable = not self.readOnly and self._lock.is_locked
+            self._closeHandles()
+            self._handles[handleType] = _openHandle(
+                self._dsName, handleType, 'a' if writable else 'r',
+                timeout=self.timeout)
+
+        return self._handles[handleType]
+
+    def _sortDatasets(self, dsInfo):
+        """Sorts and organizes all datasets before a Datastore build.
+
+        _sortDatasets() accepts a list of dicts containing dataset
+        information. It then sorts and organizes the information in a
+        human-readable format, allowing both humans and computers to
+        locate possible errors before and after the datastore is built.
+
+        Parameters
+        ----------
+        dsInfo : list of dict
+            Each element of dsInfo is a dictionary containing the IDs
+            for a particular dataset.
+
+        Returns
+        -------
+        df     : DataFrame
+
+        """
+        # If any datasets at all were correctly parsed, then dsInfo
+        # will not be empty.
+        if dsInfo:
+            # Build the DataFrame with indexes prefix and acqID. These are
+            # the primary identifiers for a dataset and are always required;
+            df = pd.DataFrame(dsInfo)
+
+            # Prevents an error comparing acqID's of different types.
+            df['acqID'] = df['acqID'].astype(str)
+
+            df.set_index(['prefix', 'acqID'])
+            df.sort_index(inplace=True)
+
+            return df
+        else:
+            return None
+
+    def _unpackDatasetIDs(self, ds):
+        """Unpack the dataset IDs into a format usable by this datastore.
+
+        Parameters
+        ----------
+        ds  : Dataset
+
+        Returns
+        -------
+        ids : DatasetID
+            The ids for the dataset; a namedtuple of the HDFDatastore class.
+
+        """
+        idDict = ds.datasetIDs.copy()
+
+        # Preconditioning of the IDs
+        # Require prefix and acqID to be specified
+        if ('prefix' not in idDict) | ('acqID' not in idDict):
             raise DatasetIDError('DatasetID missing a \'key\' '
                                  'or \'acqID\' key')
 
@@ -927,7 +2019,96 @@ class HDFDatastore(Datastore):
 
         return ids
 
-    def _writeDatasetIDs(self, ds, key=None, ids=None):
+    def _unpackIndexRows(self, rows, datasetType, attributeOf):
+        """Converts rows of an index table into DatasetIDs.
+
+        Parameters
+        ----------
+        rows        : NumPy structured array
+            Rows read from an index table; see _indexDtype.
+        datasetType : str
+        attributeOf : str or None
+
+        Returns
+        -------
+        dsIDs : list of DatasetID
+
+        """
+        dsIDs = []
+        for row in rows:
+            acqID = _toStr(row['acqID'], noneString=True)
+            posID = tuple(int(p) for p in row['posID'] if p >= 0)
+            dsIDs.append(DatasetID(
+                _toStr(row['prefix'], noneString=True),
+                int(acqID) if acqID.isdigit() else acqID,
+                datasetType,
+                attributeOf,
+                _toStr(row['channelID'], noneString=True),
+                _toStr(row['dateID'], noneString=True),
+                posID if posID else None,
+                None if row['sliceID'] < 0 else int(row['sliceID']),
+                None if row['replicateID'] < 0 else int(row['replicateID'])))
+
+        return dsIDs
+
+    def _updateCaches(self, hdf, dsIDs):
+        """Adds newly written datasets to the cached IDs, keys and types.
+
+        Parameters
+        ----------
+        hdf   : h5py.File
+            The datastore file, whose index includes the datasets in dsIDs.
+        dsIDs : list of DatasetID
+
+        """
+        if not self._keyIndexed:
+            # The whole file may have been indexed by _updateIndex()
+            self._idCache = None
+            self._keyCache = None
+            self._typeCache = None
+            self._keyIndexed = self._isIndexed(hdf)
+        if self._idCache is not None:
+            self._idCache.extend(dsIDs)
+        if self._keyCache is not None:
+            self._keyCache.update(self._keyOf(ids) for ids in dsIDs)
+        if self._typeCache is not None:
+            self._typeCache.update(ids.datasetType for ids in dsIDs)
+
+    def _updateIndex(self, hdf, dsIDs):
+        """Appends newly written datasets to the index tables.
+
+        If the file has no index yet, it is built from the file's contents
+        instead, which also indexes datasets written by older versions of
+        B-Store.
+
+        Parameters
+        ----------
+        hdf   : h5py.File
+            The datastore file, opened for writing. The datasets in dsIDs must
+            already be written to it.
+        dsIDs : list of DatasetID
+
+        """
+        indexKey = config.__Index_Key__
+        if indexKey not in hdf:
+            self._buildIndex(hdf)
+            return
+
+        for datasetType in set(ids.datasetType for ids in dsIDs):
+            rows = self._packIndexRows([ids for ids in dsIDs
+                                        if ids.datasetType == datasetType])
+            tableKey = '{0:s}/{1:s}'.format(indexKey, datasetType)
+
+            if tableKey not in hdf:
+                hdf.create_dataset(tableKey, data=rows, maxshape=(None,),
+                                   chunks=True)
+            else:
+                table = hdf[tableKey]
+                numRows = table.shape[0]
+                table.resize((numRows + len(rows),))
+                table[numRows:] = rows
+
+    def _writeDatasetIDs(self, ds, key=None, ids=None, hdf=None):
         """Writes B-Store dataset IDs as HDF attributes of the dataset.
 
         Parameters
@@ -935,31 +2116,354 @@ class HDFDatastore(Datastore):
         ds  : Dataset
         key : str
         ids : dsID
+        hdf : h5py.File or None
+            The datastore file, opened for writing. If None, the file is
+            opened and closed by this function.
 
         """
         if not key or not ids:
-            key = self._genKey(ds)
-            ids = self._unpackDatasetIDs(ds)
+            key, ids = self._genKey(ds)
+
+        if hdf is None:
+            with self._handle('h5py', mode='a') as hdf:
+                self._writeDatasetIDs(ds, key=key, ids=ids, hdf=hdf)
+            return
 
         attrPrefix = self.attrPrefix
-        with h5py.File(self._dsName, mode='a') as hdf:
-            hdf[key].attrs[attrPrefix + 'acqID'] = ids.acqID
-            hdf[key].attrs[attrPrefix + 'channelID']   = \
-                'None' if ids.channelID is None else ids.channelID
-            hdf[key].attrs[attrPrefix + 'dateID']      = \
-                'None' if ids.dateID is None else ids.dateID
-            hdf[key].attrs[attrPrefix + 'posID']       = \
-                'None' if ids.posID is None else ids.posID
-            hdf[key].attrs[attrPrefix + 'prefix'] = ids.prefix
-            hdf[key].attrs[attrPrefix + 'sliceID']     = \
-                'None' if ids.sliceID is None else ids.sliceID
-            hdf[key].attrs[attrPrefix + 'replicateID']     = \
-                'None' if ids.replicateID is None else ids.replicateID
-            hdf[key].attrs[attrPrefix + 'datasetType'] = ds.datasetType
-
-            # Current version of this software
-            hdf[key].attrs[attrPrefix + 'Version'] = \
-                config.__bstore_Version__
+        hdf[key].attrs[attrPrefix + 'acqID'] = ids.acqID
+        hdf[key].attrs[attrPrefix + 'channelID']   = \
+            'None' if ids.channelID is None else ids.channelID
+        hdf[key].attrs[attrPrefix + 'dateID']      = \
+            'None' if ids.dateID is None else ids.dateID
+        hdf[key].attrs[attrPrefix + 'posID']       = \
+            'None' if ids.posID is None else ids.posID
+        hdf[key].attrs[attrPrefix + 'prefix'] = ids.prefix
+        hdf[key].attrs[attrPrefix + 'sliceID']     = \
+            'None' if ids.sliceID is None else ids.sliceID
+        hdf[key].attrs[attrPrefix + 'replicateID']     = \
+            'None' if ids.replicateID is None else ids.replicateID
+        hdf[key].attrs[attrPrefix + 'datasetType'] = ds.datasetType
+
+        # Current version of this software
+        hdf[key].attrs[attrPrefix + 'Version'] = \
+            config.__bstore_Version__
+
+"""Functions
+-------------------------------------------------------------------------------
+"""
+
+
+def datasetTypeInfo(datasetType):
+    """Returns the class and metadata of a DatasetType.
+
+    The class is imported from the bstore.datasetTypes package, or else from
+    the modules in the plugin directory, the first time that the type is
+    looked up. Later lookups are read from the registry, so the module is
+    not searched again and the type is not instantiated again.
+
+    Parameters
+    ----------
+    datasetType : str
+        The name of the DatasetType; this is also the name of its class.
+
+    Returns
+    -------
+    info : DatasetTypeInfo
+
+    """
+    try:
+        return _datasetTypeRegistry[datasetType]
+    except KeyError:
+        pass
+
+    modName = 'bstore.datasetTypes.{0:s}'.format(datasetType)
+    try:
+        dType = getattr(importlib.import_module(modName), datasetType)
+    except ImportError as err:
+        # Errors from the imports inside an existing module are not hidden;
+        # ModuleNotFoundError would need Python 3.6
+        if err.name != modName:
+            raise
+
+        plugins = dict(_utils.findPlugins('Dataset'))
+        if datasetType not in plugins:
+            raise DatasetTypeError(
+                '{0:s} is not a known DatasetType.'.format(datasetType))
+        dType = plugins[datasetType]
+
+    info = DatasetTypeInfo(dType, dType().attributeOf, dType.HANDLETYPE,
+                           getattr(dType, 'INTERNALTYPE', None))
+    _datasetTypeRegistry[datasetType] = info
+    return info
+
+
+def decodeKey(key):
+    """Generates the IDs of a dataset from its HDF key. Inverse of encodeKey.
+
+    Keys written by encodeKey() are parsed with one precompiled pattern, and
+    their dates are parsed with their known format instead of being
+    guessed by dateutil. Any other keys are parsed field by field, like
+    older versions of B-Store did.
+
+    Parameters
+    ----------
+    key : str
+        A key pointing to a dataset in the HDF file.
+
+    Returns
+    -------
+    ids : DatasetID
+        The IDs of one dataset. attributeOf is always None because the keys
+        of attributes are those of the datasets that they describe.
+
+    """
+    splitStr = key.split(sep='/')
+    prefix = splitStr[0]
+    acqID = int(splitStr[1].rsplit(sep='_', maxsplit=1)[-1])
+
+    match = _keyPattern.fullmatch(splitStr[2])
+    if match is None:
+        return _decodeKeyLoose(prefix, acqID, splitStr[2])
+
+    datasetType, channelID, posX, posY, pos, sliceID, dateID, replicateID = \
+        match.groups()
+
+    if pos is not None:
+        posID = (int(pos),)
+    elif posX is not None:
+        posID = (int(posX), int(posY))
+    else:
+        posID = None
+
+    if dateID is not None:
+        # Raises a ValueError for dates that do not exist
+        dateID = datetime.strptime(dateID, '%Y%m%d').strftime('%Y-%m-%d')
+
+    return DatasetID(prefix, acqID, datasetType, None, channelID, dateID,
+                     posID,
+                     None if sliceID is None else int(sliceID),
+                     None if replicateID is None else int(replicateID))
+
+
+def _decodeKeyLoose(prefix, acqID, otherIDs):
+    """Parses the IDs of a key that does not match _keyPattern.
+
+    Parameters
+    ----------
+    prefix   : str
+    acqID    : int
+    otherIDs : str
+        The last part of the key, i.e. the datasetType and optional IDs.
+
+    Returns
+    -------
+    ids : DatasetID
+
+    """
+    datasetType = otherIDs.split('_')[0]
+
+    channelRaw = _channelPattern.search(otherIDs)
+    if channelRaw is None:
+        channelID = None
+    else:
+        # 'Channel...' will always be the first item in the split, ergo [0]
+        channelID = channelRaw.group(0).split('_')[0]
+        channelID = channelID[len('Channel'):]
+
+    # Obtain the position ID; first, extract strings like 'Pos0' or
+    # 'Pos_003_002', then extract the digits and convert them to a tuple
+    positionRaw = _positionPattern.search(otherIDs)
+    if positionRaw is None:
+        posID = None
+    else:
+        indexes = _digitsPattern.findall(positionRaw.group(0))
+        posID = tuple([int(index) for index in indexes])
+
+    sliceRaw = _slicePattern.search(otherIDs)
+    if sliceRaw is None:
+        sliceID = None
+    else:
+        sliceID = int(_digitsPattern.findall(sliceRaw.group(0))[0])
+
+    dateRaw = _datePattern.search(otherIDs)
+    if dateRaw is None:
+        dateID = None
+    else:
+        index = _digitsPattern.findall(dateRaw.group(0))
+        dateID = parse(index[0]).strftime('%Y-%m-%d')
+
+    replicateRaw = _replicatePattern.search(otherIDs)
+    if replicateRaw is None:
+        replicateID = None
+    else:
+        replicateID = int(_digitsPattern.findall(replicateRaw.group(0))[0])
+
+    return DatasetID(prefix, acqID, datasetType, None, channelID, dateID,
+                     posID, sliceID, replicateID)
+
+
+def encodeKey(ids, datasetType):
+    """Generates the HDF key of a dataset from its IDs. Inverse of decodeKey.
+
+    Parameters
+    ----------
+    ids         : DatasetID
+    datasetType : str
+        The name of the DatasetType in the key. For attributes, this is the
+        type that they describe.
+
+    Returns
+    -------
+    key : str
+
+    """
+    parts = ['{0:s}/{0:s}_{1!s}/{2:s}'.format(ids.prefix, ids.acqID,
+                                                datasetType)]
+
+    if ids.channelID is not None:
+        parts.append('_Channel' + ids.channelID)
+    if ids.posID is not None:
+        if len(ids.posID) == 1:
+            parts.append('_Pos{:d}'.format(ids.posID[0]))
+        else:
+            parts.append('_Pos_{0:0>3d}_{1:0>3d}'.format(ids.posID[0],
+                                                        ids.posID[1]))
+    if ids.sliceID is not None:
+        parts.append('_Slice{:d}'.format(ids.sliceID))
+    if ids.dateID is not None:
+        # hyphens not allowed in names for PyTables
+        parts.append('_Date' + ids.dateID.replace('-', ''))
+    if ids.replicateID is not None:
+        parts.append('_Replicate{:d}'.format(ids.replicateID))
+
+    return ''.join(parts)
+
+
+def _openHandle(datastore, handleType='h5py', mode='r', timeout=0):
+    """Opens a datastore file.
+
+    Parameters
+    ----------
+    datastore  : str or Path
+        The name of the datastore file.
+    handleType : str
+        'h5py' for a h5py.File or 'pandas' for a pandas.HDFStore.
+    mode       : str
+        The mode in which the file is opened, e.g. 'r' or 'a'.
+    timeout    : float
+        The time in seconds to wait while the file is locked by HDF5 because
+        another process has it open.
+
+    Returns
+    -------
+    hdf : h5py.File or pandas.HDFStore
+
+    """
+    if handleType not in ('h5py', 'pandas'):
+        raise ValueError('Unknown handle type: {0}'.format(handleType))
+
+    start = time.monotonic()
+    while True:
+        try:
+            if handleType == 'pandas':
+                return pd.HDFStore(str(datastore), mode=mode)
+            else:
+                return h5py.File(str(datastore), mode=mode)
+        except Exception as err:
+            if 'unable to lock file' not in str(err) \
+                    or time.monotonic() - start >= timeout:
+                raise
+            time.sleep(0.05)
+
+
+@contextmanager
+def openHandle(datastore, handleType='h5py', mode='r', timeout=0):
+    """Provides an open datastore file to the get() and put() of a Dataset.
+
+    A file handle that is already open is provided as-is and is not closed
+    afterwards, so that DatasetTypes may accept either the name of the
+    datastore file or a handle that the HDFDatastore keeps open:
+
+    >>> with bstore.database.openHandle(datastore, 'pandas', 'a') as hdf:
+    ...     hdf.put(key, data)
+
+    Parameters
+    ----------
+    datastore  : str, Path, h5py.File, or pandas.HDFStore
+        The name of the datastore file or an open handle to it.
+    handleType : str
+        The type of handle to open if a file name is given: 'h5py' for a
+        h5py.File or 'pandas' for a pandas.HDFStore.
+    mode       : str
+        The mode in which the file is opened if a file name is given.
+    timeout    : float
+        The time in seconds to wait while another process has the file open.
+
+    Yields
+    ------
+    hdf : h5py.File or pandas.HDFStore
+
+    """
+    if isinstance(datastore, (h5py.File, pd.HDFStore)):
+        yield datastore
+        return
+
+    hdf = _openHandle(datastore, handleType, mode, timeout)
+    try:
+        yield hdf
+    finally:
+        hdf.close()
+
+
+def _parseFile(parser, filename, datasetType, reader, registeredTypes,
+               kwargs):
+    """Parses one file in a worker process of HDFDatastore.build().
+
+    Parameters
+    ----------
+    parser          : Parser
+    filename        : str or Path
+    datasetType     : str
+    reader          : Reader or None
+    registeredTypes : list of str
+        The registered DatasetTypes of the parent process. These are not
+        always inherited by the worker processes.
+    kwargs          : dict
+        Keyword arguments to pass to the parser's readFromFile() method.
+
+    Returns
+    -------
+    dataset : Dataset
+
+    """
+    config.__Registered_DatasetTypes__ = registeredTypes
+    parser.parseFilename(filename, datasetType=datasetType, reader=reader,
+                         **kwargs)
+
+    return parser.dataset
+
+
+def _toStr(value, noneString=False):
+    """Converts a string read from an HDF attribute or table to str.
+
+    Newer versions of h5py return variable-length strings as bytes.
+
+    Parameters
+    ----------
+    value      : str or bytes
+    noneString : bool
+        If True, the string 'None', which is written for IDs that are not
+        set, is converted to None.
+
+    Returns
+    -------
+    value : str or None
+
+    """
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+
+    return None if noneString and value == 'None' else value
 
 """Exceptions
 -------------------------------------------------------------------------------
@@ -990,6 +2494,18 @@ class DatasetTypeError(Exception):
         return repr(self.value)
 
 
+class FileIsReadOnly(Exception):
+    """Raised when trying to write to a datastore opened in read-only mode.
+
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self):
+        return repr(self.value)
+
+
 class FileNotLocked(Exception):
     """Raised when trying to write to an unlocked file.
 
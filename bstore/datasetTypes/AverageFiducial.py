@@ -15,7 +15,14 @@ import traceback
 class AverageFiducial(bstore.database.Dataset):
     """Contains the average trajectory of many fiducial markers.
 
+    Attributes
+    ----------
+    HANDLETYPE : str
+        The type of open datastore file that get() and put() accept in place
+        of the file name: a pandas.HDFStore.
+
     """
+    HANDLETYPE = 'pandas'
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -51,7 +58,7 @@ class AverageFiducial(bstore.database.Dataset):
 
         Parameters
         ----------
-        datastore : str
+        datastore : str or pandas.HDFStore
             String containing the path to a B-Store HDF datastore.
         key      : str
             The HDF key pointing to the dataset location in the HDF datastore.
@@ -70,7 +77,7 @@ class AverageFiducial(bstore.database.Dataset):
 
         Parameters
         ----------
-        datastore : str
+        datastore : str or pandas.HDFStore
             String containing the path to a B-Store HDF datastore.
         key      : str
             The HDF key pointing to the dataset location in the HDF datastore.
@@ -78,16 +85,14 @@ class AverageFiducial(bstore.database.Dataset):
         """
         # Writes the data in the dataset to the HDF file.
         try:
-            hdf = pd.HDFStore(datastore)
-            hdf.put(key, self.data, format='table',
-                    data_columns=True, index=False)
+            with bstore.database.openHandle(datastore, 'pandas', 'a') as hdf:
+                hdf.put(key, self.data, format='table',
+                        data_columns=True, index=False)
         except:
             print("Unexpected error in put():", sys.exc_info()[0])
 
             if bstore.config.__Verbose__:
                 print(traceback.format_exc())
-        finally:
-            hdf.close()
 
     @staticmethod
     def readFromFile(filePath, **kwargs):
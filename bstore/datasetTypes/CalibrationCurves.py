@@ -0,0 +1,165 @@
+# © All rights reserved. ECOLE POLYTECHNIQUE FEDERALE DE LAUSANNE,
+# Switzerland, Laboratory of Experimental Biophysics, 2016-2018
+# See the LICENSE.txt file for more details.
+
+import bstore.config
+__version__ = bstore.config.__bstore_Version__
+
+# Be sure not to use the from ... import syntax to avoid cyclical imports!
+import bstore.database
+import pandas as pd
+import sys
+import traceback
+
+
+class CalibrationCurves(bstore.database.Dataset):
+    """Contains calibration curves, such as those for astigmatic imaging.
+
+    The data is a tuple of processors.LookupTable objects, for example the
+    calibrationCurves or wobbleCurves of a CalibrateAstigmatism processor.
+    They are stored as a table with the columns curve, x and y, where curve
+    is the position of each LookupTable in the tuple.
+
+    Attributes
+    ----------
+    HANDLETYPE : str
+        The type of open datastore file that get() and put() accept in place
+        of the file name: a pandas.HDFStore.
+
+    """
+    HANDLETYPE = 'pandas'
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+
+    def __repr__(self):
+        return self.datasetType + ': ' + self.datasetIDs.__repr__()
+
+    @property
+    def attributeOf(self):
+        """The other DatasetType that this DatasetType describes.
+
+        If the DatasetType is an attribute of another type, return the name of
+        this other DatasetType. An attribute means that it simply contains
+        metadata and attributes that more fully describe another datasetType.
+        If this DatasetType is not an attribute, return None.
+
+        Returns
+        -------
+        None
+
+        """
+        return None
+
+    @property
+    def datasetType(self):
+        """This should be set to the same name as the class.
+
+        """
+        return 'CalibrationCurves'
+
+    def get(self, datastore, key, **kwargs):
+        """Returns a CalibrationCurves dataset from the datastore.
+
+        Parameters
+        ----------
+        datastore : str or pandas.HDFStore
+            String containing the path to a B-Store HDF datastore.
+        key      : str
+            The HDF key pointing to the dataset location in the HDF datastore.
+
+        Returns
+        -------
+        data : tuple of LookupTable
+            The calibration curves retrieved from the HDF file.
+
+        """
+        return self.toCurves(pd.read_hdf(datastore, key=key))
+
+    def put(self, datastore, key, **kwargs):
+        """Puts the data into the datastore.
+
+        Parameters
+        ----------
+        datastore : str or pandas.HDFStore
+            String containing the path to a B-Store HDF datastore.
+        key      : str
+            The HDF key pointing to the dataset location in the HDF datastore.
+
+        """
+        # Writes the data in the dataset to the HDF file.
+        try:
+            with bstore.database.openHandle(datastore, 'pandas', 'a') as hdf:
+                hdf.put(key, self.toDataFrame(self.data), format='table',
+                        index=False)
+        except:
+            print("Unexpected error in put():", sys.exc_info()[0])
+
+            if bstore.config.__Verbose__:
+                print(traceback.format_exc())
+
+    @staticmethod
+    def readFromFile(filePath, **kwargs):
+        """Read a file on disk containing the DatasetType.
+
+        The default reader expects a csv file with the columns curve, x and
+        y, like the tables that are written to the datastore.
+
+        Parameters
+        ----------
+        filePath : Path
+            A pathlib object pointing towards the file to open.
+
+        Returns
+        -------
+        tuple of LookupTable
+
+        """
+        if ('reader' in kwargs) and (kwargs['reader']):
+            reader = kwargs['reader']
+            return reader(str(filePath), **kwargs)
+        else:
+            # Default read behavior
+            return CalibrationCurves.toCurves(pd.read_csv(str(filePath)))
+
+    @staticmethod
+    def toCurves(df):
+        """Converts a table of curves into a tuple of LookupTables.
+
+        Parameters
+        ----------
+        df : DataFrame
+            A DataFrame with the columns curve, x and y.
+
+        Returns
+        -------
+        tuple of LookupTable
+
+        """
+        # The processors are only imported once curves are actually read
+        import bstore.processors
+
+        return tuple(bstore.processors.LookupTable(group['x'].values,
+                                                   group['y'].values)
+                     for _, group in df.groupby('curve', sort=True))
+
+    @staticmethod
+    def toDataFrame(curves):
+        """Converts a tuple of curves into a single table.
+
+        Parameters
+        ----------
+        curves : tuple of LookupTable
+            Any objects with the attributes x and y may be converted.
+
+        Returns
+        -------
+        DataFrame
+            A DataFrame with the columns curve, x and y.
+
+        """
+        return pd.concat([pd.DataFrame({'curve': curveNum,
+                                        'x': curve.x,
+                                        'y': curve.y})
+                          for curveNum, curve in enumerate(curves)],
+                         ignore_index=True)
@@ -7,14 +7,20 @@ __version__ = config.__bstore_Version__
 
 # Be sure not to use the from ... import syntax to avoid cyclical imports!
 import bstore.database
-import h5py
 import json
 
 
 class LocMetadata(bstore.database.Dataset):
     """Contains metadata associated with a localization results dataset.
 
+    Attributes
+    ----------
+    HANDLETYPE : str
+        The type of open datastore file that get() and put() accept in place
+        of the file name: a h5py.File.
+
     """
+    HANDLETYPE = 'h5py'
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -50,7 +56,7 @@ class LocMetadata(bstore.database.Dataset):
 
         Parameters
         ----------
-        datastore : str
+        datastore : str or h5py.File
             String containing the path to a B-Store HDF datastore.
         key      : str
             The HDF key pointing to the dataset location in the HDF datastore.
@@ -61,7 +67,7 @@ class LocMetadata(bstore.database.Dataset):
             Metadata as key value pairs. All values are strings compatible
             with Python's JSON's dump.
         """
-        with h5py.File(datastore, mode='r') as hdf:
+        with bstore.database.openHandle(datastore, 'h5py', 'r') as hdf:
             # Open the HDF file and get the dataset's attributes
             attrKeys = hdf[key].attrs.keys()
             attrID = config.__HDF_Metadata_Prefix__
@@ -90,7 +96,7 @@ class LocMetadata(bstore.database.Dataset):
 
         Parameters
         ----------
-        datastore : str
+        datastore : str or h5py.File
             String containing the path to a B-Store HDF datastore.
         key      : str
             The HDF key pointing to the dataset location in the HDF datastore.
@@ -99,27 +105,24 @@ class LocMetadata(bstore.database.Dataset):
         attrFlag = config.__HDF_AtomID_Prefix__
         mdFlag = config.__HDF_Metadata_Prefix__
         try:
-            hdf = h5py.File(datastore, mode='a')
-
-            # Loop through metadata and write each attribute to the key
-            for currKey in self.data.keys():
-                attrKey = '{0:s}{1:s}'.format(mdFlag, currKey)
-                attrVal = json.dumps(self.data[currKey])
+            with bstore.database.openHandle(datastore, 'h5py', 'a') as hdf:
+                # Loop through metadata and write each attribute to the key
+                for currKey in self.data.keys():
+                    attrKey = '{0:s}{1:s}'.format(mdFlag, currKey)
+                    attrVal = json.dumps(self.data[currKey])
+                    hdf[key].attrs[attrKey] = attrVal
+
+                # Used for identification during datastore queries
+                attrKey = ('{0:s}{1:s}datasetType').format(mdFlag, attrFlag)
+                attrVal = json.dumps(self.datasetType)
                 hdf[key].attrs[attrKey] = attrVal
 
-            # Used for identification during datastore queries
-            attrKey = ('{0:s}{1:s}datasetType').format(mdFlag, attrFlag)
-            attrVal = json.dumps(self.datasetType)
-            hdf[key].attrs[attrKey] = attrVal
-
         except KeyError:
             # Raised when the hdf5 key does not exist in the datastore.
             ids = json.dumps(self.datasetIDs)
             raise LocResultsDoNotExist(('Error: Cannot not append metadata. '
                                         'No localization results exist with '
                                         'these atomic IDs: ' + ids))
-        finally:
-            hdf.close()
 
     @staticmethod
     def readFromFile(filePath, **kwargs):
@@ -22,9 +22,13 @@ class Localizations(bstore.database.Dataset):
     INTERNALTYPE : DataFrame
         The structure that holds the actual data for this datasetType. This is
         is used to match this datasetType to the appropriate Reader.
+    HANDLETYPE : str
+        The type of open datastore file that get() and put() accept in place
+        of the file name: a pandas.HDFStore.
 
     """
     INTERNALTYPE = pd.DataFrame
+    HANDLETYPE = 'pandas'
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -55,48 +59,119 @@ class Localizations(bstore.database.Dataset):
         """
         return 'Localizations'
 
-    def get(self, datastore, key, **kwargs):
+    def get(self, datastore, key, where=None, columns=None, **kwargs):
         """Returns a dataset from the datastore.
 
+        The row filters and the column selection are evaluated by PyTables
+        while the table is read, so only the matching rows and the requested
+        columns are loaded into memory.
+
         Parameters
         ----------
-        datastore : str
+        datastore : str or pandas.HDFStore
             String containing the path to a B-Store HDF datastore.
-        key      : str
+        key       : str
             The HDF key pointing to the dataset location in the HDF datastore.
+        where     : str, list of str, or None
+            A PyTables query that selects the rows to read, e.g.
+            'frame > 100 & precision < 30'. Only data columns may appear in
+            the query. All rows are read if None.
+        columns   : list of str or None
+            The names of the columns to read. All columns are read if None.
 
         Returns
         -------
         data : Pandas DataFrame
             The data retrieved from the HDF file.
         """
-        data = pd.read_hdf(datastore, key=key)
+        data = pd.read_hdf(datastore, key=key, where=where, columns=columns)
 
         return data
 
-    def put(self, datastore, key, **kwargs):
+    def iterChunks(self, datastore, key, chunksize=100000, where=None,
+                   columns=None, **kwargs):
+        """Yields the dataset from the datastore in chunks of rows.
+
+        The file remains open until the last chunk has been read.
+
+        Parameters
+        ----------
+        datastore : str or pandas.HDFStore
+            String containing the path to a B-Store HDF datastore.
+        key       : str
+            The HDF key pointing to the dataset location in the HDF datastore.
+        chunksize : int
+            The number of rows in each chunk.
+        where     : str, list of str, or None
+            A PyTables query that selects the rows to read.
+        columns   : list of str or None
+            The names of the columns to read. All columns are read if None.
+
+        Yields
+        ------
+        chunk : Pandas DataFrame
+            The next chunk of rows of the table.
+
+        """
+        with bstore.database.openHandle(datastore, 'pandas', 'r') as hdf:
+            for chunk in hdf.select(key, where=where, columns=columns,
+                                    chunksize=chunksize):
+                yield chunk
+
+    def put(self, datastore, key, complib=None, complevel=None,
+            chunksize=None, expectedRows=None, dataColumns=True,
+            downcast=False, **kwargs):
         """Puts the data into the datastore.
 
         Parameters
         ----------
-        datastore : str
+        datastore    : str or pandas.HDFStore
             String containing the path to a B-Store HDF datastore.
-        key      : str
+        key          : str
             The HDF key pointing to the dataset location in the HDF datastore.
+        complib      : str or None
+            The compression library used for the table, e.g. 'zlib', 'blosc'
+            or 'lzo'. No compression is used if None.
+        complevel    : int or None
+            The compression level from 0 to 9.
+        chunksize    : int or None
+            The number of rows that pandas writes to the table at once. This
+            limits the memory used while writing; it does not change the
+            layout of the table in the file.
+        expectedRows : int or None
+            The number of rows that the table is expected to hold, from which
+            PyTables chooses the shape of the table's HDF5 chunks: more
+            expected rows make larger chunks, which compress better and are
+            faster to read in whole, but slower to read a few rows from.
+            Defaults to the number of rows of the data. It has no effect
+            when appending to a table that already exists.
+        dataColumns  : bool or list of str
+            The columns that are indexed and may therefore be used in
+            queries of the table. If True, all columns are indexed. Fewer
+            data columns make smaller files and faster writes.
+        downcast     : bool
+            Convert float64 columns to float32 before writing them?
 
         """
+        data = self.data
+        if downcast:
+            floatCols = data.select_dtypes(include=['float64']).columns
+            data = data.astype({col: 'float32' for col in floatCols})
+        if expectedRows is None:
+            expectedRows = len(data)
+
         # Writes the data in the dataset to the HDF file.
         try:
-            hdf = pd.HDFStore(datastore)
-            hdf.put(key, self.data, format='table',
-                    data_columns=True, index=False)
+            with bstore.database.openHandle(datastore, 'pandas', 'a') as hdf:
+                hdf.append(key, data, format='table',
+                           data_columns=dataColumns, index=False,
+                           complib=complib, complevel=complevel,
+                           chunksize=chunksize, expectedrows=expectedRows)
         except:
             print("Unexpected error in put():", sys.exc_info()[0])
 
             if bstore.config.__Verbose__:
                 print(traceback.format_exc())
-        finally:
-            hdf.close()
 
     @staticmethod
     def readFromFile(filePath, **kwargs):
@@ -7,14 +7,20 @@ __version__ = bstore.config.__bstore_Version__
 
 # Be sure not to use the from ... import syntax to avoid cyclical imports!
 import bstore.database
-import h5py
 from numpy import array
 
 
 class TestType(bstore.database.Dataset):
     """A class for testing B-Store Datasets.
 
+    Attributes
+    ----------
+    HANDLETYPE : str
+        The type of open datastore file that get() and put() accept in place
+        of the file name: a h5py.File.
+
     """
+    HANDLETYPE = 'h5py'
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -50,7 +56,7 @@ class TestType(bstore.database.Dataset):
 
         Parameters
         ----------
-        datastore : str
+        datastore : str or h5py.File
             String containing the path to a B-Store HDF datastore.
         key      : str
             The HDF key pointing to the dataset locationin the HDF datastore.
@@ -61,7 +67,7 @@ class TestType(bstore.database.Dataset):
             The data retrieved from the HDF file.
 
         """
-        with h5py.File(datastore, 'r') as hdf:
+        with bstore.database.openHandle(datastore, 'h5py', 'r') as hdf:
             data = array(hdf.get(key))
 
         return data
@@ -71,14 +77,14 @@ class TestType(bstore.database.Dataset):
 
         Parameters
         ----------
-        datastore : str
+        datastore : str or h5py.File
             String containing the path to a B-Store HDF datastore.
         key      : str
             The HDF key pointing to the dataset locationin the HDF datastore.
 
         """
         # Writes the data in the dataset to the HDF file.
-        with h5py.File(datastore, 'a') as hdf:
+        with bstore.database.openHandle(datastore, 'h5py', 'a') as hdf:
             hdf.create_dataset(key, self.data.shape,
                                dtype='float64', data=self.data)
 
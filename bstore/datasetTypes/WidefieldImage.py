@@ -12,7 +12,7 @@ import re
 import json
 from matplotlib.pyplot import imread
 from tifffile import TiffFile
-from numpy import array
+from numpy import array, memmap
 
 """Decorators
 -------------------------------------------------------------------------------
@@ -47,7 +47,7 @@ def putWidefieldImageWithMicroscopyTiffTags(writeImageData):
 
         Parameters
         ----------
-        datastore : str
+        datastore : str or h5py.File
             String containing the path to a B-Store HDF datastore.
         key : str
             The HDF key pointing to the dataset location in the HDF datastore.
@@ -61,7 +61,7 @@ def putWidefieldImageWithMicroscopyTiffTags(writeImageData):
             # image in the Tiff file.
             tags = dict(self.data.pages[0].tags.items())
             widefieldPixelSize = None
-            with h5py.File(datastore, mode='a') as hdf:
+            with bstore.database.openHandle(datastore, 'h5py', 'a') as hdf:
                 dt = h5py.special_dtype(vlen=str)
 
                 # Start by writing just the OME-XML
@@ -139,10 +139,68 @@ def putWidefieldImageWithMicroscopyTiffTags(writeImageData):
 """
 
 
+class LazyImage:
+    """Read-only view of an image in a datastore that is read when sliced.
+
+    Only the elements that are selected by indexing the view are read from the
+    file, e.g. lazyImg[10] reads only the eleventh frame of a stack and
+    lazyImg[:, 0:64, 0:64] reads a region of interest from every frame. The
+    whole image is read when the view is converted to a NumPy array.
+
+    Parameters
+    ----------
+    datastore : str
+        String containing the path to a B-Store HDF datastore.
+    key       : str
+        The HDF key pointing to the image data in the HDF datastore.
+
+    Attributes
+    ----------
+    dtype : NumPy dtype
+        The datatype of the image.
+    shape : tuple of int
+        The shape of the image.
+
+    """
+
+    def __init__(self, datastore, key):
+        self._datastore = datastore
+        self._key = key
+
+        with h5py.File(datastore, mode='r') as file:
+            self.dtype = file[key].dtype
+            self.shape = file[key].shape
+
+    def __array__(self, dtype=None, copy=None):
+        img = self[()]
+        return img if dtype is None else img.astype(dtype)
+
+    def __getitem__(self, item):
+        with h5py.File(self._datastore, mode='r') as file:
+            return file[self._key][item]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return 'LazyImage(shape={}, dtype={})'.format(self.shape, self.dtype)
+
+    @property
+    def ndim(self):
+        return len(self.shape)
+
+
 class WidefieldImage(bstore.database.Dataset):
     """Contains the average trajectory of many fiducial markers.
 
+    Attributes
+    ----------
+    HANDLETYPE : str
+        The type of open datastore file that get() and put() accept in place
+        of the file name: a h5py.File.
+
     """
+    HANDLETYPE = 'h5py'
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -166,6 +224,34 @@ class WidefieldImage(bstore.database.Dataset):
         """
         return None
 
+    @staticmethod
+    def _chunkShape(shape, tileSize=256):
+        """Returns the default chunk shape for an image.
+
+        Each chunk holds a tile of at most tileSize x tileSize pixels from a
+        single frame, so reading a frame or a region of interest only
+        decompresses the tiles that it overlaps.
+
+        Parameters
+        ----------
+        shape    : tuple of int
+            The shape of the image. The last two axes are y and x.
+        tileSize : int
+            The maximum height and width of a tile.
+
+        Returns
+        -------
+        chunks : tuple of int or True
+            The chunk shape. True, i.e. h5py's automatic chunking, is returned
+            for images with fewer than two dimensions.
+
+        """
+        if len(shape) < 2:
+            return True
+
+        frameShape = tuple(max(1, min(size, tileSize)) for size in shape[-2:])
+        return (1,) * (len(shape) - 2) + frameShape
+
     @property
     def datasetType(self):
         """This should be set to the same name as the class.
@@ -173,36 +259,71 @@ class WidefieldImage(bstore.database.Dataset):
         """
         return 'WidefieldImage'
 
-    def get(self, datastore, key, **kwargs):
+    def get(self, datastore, key, lazy=False, **kwargs):
         """Returns a dataset from the datastore.
 
         Parameters
         ----------
-        datastore : str
+        datastore : str or h5py.File
             String containing the path to a B-Store HDF datastore.
-        key      : str
+        key       : str
             The HDF key pointing to the dataset location in the HDF datastore.
+        lazy      : bool
+            If True, the image is not read into memory. Contiguous,
+            uncompressed images are returned as read-only memory-mapped
+            arrays; all others are returned as a LazyImage that reads only
+            the slices that are requested from it.
 
         Returns
         -------
-        data : NumPy array
+        data : NumPy array, memmap, or LazyImage
             The image data contained in the datastore.
         """
         key += '/image_data'
-        with h5py.File(datastore, mode='r') as file:
-            img = array(file[key])
-            return img
+        with bstore.database.openHandle(datastore, 'h5py', 'r') as file:
+            if not lazy:
+                img = array(file[key])
+                return img
+
+            # Lazy images are read through their own handles, so make sure
+            # that everything written through this one is on disk.
+            filename = file.filename
+            if file.mode != 'r':
+                file.flush()
+
+            # The offset is None when the data is chunked or not yet allocated
+            offset = file[key].id.get_offset()
+            if offset is not None and file[key].compression is None:
+                return memmap(filename, mode='r', dtype=file[key].dtype,
+                              shape=file[key].shape, offset=offset)
+
+        return LazyImage(filename, key)
 
     @putWidefieldImageWithMicroscopyTiffTags
-    def put(self, datastore, key, **kwargs):
+    def put(self, datastore, key, chunks=True, compression=None,
+            compressionOpts=None, shuffle=False, **kwargs):
         """Puts the data into the datastore.
 
         Parameters
         ----------
-        datastore           : str
+        datastore          : str or h5py.File
             String containing the path to a B-Store HDF datastore.
         key                : str
             The HDF key pointing to the dataset location in the HDF datastore.
+        chunks             : bool or tuple of int
+            The shape of the chunks in which the image is stored. If True,
+            every frame is split into tiles of at most 256 x 256 pixels. If
+            False, the image is stored contiguously, which cannot be
+            compressed but may be memory-mapped by get().
+        compression        : str or None
+            The compression filter, e.g. 'gzip' or 'lzf'. No compression is
+            used if None.
+        compressionOpts    : int or None
+            Options for the compression filter, e.g. the level from 0 to 9 for
+            'gzip'.
+        shuffle            : bool
+            Apply the byte shuffle filter before compression? This often
+            improves the compression of 16-bit camera images.
         widefieldPixelSize : 2-tuple of float or None
             The x- and y-size of a widefield pixel in microns. This
             informationis used to write attributes to the widefield image for
@@ -211,10 +332,19 @@ class WidefieldImage(bstore.database.Dataset):
         """
         key += '/image_data'
 
-        with h5py.File(datastore, mode='a') as hdf:
+        if chunks is True:
+            chunks = self._chunkShape(self.data.shape)
+        elif chunks is False:
+            chunks = None
+
+        with bstore.database.openHandle(datastore, 'h5py', 'a') as hdf:
             hdf.create_dataset(key,
                                self.data.shape,
-                               data=self.data)
+                               data=self.data,
+                               chunks=chunks,
+                               compression=compression,
+                               compression_opts=compressionOpts,
+                               shuffle=shuffle)
 
             if ('widefieldPixelSize' in kwargs) \
                     and (kwargs['widefieldPixelSize']):
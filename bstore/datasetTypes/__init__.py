@@ -1,5 +1,6 @@
 __all__ = [
             'AverageFiducial',
+            'CalibrationCurves',
             'FiducialTracks',
             'Localizations',
             'LocMetadata',
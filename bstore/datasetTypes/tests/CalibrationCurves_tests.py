@@ -0,0 +1,108 @@
+# © All rights reserved. ECOLE POLYTECHNIQUE FEDERALE DE LAUSANNE,
+# Switzerland, Laboratory of Experimental Biophysics, 2016-2018
+# See the LICENSE.txt file for more details.
+
+"""Unit tests for the CalibrationCurves dataset type.
+
+Notes
+-----
+nosetests should be run in the B-Store parent directory.
+
+"""
+
+from nose.tools                    import assert_equal, ok_
+
+# Register the type
+from bstore  import config
+config.__Registered_DatasetTypes__.append('CalibrationCurves')
+
+from bstore.datasetTypes.CalibrationCurves import CalibrationCurves
+from bstore                        import database as db
+from bstore                        import processors as proc
+from pathlib                       import Path
+from os                            import remove
+from os.path                       import exists
+
+import numpy as np
+import numpy.testing as npt
+
+testDataRoot = Path(config.__Path_To_Test_Data__)
+
+# Lookup tables with different grids
+fx = proc.LookupTable(np.linspace(-800, 800, 101),
+                      0.0005 * (np.linspace(-800, 800, 101) - 150)**2 + 150)
+fy = proc.LookupTable(np.linspace(-600, 600, 51),
+                      0.0005 * (np.linspace(-600, 600, 51) + 150)**2 + 150)
+
+def test_calibrationCurves_Instantiation():
+    """CalibrationCurves is properly instantiated.
+
+    """
+    # Make up some dataset IDs
+    dsIDs           = {}
+    dsIDs['prefix'] = 'test_prefix'
+    dsIDs['acqID']  = 1
+
+    CalibrationCurves(datasetIDs = dsIDs)
+
+def test__repr__():
+    """DatasetType generates the correct __repr__ string.
+
+    """
+    dsIDs           = {}
+    dsIDs['prefix'] = 'test_prefix'
+
+    ds = CalibrationCurves(datasetIDs = dsIDs)
+
+    assert_equal(
+        ds.__repr__(),
+        'CalibrationCurves: {\'prefix\': \'test_prefix\'}')
+
+def test_calibrationCurves_DataFrame_Round_Trip():
+    """Curves are converted to a table and back without changes.
+
+    """
+    df = CalibrationCurves.toDataFrame((fx, fy))
+    assert_equal(list(df.columns), ['curve', 'x', 'y'])
+    assert_equal(len(df), len(fx.x) + len(fy.x))
+
+    newFx, newFy = CalibrationCurves.toCurves(df)
+    npt.assert_array_equal(newFx.x, fx.x)
+    npt.assert_array_equal(newFx.y, fx.y)
+    npt.assert_array_equal(newFy.x, fy.x)
+    npt.assert_array_equal(newFy.y, fy.y)
+
+def test_calibrationCurves_Put_Get_Data():
+    """CalibrationCurves can put and get its own data.
+
+    """
+    try:
+        # Make up some dataset IDs and a dataset
+        dsIDs           = {}
+        dsIDs['prefix'] = 'test_prefix'
+        dsIDs['acqID']  = 1
+        ds      = CalibrationCurves(datasetIDs = dsIDs)
+        ds.data = (fx, fy)
+
+        pathToDB = testDataRoot
+        # Remove datastore if it exists
+        if exists(str(pathToDB / Path('test_db.h5'))):
+            remove(str(pathToDB / Path('test_db.h5')))
+
+        with db.HDFDatastore(pathToDB / Path('test_db.h5')) as myDB:
+            myDB.put(ds)
+
+        myNewDSID = db.DatasetID('test_prefix', 1, 'CalibrationCurves', None,
+                                 None, None, None, None, None)
+        myNewDS = myDB.get(myNewDSID)
+        assert_equal(myNewDS.datasetType, 'CalibrationCurves')
+        assert_equal(len(myNewDS.data), 2)
+        ok_(isinstance(myNewDS.data[0], proc.LookupTable))
+
+        # The curves retrieved from the datastore compute the same z-positions
+        z = np.array([-550, -100.5, 0, 42, 600])
+        npt.assert_array_equal(myNewDS.data[0](z), fx(z))
+        npt.assert_array_equal(myNewDS.data[1](z), fy(z))
+    finally:
+        # Remove the test datastore
+        remove(str(pathToDB / Path('test_db.h5')))
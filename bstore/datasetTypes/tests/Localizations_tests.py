@@ -26,6 +26,7 @@ from pathlib                       import Path
 from os                            import remove
 from os.path                       import exists
 
+import numpy as np
 import pandas as pd
 import h5py
 
@@ -211,3 +212,197 @@ def test_HDF_Datastore_Query_with_Localizations():
     
     # Remove test datastore file
     remove(str(dbName))
+        
+def test_Put_Data_Storage_Options():
+    """Compression, data columns and downcasting are applied by put().
+    
+    """
+    try:
+        dsIDs           = {}
+        dsIDs['prefix'] = 'test_prefix'
+        dsIDs['acqID']  = 1
+        ds      = Localizations(datasetIDs = dsIDs)
+        ds.data = pd.DataFrame({'x' : [1.5, 2.5], 'y' : [3.5, 4.5]})
+        
+        pathToDB = testDataRoot
+        # Remove datastore if it exists
+        if exists(str(pathToDB / Path('test_db.h5'))):
+            remove(str(pathToDB / Path('test_db.h5')))
+        
+        # Per-datastore options are overridden by those passed to put()
+        storageOptions = {'Localizations' : {'complib' : 'zlib',
+                                             'complevel' : 9,
+                                             'downcast' : False}}
+        with db.HDFDatastore(pathToDB / Path('test_db.h5'),
+                             storageOptions = storageOptions) as myDB:
+            myDB.put(ds, dataColumns = ['x'], downcast = True)
+        
+        key = 'test_prefix/test_prefix_1/Localizations'
+        with pd.HDFStore(str(pathToDB / Path('test_db.h5')), 'r') as store:
+            storer = store.get_storer(key)
+            assert_equal(storer.data_columns, ['x'])
+            assert_equal(store._handle.get_node('/' + key + '/table').filters.complib,
+                         'zlib')
+        
+        df = pd.read_hdf(str(pathToDB / Path('test_db.h5')), key = key)
+        assert_equal(df['x'].dtype, 'float32')
+        assert_equal(df.loc[1, 'y'], 4.5)
+    finally:
+        # Remove the test datastore
+        remove(str(pathToDB / Path('test_db.h5')))
+        
+def test_Put_Data_Expected_Rows():
+    """expectedRows sets the shape of the HDF5 chunks of the table.
+    
+    """
+    pathToDB = testDataRoot / Path('test_db.h5')
+    try:
+        # Remove datastore if it exists
+        if exists(str(pathToDB)):
+            remove(str(pathToDB))
+        
+        with db.HDFDatastore(pathToDB) as myDB:
+            for acqID, expectedRows in [(1, None), (2, 10000000)]:
+                ds      = Localizations(datasetIDs = {'prefix' : 'test_prefix',
+                                                      'acqID'  : acqID})
+                ds.data = pd.DataFrame({'x' : [1.5, 2.5], 'y' : [3.5, 4.5]})
+                myDB.put(ds, expectedRows = expectedRows)
+        
+        chunkshapes = []
+        with pd.HDFStore(str(pathToDB), 'r') as store:
+            for acqID in [1, 2]:
+                key = '/test_prefix/test_prefix_{0:d}/Localizations/table'
+                chunkshapes.append(
+                    store._handle.get_node(key.format(acqID)).chunkshape[0])
+        ok_(chunkshapes[1] > chunkshapes[0])
+        
+        df = pd.read_hdf(str(pathToDB),
+                         key = 'test_prefix/test_prefix_2/Localizations')
+        assert_equal(df.loc[1, 'y'], 4.5)
+    finally:
+        # Remove the test datastore
+        remove(str(pathToDB))
+        
+def test_HDF_Datastore_Get_Where_Columns():
+    """Row filters and column selections are passed to the table query.
+    
+    """
+    try:
+        dsIDs           = {}
+        dsIDs['prefix'] = 'test_prefix'
+        dsIDs['acqID']  = 1
+        ds      = Localizations(datasetIDs = dsIDs)
+        ds.data = pd.DataFrame({'frame'     : [1, 2, 3, 4],
+                                'precision' : [10.0, 40.0, 20.0, 50.0],
+                                'x'         : [1.0, 2.0, 3.0, 4.0]})
+        
+        pathToDB = testDataRoot
+        # Remove datastore if it exists
+        if exists(str(pathToDB / Path('test_db.h5'))):
+            remove(str(pathToDB / Path('test_db.h5')))
+        
+        with db.HDFDatastore(pathToDB / Path('test_db.h5')) as myDB:
+            myDB.put(ds)
+        
+        myDB  = db.HDFDatastore(pathToDB / Path('test_db.h5'))
+        dsID  = myDB.query()[0]
+        data  = myDB.get(dsID, where = 'frame > 1 & precision < 30',
+                         columns = ['frame', 'x']).data
+        
+        assert_equal(list(data.columns), ['frame', 'x'])
+        assert_equal(data['frame'].tolist(), [3])
+        assert_equal(data['x'].tolist(), [3.0])
+    finally:
+        # Remove the test datastore
+        remove(str(pathToDB / Path('test_db.h5')))
+        
+def test_HDF_Datastore_IterChunks():
+    """Localizations may be read from the datastore in chunks of rows.
+    
+    """
+    try:
+        dsIDs           = {}
+        dsIDs['prefix'] = 'test_prefix'
+        dsIDs['acqID']  = 1
+        ds      = Localizations(datasetIDs = dsIDs)
+        ds.data = pd.DataFrame({'frame' : np.arange(10),
+                                'x'     : np.arange(10) * 1.5})
+        
+        pathToDB = testDataRoot
+        # Remove datastore if it exists
+        if exists(str(pathToDB / Path('test_db.h5'))):
+            remove(str(pathToDB / Path('test_db.h5')))
+        
+        with db.HDFDatastore(pathToDB / Path('test_db.h5')) as myDB:
+            myDB.put(ds)
+        
+        myDB   = db.HDFDatastore(pathToDB / Path('test_db.h5'))
+        dsID   = myDB.query()[0]
+        chunks = list(myDB.iterChunks(dsID, chunksize = 4, columns = ['x']))
+        
+        assert_equal([len(chunk) for chunk in chunks], [4, 4, 2])
+        assert_equal(list(chunks[0].columns), ['x'])
+        ok_(pd.concat(chunks)['x'].equals(ds.data['x']))
+    finally:
+        # Remove the test datastore
+        remove(str(pathToDB / Path('test_db.h5')))
+        
+def test_HDF_Datastore_Put_Get_Same_Session():
+    """Localizations are put and read back inside one with...as block.
+    
+    """
+    try:
+        ds      = Localizations(datasetIDs = {'prefix' : 'test_prefix',
+                                              'acqID'  : 1})
+        ds.data = pd.DataFrame({'frame' : [1, 2, 3], 'x' : [1.0, 2.0, 3.0]})
+        
+        pathToDB = testDataRoot
+        # Remove datastore if it exists
+        if exists(str(pathToDB / Path('test_db.h5'))):
+            remove(str(pathToDB / Path('test_db.h5')))
+        
+        with db.HDFDatastore(pathToDB / Path('test_db.h5')) as myDB:
+            myDB.put(ds)
+            dsID = myDB.query()[0]
+            data = myDB.get(dsID, where = 'frame > 1').data
+            ok_(isinstance(myDB._handles['pandas'], pd.HDFStore))
+            assert_equal(len(myDB.query()), 1)
+        
+        assert_equal(data['x'].tolist(), [2.0, 3.0])
+    finally:
+        # Remove the test datastore
+        remove(str(pathToDB / Path('test_db.h5')))
+        
+def test_HDF_Datastore_GetMany_Concat():
+    """Many Localizations are read into one DataFrame indexed by their IDs.
+    
+    """
+    try:
+        ds1      = Localizations(datasetIDs = {'prefix' : 'test_prefix',
+                                               'acqID'  : 1,
+                                               'posID'  : (0, 1)})
+        ds2      = Localizations(datasetIDs = {'prefix' : 'test_prefix',
+                                               'acqID'  : 2,
+                                               'posID'  : (0, 1)})
+        ds1.data = pd.DataFrame({'frame' : [1, 2], 'x' : [1.0, 2.0]})
+        ds2.data = pd.DataFrame({'frame' : [3],    'x' : [3.0]})
+        
+        pathToDB = testDataRoot
+        # Remove datastore if it exists
+        if exists(str(pathToDB / Path('test_db.h5'))):
+            remove(str(pathToDB / Path('test_db.h5')))
+        
+        with db.HDFDatastore(pathToDB / Path('test_db.h5')) as myDB:
+            dsIDs = myDB.putMany([ds1, ds2])
+        
+        myDB = db.HDFDatastore(pathToDB / Path('test_db.h5'))
+        df   = myDB.getMany(dsIDs, concat = True, columns = ['x'])
+        
+        assert_equal(list(df.columns), ['x'])
+        assert_equal(df['x'].tolist(), [1.0, 2.0, 3.0])
+        assert_equal(df.index.get_level_values('acqID').tolist(), [1, 1, 2])
+        assert_equal(df.index.get_level_values('posID')[0], (0, 1))
+        assert_equal(df.xs(2, level = 'acqID')['x'].tolist(), [3.0])
+    finally:
+        # Remove the test datastore
+        remove(str(pathToDB / Path('test_db.h5')))
@@ -27,6 +27,7 @@ from os                                 import remove
 from os.path                            import exists
 from matplotlib.pyplot                  import imread
 import bstore.parsers as parsers
+import numpy as np
 import h5py
 
 testDataRoot = Path(config.__Path_To_Test_Data__)
@@ -397,3 +398,72 @@ def test_WidefieldImage_Datastore_Query():
     
     # Remove test datastore file
     remove(str(dbName))
+        
+def test_Get_Data_Lazy():
+    """Contiguous images are memory-mapped when lazy is True.
+    
+    """
+    pathToDB = testDataRoot / Path('test_db.h5')
+    if exists(str(pathToDB)):
+        remove(str(pathToDB))
+    
+    ds = WidefieldImage(datasetIDs = {'prefix' : 'test_prefix', 'acqID' : 1})
+    ds.data = np.arange(4 * 8 * 8, dtype = 'uint16').reshape((4, 8, 8))
+    try:
+        with db.HDFDatastore(pathToDB) as myDB:
+            myDB.put(ds, chunks = False)
+        
+        dsID = myDB.query(datasetType = 'WidefieldImage')[0]
+        img  = myDB.get(dsID, lazy = True).data
+        ok_(isinstance(img, np.memmap))
+        ok_(np.array_equal(img[2, 1:3], ds.data[2, 1:3]))
+        del(img)
+    finally:
+        remove(str(pathToDB))
+        
+def test_Get_Data_Lazy_Compressed():
+    """Compressed images are read slice by slice when lazy is True.
+    
+    """
+    pathToDB = testDataRoot / Path('test_db.h5')
+    if exists(str(pathToDB)):
+        remove(str(pathToDB))
+    
+    data = np.arange(4 * 8 * 8, dtype = 'uint16').reshape((4, 8, 8))
+    key  = 'test_prefix/test_prefix_1/WidefieldImage'
+    try:
+        with h5py.File(str(pathToDB), 'w') as hdf:
+            hdf.create_dataset(key + '/image_data', data = data,
+                               chunks = (1, 8, 8), compression = 'gzip')
+        
+        img = WidefieldImage().get(str(pathToDB), key, lazy = True)
+        ok_(not isinstance(img, np.ndarray))
+        assert_equal(img.shape, (4, 8, 8))
+        ok_(np.array_equal(img[1, :, 2:4], data[1, :, 2:4]))
+        ok_(np.array_equal(np.asarray(img), data))
+    finally:
+        remove(str(pathToDB))
+        
+def test_Put_Data_Chunks_Compression():
+    """Images are stored in tiles of single frames and may be compressed.
+    
+    """
+    pathToDB = testDataRoot / Path('test_db.h5')
+    if exists(str(pathToDB)):
+        remove(str(pathToDB))
+    
+    ds = WidefieldImage(datasetIDs = {'prefix' : 'test_prefix', 'acqID' : 1})
+    ds.data = np.zeros((3, 300, 100), dtype = 'uint16')
+    try:
+        with db.HDFDatastore(pathToDB) as myDB:
+            myDB.put(ds, compression = 'gzip', compressionOpts = 4,
+                     shuffle = True)
+        
+        key = 'test_prefix/test_prefix_1/WidefieldImage/image_data'
+        with h5py.File(str(pathToDB), 'r') as hdf:
+            assert_equal(hdf[key].chunks, (1, 256, 100))
+            assert_equal(hdf[key].compression, 'gzip')
+            assert_equal(hdf[key].compression_opts, 4)
+            ok_(hdf[key].shuffle)
+    finally:
+        remove(str(pathToDB))
@@ -6,7 +6,6 @@ import pathlib
 from bstore import config
 from abc import ABCMeta, abstractmethod, abstractproperty
 from os.path import splitext
-import importlib
 import sys
 import tkinter as tk
 import bstore.database as db
@@ -195,9 +194,7 @@ class PositionParser(Parser):
             # Extract the ids
             idDict = self._parse(rootName)
 
-            mod = importlib.import_module('bstore.datasetTypes.{0:s}'.format(
-                datasetType))
-            dType = getattr(mod, datasetType)
+            dType = db.datasetTypeInfo(datasetType).cls
             self.dataset = dType(datasetIDs=idDict)
 
             # Read the data from file
@@ -440,9 +437,7 @@ class SimpleParser(Parser):
             # Build the return dataset
             idDict = {'prefix': prefix, 'acqID': acqID}
 
-            mod = importlib.import_module(
-                'bstore.datasetTypes.{0:s}'.format(datasetType))
-            dType = getattr(mod, datasetType)
+            dType = db.datasetTypeInfo(datasetType).cls
             self.dataset = dType(datasetIDs=idDict)
 
             # Read the data from file
@@ -7,15 +7,20 @@ import trackpy as tp
 import numpy as np
 import matplotlib.pyplot as plt
 import re
+import itertools
 from abc import ABCMeta, abstractmethod, abstractproperty
 from sklearn.cluster import DBSCAN
+from sklearn.neighbors import KDTree
 from operator import *
 from scipy.signal import gaussian
 from scipy.ndimage import filters
 from scipy.interpolate import UnivariateSpline, interp1d
 from scipy.optimize import minimize
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from matplotlib.widgets import RectangleSelector
 from bstore import config
+from bstore import _utils
 from bstore.parsers import FormatMap
 import warnings
 
@@ -526,6 +531,9 @@ class CalibrateAstigmatism(SelectLocalizations):
         Algorithm for computing astigmatic calibration curves.
     wobbleComputer: ComputeTrajectories
         Algorithm for computing wobble calibration curves.
+    lutSize   : int
+        The number of points in the lookup tables of the calibration and
+        wobble curves.
         
     Attributes
     ----------
@@ -535,11 +543,11 @@ class CalibrateAstigmatism(SelectLocalizations):
         although this is not always reliable.
     astigmatismComputer: AstigComputer
         Algorithm for computing astigmatic calibration curves.
-    calibrationCurves : func, func
+    calibrationCurves : LookupTable, LookupTable
         The calibration curves for astigmatic 3D imaging. The first
         element contains the PSF width in x as a function of z and
         the second contains the width in y as a function of z.
-    wobbleCurves : func, func
+    wobbleCurves : LookupTable, LookupTable
         The wobble curves for astigmatic 3D imaging. These map the PSF centroid
         positions as a function of z. See Ref. 1 for more information.
         
@@ -551,10 +559,12 @@ class CalibrateAstigmatism(SelectLocalizations):
     """
     def __init__(self, interactiveSearch=True, coordCols=['x', 'y'],
                  sigmaCols=['sigma_x', 'sigma_y'], zCol='z', startz=None,
-                 stopz=None, astigmatismComputer=None, wobbleComputer=None):
+                 stopz=None, astigmatismComputer=None, wobbleComputer=None,
+                 lutSize=2001):
         self.interactiveSearch = interactiveSearch
         self.calibrationCurves = None
         self.wobbleCurves      = None
+        self.lutSize           = lutSize
         
         self._coordCols = coordCols
         self._sigmaCols = sigmaCols
@@ -634,10 +644,10 @@ class CalibrateAstigmatism(SelectLocalizations):
         
         Returns
         -------
-        fx : func
+        fx : LookupTable
             The calibration curve that returns the the width in x as
             a function of z.
-        fy : func
+        fy : LookupTable
             The calibration curve that returns the the width in y as
             a function of z.
         
@@ -647,11 +657,15 @@ class CalibrateAstigmatism(SelectLocalizations):
         
         
         fx = interp1d(zPos, xS, kind='cubic', bounds_error=False,
-                      fill_value=np.NaN, assume_sorted=False)
+                      fill_value=np.nan, assume_sorted=False)
         fy = interp1d(zPos, yS, kind='cubic', bounds_error=False,
-                      fill_value=np.NaN, assume_sorted=False)
+                      fill_value=np.nan, assume_sorted=False)
         
-        return fx, fy
+        # The cubic interpolation is sampled finely enough that the linear
+        # interpolation of the lookup tables does not change it
+        zMin, zMax = np.min(zPos), np.max(zPos)
+        return (LookupTable.fromFunction(fx, zMin, zMax, num=self.lutSize),
+                LookupTable.fromFunction(fy, zMin, zMax, num=self.lutSize))
     
 
 class CleanUp:
@@ -709,13 +723,38 @@ class Cluster:
         The neighborhood radius defining a cluster.
     coordCols  : list of str
         The columns of the data to be clustered in the format ['x', 'y'].
+    algorithm  : str
+        Either 'sklearn', which uses scikit-learn's DBSCAN, or 'grid', which
+        sorts the localizations into a grid of cells with a side length of
+        eps and compares only localizations in adjacent cells. Both give
+        identical labels; 'grid' needs less memory and is usually faster
+        for 2D and 3D localizations.
+    tileSize   : float
+        If not None, the field of view is split into square tiles of this
+        size in the first two coordinates, which are clustered one at a time
+        together with a border of width 2 * eps around them. The clusters of
+        all tiles are then joined where they overlap. The labels are identical
+        to those of clustering all localizations at once, but the memory and
+        time needed for each tile depend only on the localizations inside it.
+        Tiles should be much larger than eps.
+    workers    : int
+        The number of processes that cluster tiles in parallel. If None,
+        the tiles are clustered by the calling process. Only used if
+        tileSize is not None.
 
     """
 
-    def __init__(self, minSamples=50, eps=20, coordCols=['x', 'y']):
+    def __init__(self, minSamples=50, eps=20, coordCols=['x', 'y'],
+                 algorithm='sklearn', tileSize=None, workers=None):
+        if algorithm not in ('sklearn', 'grid'):
+            raise ValueError('Unknown algorithm: {:s}'.format(algorithm))
+
         self._minSamples = minSamples
         self._eps = eps
         self._coordCols = coordCols
+        self._algorithm = algorithm
+        self._tileSize = tileSize
+        self._workers = workers
 
     def __call__(self, df):
         """Group the localizations into spatial clusters.
@@ -739,11 +778,21 @@ class Cluster:
         columnsToCluster = self._coordCols
 
         # Setup and perform the clustering
-        db = DBSCAN(min_samples=self._minSamples, eps=self._eps)
-        db.fit(df[columnsToCluster])
+        if self._tileSize:
+            labels = _dbscanTiled(df[columnsToCluster].values,
+                                  self._minSamples, self._eps, self._tileSize,
+                                  workers=self._workers,
+                                  algorithm=self._algorithm)
+        elif self._algorithm == 'grid':
+            labels = _dbscanGrid(df[columnsToCluster].values,
+                                 self._minSamples, self._eps)
+        else:
+            db = DBSCAN(min_samples=self._minSamples, eps=self._eps)
+            db.fit(df[columnsToCluster])
+            labels = db.labels_
 
         # Get the cluster labels and make it a Pandas Series
-        clusterLabels = pd.Series(db.labels_, name='cluster_id')
+        clusterLabels = pd.Series(labels, name='cluster_id')
 
         # Append the labels to the DataFrame
         procdf = pd.concat([df, clusterLabels], axis=1)
@@ -965,7 +1014,9 @@ class ComputeZPosition:
     ----------
     zFunc         : func
         Function(s) mapping the PSF widths onto Z. Supply this 
-        argument as a tuple in the order (fx, fy).
+        argument as a tuple in the order (fx, fy). Each function must have
+        an attribute x containing the z-positions that it spans, like the
+        LookupTables produced by CalibrateAstigmatism.
     zCol          : str
         The name to assign to the new column of z-positions.
     coordCols     : list of str
@@ -978,7 +1029,10 @@ class ComputeZPosition:
         String indicating the type of fit to use when deriving the z-positions.
         Can be either 'huang', which minimizes a distance-like objective
         function, or 'diff', which interpolates a curve based on the difference
-        between PSF widths in x and y.
+        between PSF widths in x and y. 'huang' finds the minimum for all
+        localizations at once on a grid of z-positions; 'huang_minimize'
+        runs a separate minimization for every localization instead and is
+        much slower. It is kept as a reference.
     scalingFactor : float
         A scaling factor that multiples the computed z-values to account for
         a refractive index mismatch at the coverslip. See [1] for more details.
@@ -987,6 +1041,23 @@ class ComputeZPosition:
     wobbleFunc    : func
         Function(s) mapping the PSF centroids onto Z. Supply this 
         argument as a tuple in the order (fx, fy). See [2] for more details.
+    zSamples      : int
+        The number of z-positions at which the calibration curves are
+        sampled when fittype='huang'.
+    refine        : bool
+        If True and fittype='huang', the z-position of each localization is
+        refined between the grid points by fitting a parabola to the
+        objective function at the nearest grid point and its neighbors.
+    inplace       : bool
+        If True, the z-positions and wobble corrections are added to the
+        input DataFrame instead of to a copy of it, so that no more memory
+        than that of the new columns is needed.
+    blockSize     : int
+        The number of localizations whose z-positions and wobble corrections
+        are computed at once. The intermediate arrays of each step are only as
+        large as a block, except for the distances of the huang fit, which
+        are computed for at most 2**20 / zSamples localizations at a time.
+        None computes all localizations at once.
         
     References
     ----------
@@ -994,9 +1065,14 @@ class ComputeZPosition:
     2. Carlini, et al., PLoS One 10(11):e0142949 (2015).
     
     """
+    # The maximum number of values in the array of distances of the huang
+    # fit, i.e. 8 MB of float64 per array
+    _distanceBudget = 2**20
+    
     def __init__(self, zFunc, zCol='z', coordCols=['x', 'y'],
                  sigmaCols=['sigma_x, sigma_y'],
-                 fittype='diff', scalingFactor=1, wobbleFunc = None):
+                 fittype='diff', scalingFactor=1, wobbleFunc = None,
+                 zSamples=1000, refine=True, inplace=False, blockSize=10000):
         self.zFunc         = zFunc
         self.zCol          = zCol
         self.coordCols     = coordCols
@@ -1004,14 +1080,26 @@ class ComputeZPosition:
         self.fittype       = fittype
         self.scalingFactor = scalingFactor
         self.wobbleFunc    = wobbleFunc
+        self.zSamples      = zSamples
+        self.refine        = refine
+        self.inplace       = inplace
+        self.blockSize     = blockSize
         
         # This is the calibration curve computed when fittype='diff' and is
         # used internally for error checking and testing.
         self._f = None
+        
+        # The calibration compiled for the current fittype and zFunc, which
+        # is reused by every call until either of them changes.
+        self._compiled = None
     
     def __call__(self, df):
         """ Applies zFunc to the localizations to produce the z-positions.
         
+        The z-positions and wobble corrections are computed from the columns'
+        arrays in blocks of blockSize localizations. Unless inplace is True,
+        they are added to a copy of df.
+        
         Parameters
         ----------
         df : DataFrame
@@ -1023,22 +1111,40 @@ class ComputeZPosition:
             A DataFrame object with the same information but new column names.
             
         """
-        x, y   = self.sigmaCols
-        fx, fy = self.zFunc
-        
         if self.fittype == 'diff':
-            procdf = self._diff(df, x, y, fx, fy)
+            zFit = self._diff
         elif self.fittype == 'huang':
-            procdf = self._huang(df, x, y, fx, fy)
-            
-        procdf[self.zCol] *= self.scalingFactor
+            zFit = self._huang
+        elif self.fittype == 'huang_minimize':
+            zFit = self._huangMinimize
+        else:
+            raise ValueError('Unknown fittype: {:s}'.format(self.fittype))
+        
+        procdf = df if self.inplace else df.copy()
+        
+        x, y   = self.sigmaCols
+        wx, wy = procdf[x].values, procdf[y].values
+        
+        z = np.empty(len(procdf))
+        for block in self._blocks(len(procdf)):
+            z[block] = zFit(wx[block], wy[block])
+        z *= self.scalingFactor
+        procdf[self.zCol] = z
         
         if self.wobbleFunc:
             procdf = self._wobble(procdf)
             
         return procdf
     
-    def _diff(self, df, x, y, fx, fy):
+    def _blocks(self, numLocs):
+        """Yields slices over the localizations of at most blockSize rows.
+        
+        """
+        blockSize = self.blockSize if self.blockSize else max(numLocs, 1)
+        for start in range(0, numLocs, blockSize):
+            yield slice(start, start + blockSize)
+    
+    def _diff(self, wx, wy):
         """Determines the z-position from the difference in x- and y-widths.
         
         In this approach, the two calibration curves are sampled, subtracted
@@ -1047,40 +1153,160 @@ class ComputeZPosition:
         the PSF widths in x and y.
         
         In general, it is much faster than the optimization routine used in
-        Huang et al., Science 2008.
+        Huang et al., Science 2008. The reinterpolated curve is a LookupTable
+        that is compiled once for each set of calibration curves.
+        
+        Parameters
+        ----------
+        wx : array of float
+            The PSF widths in x.
+        wy : array of float
+            The PSF widths in y.
+        
+        Returns
+        -------
+        array of float
+            The z-positions.
         
         """
-        df = df.copy() #  Prevents overwriting input DataFrame
+        f = self._compile(self._compileDiff)
+        self._f = f
+        
+        # Compute the z-positions from this interpolated curve
+        return f(wx - wy)
+    
+    def _compile(self, compiler):
+        """Returns the compiled calibration, compiling it only if necessary.
+        
+        The result of compiler(fx, fy) is cached together with the
+        calibration curves and the settings it was compiled from and reused
+        until one of them changes. Since the cache is pickled with the
+        processor, copies of it that are sent to other processes do not
+        compile the calibration again either.
+        
+        """
+        fx, fy = self.zFunc
+        key    = (compiler.__name__, self.zSamples)
+        cached = getattr(self, '_compiled', None)
+        if cached is None or cached[0] != key \
+                or cached[1] is not fx or cached[2] is not fy:
+            cached = (key, fx, fy, compiler(fx, fy))
+            self._compiled = cached
+        
+        return cached[3]
+    
+    def _compileDiff(self, fx, fy):
+        """Compiles the z-position as a function of the width difference.
+        
+        The two calibration curves are sampled and subtracted from one
+        another, and the z-positions of the samples are resampled into a
+        LookupTable on a uniform grid of width differences.
         
+        """
         # Get minimum and maximum z-positions contained in calibration curves.
         # This is required to define the bounds on the sampling domain.
         zMin, zMax = np.min([fx.x, fy.x]), np.max([fx.x, fy.x])
         zSamples = np.linspace(zMin, zMax, num=150)
         
-        # Create the function representing the difference between calibration
-        # curves.
-        def dW(fx, fy):
-            return lambda z: fx(z) - fy(z)
+        dW = np.broadcast_to(fx(zSamples) - fy(zSamples), zSamples.shape)
+        return LookupTable.fromSamples(dW, zSamples)
+    
+    def _compileHuang(self, fx, fy):
+        """Samples the square roots of the calibration curves on a z-grid.
         
-        f = interp1d(dW(fx, fy)(zSamples), zSamples, bounds_error=False,
-                     fill_value=np.NaN, assume_sorted=False)
-        self._f = f
+        """
+        # Sample the calibration curves; some callables return scalars
+        zMin, zMax = np.min([fx.x, fy.x]), np.max([fx.x, fy.x])
+        zGrid  = np.linspace(zMin, zMax, num=self.zSamples)
+        sx = np.sqrt(np.broadcast_to(fx(zGrid), zGrid.shape))
+        sy = np.sqrt(np.broadcast_to(fy(zGrid), zGrid.shape))
         
-        # Compute the z-positions from this interpolated curve
-        locWidths = df[x] - df[y]
-        z = f(locWidths)
+        # Keep the samples where both curves are defined
+        valid = np.isfinite(sx) & np.isfinite(sy)
+        return zGrid[valid], sx[valid], sy[valid]
+    
+    def _huang(self, wx, wy):
+        """Determines the z-position by objective minimization on a z-grid.
         
-        df[self.zCol] = z
-        return df
+        The square roots of both calibration curves are sampled once at
+        zSamples points spanning the calibration. The distance of every
+        localization to every sample is then computed, and the z-position of
+        the nearest sample is chosen. This finds the global minimum of the
+        objective function of Huang et al., Science 2008 to within the grid
+        spacing, which is narrowed further by parabolic interpolation if
+        refine is True. The distances are computed for as many
+        localizations at a time as fit into _distanceBudget values, however
+        large the block that __call__ passes.
+        
+        Parameters
+        ----------
+        wx : array of float
+            The PSF widths in x.
+        wy : array of float
+            The PSF widths in y.
+        
+        Returns
+        -------
+        array of float
+            The z-positions.
+        
+        """
+        zGrid, sx, sy = self._compile(self._compileHuang)
+        
+        with np.errstate(invalid='ignore'):
+            wx = np.sqrt(np.asarray(wx, dtype=float))
+            wy = np.sqrt(np.asarray(wy, dtype=float))
+        
+        z = np.full(len(wx), np.nan)
+        rowsPerChunk = max(1, self._distanceBudget // max(len(sx), 1))
+        for start in range(0, len(wx), rowsPerChunk):
+            stop = start + rowsPerChunk
+            bx, by = wx[start:stop], wy[start:stop]
+            
+            # The squared distance has the same minimum as the distance
+            dist = (bx[:, None] - sx)**2 + (by[:, None] - sy)**2
+            rows = np.arange(dist.shape[0])
+            index = np.argmin(dist, axis=1)
+            zChunk = zGrid[index]
+            
+            if self.refine and len(zGrid) > 2:
+                # Vertex of the parabola through the neighboring samples
+                i = np.clip(index, 1, len(zGrid) - 2)
+                dm, d0, dp = dist[rows, i - 1], dist[rows, i], dist[rows, i + 1]
+                curvature = dm - 2 * d0 + dp
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    offset = 0.5 * (dm - dp) / curvature
+                interior = (index == i) & (curvature > 0)
+                offset = np.clip(np.where(interior, offset, 0), -1, 1)
+                zChunk = zChunk + offset * (zGrid[i + 1] - zGrid[i - 1]) / 2
+            
+            # Localizations with invalid widths have no z-position
+            zChunk[~(np.isfinite(bx) & np.isfinite(by))] = np.nan
+            z[start:stop] = zChunk
+        
+        return z
     
-    def _huang(self, df, x, y, fx, fy):
+    def _huangMinimize(self, wx, wy):
         """Determines the z-position by objective minimization.
         
-        This routine can be very slow, especially for large datasets. It is
-        recommended to try it on a very slow dataset first.
+        A separate minimization is run for each localization, so this routine
+        can be very slow, especially for large datasets. It is kept as a
+        reference for fittype='huang'.
+        
+        Parameters
+        ----------
+        wx : array of float
+            The PSF widths in x.
+        wy : array of float
+            The PSF widths in y.
+        
+        Returns
+        -------
+        array of float
+            The z-positions.
         
         """
-        df = df.copy() # Prevents overwriting input DataFrame
+        fx, fy = self.zFunc
         
         # Create the objective function for the distance between the data and
         # calibration curves.
@@ -1093,8 +1319,8 @@ class ComputeZPosition:
             res = minimize(lambda z: D(z, wx, wy), [0], bounds=[(-600,600)])
             return res.x[0]
         
-        df[self.zCol] = df.apply(lambda row: fmin(row[x], row[y]), axis=1)
-        return df
+        return np.array([fmin(currWx, currWy)
+                         for currWx, currWy in zip(wx, wy)], dtype=float)
     
     def _wobble(self, df):
         """Corrects localizations for wobble.
@@ -1104,6 +1330,10 @@ class ComputeZPosition:
         correct for an axial dependence of the centriod position. It then
         applies these corrections and returns the processed DataFrame.
         
+        The corrections are computed in blocks of blockSize localizations and
+        the DataFrame is modified in place; only the new columns dx and dy and
+        the corrected coordinate columns are allocated.
+        
         Parameters
         ----------
         df : DataFrame
@@ -1115,18 +1345,20 @@ class ComputeZPosition:
             The wobble-corrected DataFrame.
         
         """
-        df     = df.copy() # Prevents overwriting input DataFrame
         x, y   = self.coordCols
-        zLocs  = df[self.zCol]
+        zLocs  = df[self.zCol].values
         fx, fy = self.wobbleFunc
         
-        xc = fx(zLocs)
-        yc = fy(zLocs)
+        xc = np.empty(len(df))
+        yc = np.empty(len(df))
+        for block in self._blocks(len(df)):
+            xc[block] = fx(zLocs[block])
+            yc[block] = fy(zLocs[block])
         
         df['dx'] = xc
         df['dy'] = yc
-        df[x] = df[x] - xc
-        df[y] = df[y] - yc
+        df[x] = df[x].values - xc
+        df[y] = df[y].values - yc
         
         return df
 
@@ -2160,6 +2392,118 @@ class Filter:
         return procdf
 
 
+class LookupTable:
+    """A function sampled on a uniform grid and interpolated linearly.
+
+    Because the grid is uniform, the grid point to the left of a value is
+    found by index arithmetic instead of a search, so the table is evaluated
+    in a few vectorized operations. It contains only two arrays and is
+    therefore quick to pickle and to send to other processes. Values outside
+    the grid return NaN.
+
+    Parameters
+    ----------
+    x : array of float
+        The uniformly spaced, increasing grid.
+    y : array of float
+        The function values at the points in x.
+
+    Attributes
+    ----------
+    x : array of float
+    y : array of float
+
+    """
+    def __init__(self, x, y):
+        x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        if x.ndim != 1 or x.shape != y.shape or len(x) < 2:
+            raise ValueError('x and y must be one-dimensional arrays of the '
+                             'same length with at least two points.')
+
+        step = (x[-1] - x[0]) / (len(x) - 1)
+        if not step > 0 or not np.allclose(np.diff(x), step, rtol=1e-6,
+                                           atol=0):
+            raise ValueError('x must be uniformly spaced and increasing.')
+
+        self.x = x
+        self.y = y
+
+    def __call__(self, values):
+        """Interpolates the table at the given values.
+
+        Parameters
+        ----------
+        values : float or array of float
+
+        Returns
+        -------
+        array of float
+
+        """
+        values = np.asarray(values, dtype=float)
+        xMin, xMax, maxIndex = self.x[0], self.x[-1], len(self.x) - 1
+
+        # Position of each value in units of the grid spacing; NaNs and values
+        # outside the grid are mapped to the first point and masked below
+        inside = (values >= xMin) & (values <= xMax)
+        t = np.where(inside, values - xMin, 0) * (maxIndex / (xMax - xMin))
+        t = np.clip(t, 0, maxIndex)
+
+        i    = np.minimum(t.astype(np.intp), maxIndex - 1)
+        frac = t - i
+        result = self.y[i] * (1 - frac) + self.y[i + 1] * frac
+        return np.where(inside, result, np.nan)
+
+    @classmethod
+    def fromFunction(cls, f, xMin, xMax, num=2001):
+        """Samples a function at num uniformly spaced points.
+
+        Parameters
+        ----------
+        f    : func
+        xMin : float
+        xMax : float
+        num  : int
+
+        Returns
+        -------
+        LookupTable
+
+        """
+        x = np.linspace(xMin, xMax, num=num)
+        return cls(x, np.broadcast_to(f(x), x.shape))
+
+    @classmethod
+    def fromSamples(cls, x, y, num=4096):
+        """Resamples unordered samples of a function onto a uniform grid.
+
+        Samples that are not finite are ignored. Between the samples, the
+        function is interpolated linearly. This is used to invert a sampled
+        function by swapping its x- and y-values.
+
+        Parameters
+        ----------
+        x   : array of float
+        y   : array of float
+        num : int
+            The number of points in the table.
+
+        Returns
+        -------
+        LookupTable
+
+        """
+        x, y  = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+        valid = np.isfinite(x) & np.isfinite(y)
+        if np.count_nonzero(valid) < 2:
+            raise ValueError('At least two finite samples are required.')
+        order = np.argsort(x[valid], kind='mergesort')
+        x, y  = x[valid][order], y[valid][order]
+
+        grid = np.linspace(x[0], x[-1], num=num)
+        return cls(grid, np.interp(grid, x, y))
+
+
 class Merge:
     """Merges nearby localizations in subsequent frames into one localization.
 
@@ -2381,6 +2725,503 @@ class MergeFangTS(MergeStats):
         return procdf
     
 
+"""Clustering engines
+-------------------------------------------------------------------------------
+"""
+
+
+def _dbscanGrid(coords, minSamples, eps, batchSize=2**20):
+    """Computes the DBSCAN labels of points with a grid of eps-sized cells.
+
+    The neighbors of the points are found by _neighborPairs() twice: first
+    to count the neighbors of every point, which determines the core points,
+    and then to join the core points into clusters. The links between core
+    points are reduced to a spanning forest after every batch, so that the
+    memory needed is proportional to the number of points instead of the
+    number of pairs of neighbors. The labels are identical to those of
+    sklearn.cluster.DBSCAN.
+
+    Parameters
+    ----------
+    coords     : array of float
+        The coordinates of the points, one row per point.
+    minSamples : int
+    eps        : float
+    batchSize  : int
+        The maximum number of candidate pairs whose distances are computed at
+        once.
+
+    Returns
+    -------
+    labels : array of int
+        The cluster label of each point; noise is labeled -1.
+
+    """
+    coords  = _finiteCoords(coords)
+    numLocs = len(coords)
+
+    # Every point is its own neighbor
+    counts = np.ones(numLocs, dtype=np.intp)
+    for i, j in _neighborPairs(coords, eps, batchSize):
+        counts += np.bincount(i, minlength=numLocs)
+        counts += np.bincount(j, minlength=numLocs)
+    isCore = counts >= minSamples
+    del counts
+
+    nodes, reps = [], []
+    numEdges, maxEdges = 0, 2 * max(numLocs, batchSize)
+    borders, borderCores = [], []
+    for i, j in _neighborPairs(coords, eps, batchSize):
+        coreI, coreJ = isCore[i], isCore[j]
+        link = coreI & coreJ
+        nodes.append(i[link])
+        reps.append(j[link])
+        numEdges += len(nodes[-1])
+
+        # Reduce the links to a forest when they outnumber the points
+        if numEdges > maxEdges:
+            forestNodes, forestReps = _spanningForest(
+                _concat(nodes), _concat(reps), numLocs)
+            nodes, reps = [forestNodes], [forestReps]
+            numEdges = len(forestNodes)
+            maxEdges = numEdges + 2 * max(numLocs, batchSize)
+
+        # Border points have fewer than minSamples neighbors
+        nextTo = coreI & ~coreJ
+        borders.extend([j[nextTo], i[coreJ & ~coreI]])
+        borderCores.extend([i[nextTo], j[coreJ & ~coreI]])
+
+    nodes, reps = _concat(nodes), _concat(reps)
+    graph = coo_matrix((np.ones(len(nodes), dtype=bool), (nodes, reps)),
+                       shape=(numLocs, numLocs))
+    _, roots = connected_components(graph, directed=False)
+
+    return _labelClusters(isCore, roots, _concat(borders),
+                          _concat(borderCores))
+
+
+def _spanningForest(i, j, numNodes):
+    """Links every node of a graph to one representative of its component.
+
+    Parameters
+    ----------
+    i        : array of int
+    j        : array of int
+        The nodes at both ends of the edges of the graph.
+    numNodes : int
+        The number of nodes, which are numbered from zero.
+
+    Returns
+    -------
+    nodes : array of int
+        The nodes with at least one edge.
+    reps  : array of int
+        The lowest node of the component of each node.
+
+    """
+    graph = coo_matrix((np.ones(len(i), dtype=bool), (i, j)),
+                       shape=(numNodes, numNodes))
+    _, comps = connected_components(graph, directed=False)
+
+    hasEdge = np.zeros(numNodes, dtype=bool)
+    hasEdge[i] = True
+    hasEdge[j] = True
+    nodes = np.flatnonzero(hasEdge)
+
+    # The last assignment wins, so the nodes are assigned in reverse order
+    lowest = np.empty(comps.max() + 1, dtype=np.intp)
+    lowest[comps[nodes[::-1]]] = nodes[::-1]
+    return nodes, lowest[comps[nodes]]
+
+
+def _neighborPairs(coords, eps, batchSize=2**20):
+    """Finds all pairs of points that are at most eps apart.
+
+    The points are sorted into a grid of cells with a side length of eps,
+    so that the neighbors of a point lie in its own or the adjacent cells.
+    Only half of the adjacent cells are compared with every cell, so that
+    every pair is found once.
+
+    Parameters
+    ----------
+    coords    : array of float
+        The coordinates of the points, one row per point.
+    eps       : float
+    batchSize : int
+        The maximum number of candidate pairs whose distances are computed at
+        once, unless a single pair of cells holds more.
+
+    Yields
+    ------
+    i : array of int
+    j : array of int
+        The indexes of the points of each pair, with i != j.
+
+    """
+    if len(coords) == 0:
+        return
+
+    # Smaller indexes halve the memory of the pairs
+    indexType = np.int32 if len(coords) < np.iinfo(np.int32).max \
+                else np.int64
+
+    # Cells are numbered in C order on a grid with an empty cell on each side
+    cells  = np.floor((coords - coords.min(axis=0)) / eps).astype(np.int64) + 1
+    extent = cells.max(axis=0) + 2
+    strides = np.concatenate([np.cumprod(extent[:0:-1])[::-1], [1]])
+    cellIDs = cells @ strides
+    del cells
+
+    order = np.argsort(cellIDs, kind='mergesort').astype(indexType)
+    points = [np.ascontiguousarray(coords[order, dim])
+              for dim in range(coords.shape[1])]
+    cellIDs = cellIDs[order]
+
+    # The points of each cell are contiguous after sorting
+    start = np.concatenate([[0], np.flatnonzero(np.diff(cellIDs)) + 1])
+    count = np.diff(np.append(start, len(cellIDs))).astype(indexType)
+    start = start.astype(indexType)
+    uniqueIDs = cellIDs[start]
+    del cellIDs
+
+    # Pairs of cells to compare: each cell with itself and half of its
+    # neighbors, whose first nonzero offset is positive
+    first  = [np.arange(len(uniqueIDs), dtype=indexType)]
+    second = [np.arange(len(uniqueIDs), dtype=indexType)]
+    dims = coords.shape[1]
+    for offset in itertools.product((-1, 0, 1), repeat=dims):
+        if offset <= (0,) * dims:
+            continue
+        target = uniqueIDs + np.dot(offset, strides)
+        index  = np.minimum(np.searchsorted(uniqueIDs, target),
+                            len(uniqueIDs) - 1)
+        found  = uniqueIDs[index] == target
+        first.append(np.flatnonzero(found).astype(indexType))
+        second.append(index[found].astype(indexType))
+    first, second = np.concatenate(first), np.concatenate(second)
+    del uniqueIDs
+
+    # The number of candidate pairs up to and including each pair of cells
+    ends = np.cumsum(count[first].astype(np.int64) * count[second])
+    eps2 = eps**2
+    begin = 0
+    while begin < len(first):
+        done = ends[begin - 1] if begin else 0
+        end  = max(np.searchsorted(ends, done + batchSize, side='right'),
+                   begin + 1)
+        cellsA, cellsB = first[begin:end], second[begin:end]
+        begin = end
+
+        # Enumerate all pairs of points of each pair of cells: every point
+        # of the first cell forms a row with all points of the second
+        sizeA, sizeB = count[cellsA], count[cellsB]
+        rowPoint = np.arange(sizeA.sum()) + np.repeat(
+            start[cellsA] - (np.cumsum(sizeA) - sizeA), sizeA)
+        rowSize  = np.repeat(sizeB, sizeA)
+        rowFirst = np.repeat(start[cellsB], sizeA) \
+                   - (np.cumsum(rowSize) - rowSize)
+        i = np.repeat(rowPoint, rowSize)
+        j = np.arange(len(i)) + np.repeat(rowFirst, rowSize)
+
+        # Pairs inside the same cell are counted once
+        same = np.repeat(np.repeat(cellsA == cellsB, sizeA), rowSize)
+        keep = ~same | (i < j)
+        i, j = i[keep], j[keep]
+
+        dist2 = (points[0][i] - points[0][j])**2
+        for dim in range(1, dims):
+            dist2 += (points[dim][i] - points[dim][j])**2
+        close = dist2 <= eps2
+
+        yield order[i[close]], order[j[close]]
+
+
+def _dbscanTiled(coords, minSamples, eps, tileSize, workers=None,
+                 algorithm='sklearn'):
+    """Computes the DBSCAN labels of points tile by tile.
+
+    The labels are identical to those of sklearn.cluster.DBSCAN, including
+    the numbering of the clusters, which follows the lowest index of their
+    core points, and the assignment of border points that are close to more
+    than one cluster to the cluster with the lowest label.
+
+    Parameters
+    ----------
+    coords     : array of float
+        The coordinates of the points, one row per point. Only the first two
+        columns are tiled.
+    minSamples : int
+    eps        : float
+    tileSize   : float
+    workers    : int
+        The number of processes that cluster tiles in parallel. If None,
+        the tiles are clustered by the calling process.
+    algorithm  : str
+        The neighbor search inside the tiles; either 'sklearn' for a KDTree
+        or 'grid' for the grid of _neighborPairs().
+
+    Returns
+    -------
+    labels : array of int
+        The cluster label of each point; noise is labeled -1.
+
+    """
+    coords   = _finiteCoords(coords)
+    numLocs  = len(coords)
+    isCore   = np.zeros(numLocs, dtype=bool)
+    members, comps, borders, borderCores = [], [], [], []
+    numComps = 0
+    for region, result in _clusterTiles(coords, minSamples, eps, tileSize,
+                                        workers, algorithm):
+        tileCores, tileMembers, tileComps, tileBorders, tileBorderCores = \
+            result
+        isCore[region[tileCores]] = True
+
+        # Components get node numbers after those of the points
+        members.append(region[tileMembers])
+        comps.append(numLocs + numComps + tileComps)
+        numComps += tileComps.max() + 1 if len(tileComps) else 0
+
+        borders.append(region[tileBorders])
+        borderCores.append(region[tileBorderCores])
+
+    # Join the components of different tiles that share core points
+    members, comps = _concat(members), _concat(comps)
+    numNodes = numLocs + numComps
+    graph = coo_matrix((np.ones(len(members), dtype=bool), (members, comps)),
+                       shape=(numNodes, numNodes))
+    _, roots = connected_components(graph, directed=False)
+
+    return _labelClusters(isCore, roots[:numLocs], _concat(borders),
+                          _concat(borderCores))
+
+
+def _labelClusters(isCore, roots, borders, borderCores):
+    """Numbers the clusters of core points and assigns the border points.
+
+    The clusters are numbered in the order of their first core point, and
+    border points next to several clusters are assigned to the cluster with
+    the lowest label, like in sklearn.cluster.DBSCAN.
+
+    Parameters
+    ----------
+    isCore      : array of bool
+        Which points are core points.
+    roots       : array of int
+        The same number for all core points of a cluster.
+    borders     : array of int
+    borderCores : array of int
+        Pairs of border points and the core points next to them.
+
+    Returns
+    -------
+    labels : array of int
+        The cluster label of each point; noise is labeled -1.
+
+    """
+    labels    = np.full(len(isCore), -1, dtype=np.intp)
+    cores     = np.flatnonzero(isCore)
+    coreRoots = roots[cores]
+    uniqueRoots, first = np.unique(coreRoots, return_index=True)
+    rank = np.empty(len(uniqueRoots), dtype=np.intp)
+    rank[np.argsort(first)] = np.arange(len(uniqueRoots))
+    labels[cores] = rank[np.searchsorted(uniqueRoots, coreRoots)]
+
+    # Border points belong to the first cluster that reaches them
+    borderLabels = np.full(len(isCore), np.iinfo(np.intp).max, dtype=np.intp)
+    np.minimum.at(borderLabels, borders, labels[borderCores])
+    labels[borders] = borderLabels[borders]
+
+    return labels
+
+
+def _finiteCoords(coords):
+    """Returns the coordinates as floats after checking that they are finite.
+
+    Like sklearn.cluster.DBSCAN, this raises a ValueError for NaN or
+    infinite coordinates, which would otherwise put every point into the
+    wrong tile or grid cell.
+
+    Parameters
+    ----------
+    coords : array of float
+        The coordinates of the points, one row per point.
+
+    Returns
+    -------
+    coords : array of float
+
+    """
+    coords = np.asarray(coords, dtype=float)
+    if not np.isfinite(coords).all():
+        raise ValueError('Input contains NaN or infinity; localizations '
+                         'without coordinates cannot be clustered.')
+
+    return coords
+
+
+def _concat(arrays):
+    """Concatenates a possibly empty list of arrays of indexes."""
+    return np.concatenate(arrays) if arrays else np.empty(0, dtype=np.intp)
+
+
+def _clusterTiles(coords, minSamples, eps, tileSize, workers=None,
+                  algorithm='sklearn'):
+    """Clusters the tiles of a set of points, possibly in parallel.
+
+    Yields
+    ------
+    region : array of int
+        The indexes of the points in the tile and its border.
+    result : tuple of array of int
+        The result of _clusterTile() for the tile.
+
+    """
+    jobs = _tiles(coords, eps, tileSize)
+    if not workers:
+        for region, owned, inner in jobs:
+            yield region, _clusterTile(coords[region], owned, inner,
+                                       minSamples, eps, algorithm)
+        return
+
+    jobs = ((region, (coords[region], owned, inner, minSamples, eps,
+                      algorithm))
+            for region, owned, inner in jobs)
+    for region, future in _utils.mapBounded(_clusterTile, jobs, workers):
+        yield region, future.result()
+
+
+def _tiles(coords, eps, tileSize):
+    """Splits points into square tiles with a border of width 2 * eps.
+
+    Each point is owned by exactly one tile. The points within eps of a tile
+    are the inner points of the tile; their neighbors are all inside the
+    border.
+
+    Yields
+    ------
+    region : array of int
+        The indexes of the points in the tile and its border.
+    owned  : array of bool
+        Which points of the region are owned by the tile.
+    inner  : array of bool
+        Which points of the region are within eps of the tile.
+
+    """
+    if len(coords) == 0:
+        return
+
+    xy     = coords[:, :2]
+    origin = xy.min(axis=0)
+    tileID = np.floor((xy - origin) / tileSize).astype(np.int64)
+    numX, numY = tileID.max(axis=0) + 1
+
+    # Points are sorted by x to find the columns of tiles, and each column
+    # by y to find the tiles inside it
+    xOrder = np.argsort(xy[:, 0], kind='mergesort')
+    xSorted = xy[xOrder, 0]
+    for i in range(numX):
+        xMin = origin[0] + i * tileSize
+        start = np.searchsorted(xSorted, xMin - 2 * eps, side='left')
+        stop  = np.searchsorted(xSorted, xMin + tileSize + 2 * eps,
+                                side='right')
+        column = xOrder[start:stop]
+        if not np.any(tileID[column, 0] == i):
+            continue
+
+        column  = column[np.argsort(xy[column, 1], kind='mergesort')]
+        ySorted = xy[column, 1]
+        for j in range(numY):
+            yMin  = origin[1] + j * tileSize
+            start = np.searchsorted(ySorted, yMin - 2 * eps, side='left')
+            stop  = np.searchsorted(ySorted, yMin + tileSize + 2 * eps,
+                                    side='right')
+            region = np.sort(column[start:stop])
+            owned  = (tileID[region, 0] == i) & (tileID[region, 1] == j)
+            if not np.any(owned):
+                continue
+
+            regionXY = xy[region]
+            inner = owned | (
+                (regionXY[:, 0] >= xMin - eps) &
+                (regionXY[:, 0] <= xMin + tileSize + eps) &
+                (regionXY[:, 1] >= yMin - eps) &
+                (regionXY[:, 1] <= yMin + tileSize + eps))
+            yield region, owned, inner
+
+
+def _clusterTile(points, owned, inner, minSamples, eps, algorithm='sklearn'):
+    """Finds the core points, clusters and border points of one tile.
+
+    Parameters
+    ----------
+    points     : array of float
+        The coordinates of the points in the tile and its border.
+    owned      : array of bool
+        Which points are owned by the tile.
+    inner      : array of bool
+        Which points are within eps of the tile.
+    minSamples : int
+    eps        : float
+    algorithm  : str
+        Either 'sklearn' or 'grid'.
+
+    Returns
+    -------
+    cores       : array of int
+        The owned core points.
+    members     : array of int
+        The core points of the clusters that contain owned core points.
+    comps       : array of int
+        The cluster of each member, numbered from zero.
+    borders     : array of int
+    borderCores : array of int
+        Pairs of owned border points and the core points next to them.
+
+    """
+    # The neighborhoods of the inner points lie entirely inside the region,
+    # so their core points are the same as for the whole dataset
+    innerIdx = np.flatnonzero(inner)
+    if algorithm == 'grid':
+        # Every pair is found once, so both directions and the points
+        # themselves are added to get the neighborhoods
+        pairs = list(_neighborPairs(points, eps))
+        first, second = _concat([i for i, _ in pairs]), \
+                        _concat([j for _, j in pairs])
+        rows = np.concatenate([innerIdx, first, second])
+        cols = np.concatenate([innerIdx, second, first])
+        keep = inner[rows]
+        rows, cols = rows[keep], cols[keep]
+        counts = np.bincount(rows, minlength=len(points))[innerIdx]
+    else:
+        neighbors = KDTree(points).query_radius(points[innerIdx], eps)
+        counts    = np.fromiter(map(len, neighbors), dtype=np.intp,
+                                count=len(innerIdx))
+        rows = np.repeat(innerIdx, counts)
+        cols = _concat(list(neighbors))
+
+    isCore = np.zeros(len(points), dtype=bool)
+    isCore[innerIdx[counts >= minSamples]] = True
+
+    # Every link between two core points with one of them owned is found
+    link  = isCore[rows] & isCore[cols]
+    graph = coo_matrix((np.ones(np.count_nonzero(link), dtype=bool),
+                        (rows[link], cols[link])),
+                       shape=(len(points), len(points)))
+    _, comps = connected_components(graph, directed=False)
+
+    # Clusters without owned core points are reported by other tiles
+    cores    = np.flatnonzero(isCore & owned)
+    reported = np.zeros(len(points), dtype=bool)
+    reported[comps[cores]] = True
+    members  = np.flatnonzero(isCore & reported[comps])
+    _, memberComps = np.unique(comps[members], return_inverse=True)
+
+    border = owned & ~isCore
+    nextTo = border[rows] & isCore[cols]
+    return cores, members, memberComps, rows[nextTo], cols[nextTo]
+
+
 """Exceptions
 -------------------------------------------------------------------------------
 """
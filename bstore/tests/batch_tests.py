@@ -13,7 +13,8 @@ nosetests should be run in the directory just above the `tests` folder.
 __author__ = 'Kyle M. Douglass'
 __email__ = 'kyle.m.douglass@gmail.com' 
 
-from nose.tools import assert_equal, ok_
+from nose.tools import assert_equal, ok_, raises
+from nose       import SkipTest
 from pathlib    import Path
 from bstore.batch import CSVBatchProcessor, HDFBatchProcessor
 from bstore       import processors as proc
@@ -177,3 +178,164 @@ def test_HDFBatchProcess_Go():
     assert_equal(info[5],            None)
     assert_equal(info[6],             [0])
     assert_equal(info[7],            None)
+    
+def test_HDFBatchProcessor_Go_Workers():
+    """Batch processor runs the pipeline in a pool of processes.
+    
+    """
+    outputDirWorkers = outputDir / Path('HDFBatch_workers_test_results/')
+    if outputDirWorkers.exists():
+        shutil.rmtree(str(outputDirWorkers))
+    
+    bp = HDFBatchProcessor(inputDB, pipeline,
+                           outputDirectory = outputDirWorkers)
+    failed = bp.go(workers = 2)
+    
+    assert_equal(failed, [])
+    for currDataset in bp.datasetList:
+        outputFile = outputDirWorkers / bp._genFileName(currDataset)
+        df = pd.read_csv(str(outputFile) + '.csv')
+        ok_(df['loglikelihood'].max() <= 800,
+            'Loglikelihood column has wrong values.')
+        ok_(Path(str(outputFile) + '.json').exists())
+    
+    shutil.rmtree(str(outputDirWorkers))
+    
+class FailOn():
+    """Raises an error when the pipeline is run on a chosen DataFrame.
+    
+    This is a class so that it can be sent to the worker processes.
+    
+    """
+    def __init__(self, df):
+        self.df = df
+    
+    def __call__(self, df):
+        if df['loglikelihood'].equals(self.df['loglikelihood']):
+            raise ValueError('Failed on purpose.')
+        return df
+
+@raises(ValueError)
+def test_HDFBatchProcessor_Go_Raises():
+    """Failures stop the batch when it is processed by this process.
+    
+    """
+    outputDirFailed = outputDir / Path('HDFBatch_failed_test_results/')
+    if outputDirFailed.exists():
+        shutil.rmtree(str(outputDirFailed))
+    
+    first = myDB.get(myDB.query('Localizations')[0]).data
+    bp    = HDFBatchProcessor(inputDB, [FailOn(first)],
+                              outputDirectory = outputDirFailed)
+    try:
+        bp.go()
+    finally:
+        shutil.rmtree(str(outputDirFailed))
+    
+def test_HDFBatchProcessor_Go_Collects_Failures():
+    """Datasets that fail in the workers are returned without stopping.
+    
+    """
+    outputDirFailed = outputDir / Path('HDFBatch_failed_test_results/')
+    if outputDirFailed.exists():
+        shutil.rmtree(str(outputDirFailed))
+    
+    first  = myDB.get(myDB.query('Localizations')[0]).data
+    bp     = HDFBatchProcessor(inputDB, [FailOn(first)],
+                               outputDirectory = outputDirFailed)
+    failed = bp.go(workers = 2)
+    
+    assert_equal(len(failed), 1)
+    assert_equal(failed[0][0], bp.datasetList[0])
+    ok_(isinstance(failed[0][1], ValueError))
+    
+    outputFile = outputDirFailed / bp._genFileName(bp.datasetList[1])
+    ok_(Path(str(outputFile) + '.csv').exists())
+    
+    shutil.rmtree(str(outputDirFailed))
+    
+def test_CSVBatchProcessor_Pipeline_Workers():
+    """The pipelined batch processor gives the same results as go().
+    
+    """
+    outputDirWorkers = outputDir / Path('CSVBatch_workers_test_results/')
+    if outputDirWorkers.exists():
+        shutil.rmtree(str(outputDirWorkers))
+    
+    bp = CSVBatchProcessor(pathToTestData, bpCSV.pipeline,
+                           useSameFolder   = False,
+                           suffix          = 'locResults.dat',
+                           outputDirectory = outputDirWorkers)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        bp.go(workers = 2, maxInFlight = 2)
+    
+    for file in bp.datasetList:
+        currRes = file.stem + '_processed.csv'
+        df = pd.read_csv(str(outputDirWorkers / Path(currRes)))
+        ok_(df.equals(pd.read_csv(str(outputDir / Path(currRes)))))
+    
+    shutil.rmtree(str(outputDirWorkers))
+    
+def test_HDFBatchProcessor_Go_HDF_Output():
+    """Batch processor puts all the results into one output datastore.
+    
+    """
+    outputDirHDFOut = outputDir / Path('HDFBatch_hdf_test_results/')
+    if outputDirHDFOut.exists():
+        shutil.rmtree(str(outputDirHDFOut))
+    
+    bp     = HDFBatchProcessor(inputDB, pipeline,
+                               outputDirectory = outputDirHDFOut)
+    failed = bp.go(outputFormat = 'hdf')
+    
+    assert_equal(failed, [])
+    outputDB = db.HDFDatastore(
+        outputDirHDFOut / Path('test_experiment_db_processed.h5'))
+    assert_equal(sorted(outputDB.query('Localizations')),
+                 sorted(bp.datasetList))
+    for currDataset in bp.datasetList:
+        df = outputDB.get(currDataset).data
+        ok_(df['loglikelihood'].max() <= 800,
+            'Loglikelihood column has wrong values.')
+    
+    shutil.rmtree(str(outputDirHDFOut))
+    
+def test_HDFBatchProcessor_Go_Columnar_Output():
+    """Batch processor writes parquet and feather files with their IDs.
+    
+    """
+    try:
+        import pyarrow.parquet as pq
+        import pyarrow.feather as feather
+    except ImportError:
+        raise SkipTest('pyarrow is not installed.')
+    
+    readers = {'parquet' : pq.read_table, 'feather' : feather.read_table}
+    for outputFormat, readTable in readers.items():
+        outputDirColumnar = outputDir / \
+            Path('HDFBatch_{:s}_test_results/'.format(outputFormat))
+        if outputDirColumnar.exists():
+            shutil.rmtree(str(outputDirColumnar))
+        
+        bp     = HDFBatchProcessor(inputDB, pipeline,
+                                   outputDirectory = outputDirColumnar)
+        failed = bp.go(outputFormat = outputFormat)
+        
+        assert_equal(failed, [])
+        for currDataset in bp.datasetList:
+            outputFile = outputDirColumnar / bp._genFileName(currDataset)
+            table = readTable('{0:s}.{1:s}'.format(str(outputFile),
+                                                    outputFormat))
+            
+            # The data round-trips through the file
+            gt = myDB.get(currDataset).data
+            for currProc in pipeline:
+                gt = currProc(gt)
+            ok_(table.to_pandas().equals(gt.reset_index(drop = True)))
+            
+            # The IDs are stored in the schema's metadata
+            ids = json.loads(table.schema.metadata[b'bstore'].decode('utf-8'))
+            assert_equal(ids, json.loads(json.dumps(currDataset._asdict())))
+        
+        shutil.rmtree(str(outputDirColumnar))
@@ -24,6 +24,7 @@ from pathlib      import Path
 from pandas       import DataFrame
 from numpy.random import rand
 from numpy        import array_equal
+import numpy as np
 from os           import remove
 import sys
 import pickle
@@ -435,24 +436,21 @@ def test_HDFDatastore_Persistent_State():
         myDS.build(
             parser, dsName.parent, filenameStrings, readTiffTags = False)
     
-    # Open the HDF file and read the state of the HDFDatastore object
+    # Read the state of the HDFDatastore object from a new instance
     # Also, delete the old HDFDatastore object
     del(myDS)
     with h5py.File(str(dsName), mode = 'r') as file:
-        serialObject = file[config.__Persistence_Key__]
-        
-        newDS = database.HDFDatastore('test')
-        newState = pickle.loads(serialObject.value)
-        newDS.__dict__.update(newState.__dict__)
+        # The IDs are kept in the index tables, not in a pickle
+        ok_(config.__Index_Key__ in file)
+        ok_(config.__Persistence_Key__ not in file)
         
+    newDS = database.HDFDatastore(dsName)
     assert_equal(len(newDS), 6)
     for ds in newDS:
         ok_(ds in gt, 'Error: DatasetID not found in Datastore')
         
     # Indexing works
     ok_(newDS[0] != newDS[1])
-    # The name of the new Dataset has not changed when reading the state
-    assert_equal(newDS._dsName, 'test')
     
     # The datastore contains all the ground truth datasets
     for dataset in gt:
@@ -674,3 +672,638 @@ def test_HDFDatastore_Build_With_Reader():
         remove(str(dsName))
         
     assert_equal(len(res), 6)
+        
+def test_HDFDatastore_Query_Uses_Index():
+    """HDFDatastore.query() reads the ID index written by put().
+    
+    """
+    dbName = testDataRoot / Path('database_test_files/myDB_Index.h5')
+    if dbName.exists():
+        remove(str(dbName))
+    
+    myDS  = TestType.TestType(datasetIDs = {'prefix' : 'Cos7', 'acqID' : 1,
+                                   'channelID' : 'A647', 'posID' : (0,)})
+    myDS2 = TestType.TestType(datasetIDs = {'prefix' : 'Cos7', 'acqID' : 2,
+                                   'dateID' : '2016-05-05', 'posID' : (1,2),
+                                   'sliceID' : 3, 'replicateID' : 4})
+    myDS.data  = data.as_matrix()
+    myDS2.data = data.as_matrix()
+    
+    with database.HDFDatastore(dbName) as myDB:
+        myDB.put(myDS)
+        myDB.put(myDS2)
+        
+    with h5py.File(str(dbName), 'r') as f:
+        ok_(config.__Index_Key__ + '/TestType' in f)
+        assert_equal(f[config.__Index_Key__ + '/TestType'].shape[0], 2)
+        
+    dsIDs = sorted(myDB.query('TestType'))
+    assert_equal(dsIDs[0], database.DatasetID('Cos7', 1, 'TestType', None,
+                                              'A647', None, (0,), None, None))
+    assert_equal(dsIDs[1], database.DatasetID('Cos7', 2, 'TestType', None,
+                                              None, '2016-05-05', (1,2), 3, 4))
+    
+    # Clean-up the file
+    if dbName.exists():
+        remove(str(dbName))
+        
+def test_HDFDatastore_Reindex():
+    """HDFDatastore.reindex() rebuilds the index of datastores without one.
+    
+    """
+    dbName = testDataRoot / Path('database_test_files/myDB_Reindex.h5')
+    if dbName.exists():
+        remove(str(dbName))
+    
+    myDS  = TestType.TestType(datasetIDs = {'prefix' : 'Cos7', 'acqID' : 1,
+                                   'channelID' : 'A647', 'posID' : (0,)})
+    myDS.data  = data.as_matrix()
+    
+    with database.HDFDatastore(dbName) as myDB:
+        myDB.put(myDS)
+        
+    # Simulate a datastore written before the index existed
+    with h5py.File(str(dbName), 'a') as f:
+        del(f[config.__Index_Key__])
+        
+    # query() falls back on searching the file
+    gt = myDB.query('TestType')
+    assert_equal(len(gt), 1)
+    
+    with myDB:
+        myDB.reindex()
+        
+    with h5py.File(str(dbName), 'r') as f:
+        ok_(config.__Index_Key__ + '/TestType' in f)
+    assert_equal(myDB.query('TestType'), gt)
+    
+    # Clean-up the file
+    if dbName.exists():
+        remove(str(dbName))
+        
+def test_HDFDatastore_Reindex_Unregistered_Types():
+    """Types that are not registered while indexing are indexed as well.
+    
+    """
+    dbName = testDataRoot / Path('database_test_files/myDB_Reindex.h5')
+    if dbName.exists():
+        remove(str(dbName))
+    
+    myDS  = TestType.TestType(datasetIDs = {'prefix' : 'Cos7', 'acqID' : 1})
+    myDS.data  = data.as_matrix()
+    myDS2 = TestType.TestType(datasetIDs = {'prefix' : 'Cos7', 'acqID' : 2})
+    myDS2.data = data.as_matrix()
+    
+    with database.HDFDatastore(dbName) as myDB:
+        myDB.putMany([myDS, myDS2])
+    
+    # Simulate a datastore written before the index existed that contains
+    # a dataset whose type cannot be found
+    with h5py.File(str(dbName), 'a') as f:
+        del(f[config.__Index_Key__])
+        f['Cos7/Cos7_2/TestType'].attrs[atomPre + 'datasetType'] = \
+            'NoSuchType'
+    
+    registeredTypes = list(config.__Registered_DatasetTypes__)
+    try:
+        config.__Registered_DatasetTypes__[:] = \
+            [t for t in registeredTypes if t != 'TestType']
+        with myDB:
+            myDB.reindex()
+    finally:
+        config.__Registered_DatasetTypes__[:] = registeredTypes
+    
+    with h5py.File(str(dbName), 'r') as f:
+        ok_(config.__Index_Key__ + '/TestType' in f)
+        ok_(f[config.__Index_Key__].attrs['partial'])
+    assert_equal(len(myDB.query('TestType')), 1)
+    
+    # The index is partial, so the file is searched for unindexed keys
+    with database.HDFDatastore(dbName) as myDB:
+        ok_(not myDB._keyIndexed)
+        keyExists, _, _ = myDB._checkKeyExistence(myDS2,
+                                                  raiseException = False)
+        ok_(keyExists)
+    
+    # Clean-up the file
+    if dbName.exists():
+        remove(str(dbName))
+        
+def test_HDFDatastore_PutMany():
+    """HDFDatastore.putMany() writes all datasets in one call.
+    
+    """
+    dbName = testDataRoot / Path('database_test_files/myDB_PutMany.h5')
+    if dbName.exists():
+        remove(str(dbName))
+    
+    datasets = []
+    for acqID in range(1, 4):
+        ds = TestType.TestType(datasetIDs = {'prefix' : 'Cos7',
+                                             'acqID' : acqID})
+        ds.data = data.as_matrix()
+        datasets.append(ds)
+    
+    with database.HDFDatastore(dbName) as myDB:
+        dsIDs = myDB.putMany(datasets)
+        
+    assert_equal(len(dsIDs), 3)
+    assert_equal(len(myDB), 3)
+    assert_equal(sorted(myDB.query('TestType')), sorted(dsIDs))
+    for dsID in dsIDs:
+        ok_(array_equal(myDB.get(dsID).data, data.as_matrix()))
+    
+    # Clean-up the file
+    if dbName.exists():
+        remove(str(dbName))
+        
+def test_HDFDatastore_PutMany_Rollback():
+    """Datasets whose IDs cannot be written are removed from the file.
+    
+    """
+    dbName = testDataRoot / Path('database_test_files/myDB_PutMany.h5')
+    if dbName.exists():
+        remove(str(dbName))
+    
+    datasets = []
+    for acqID in range(1, 3):
+        ds = TestType.TestType(datasetIDs = {'prefix' : 'Cos7',
+                                             'acqID' : acqID})
+        ds.data = data.as_matrix()
+        datasets.append(ds)
+    
+    def failingDumps(hdf = None):
+        raise OSError('unable to lock file')
+    
+    try:
+        myDB = database.HDFDatastore(dbName)
+        with myDB:
+            myDB.put(datasets[0])
+            
+            myDB._dumps = failingDumps
+            dsIDs = myDB.putMany(datasets[1:], raiseErrors = False)
+            del(myDB._dumps)
+            
+            assert_equal(dsIDs, [])
+            assert_equal(len(myDB), 1)
+            assert_equal(len(myDB.query('TestType')), 1)
+        
+        with h5py.File(str(dbName), 'r') as f:
+            ok_('Cos7/Cos7_2/TestType' not in f)
+        
+        # The dataset may be put again
+        with myDB:
+            myDB.put(datasets[1])
+        assert_equal(len(myDB.query('TestType')), 2)
+    finally:
+        if dbName.exists():
+            remove(str(dbName))
+        
+@raises(database.HDF5KeyExists)
+def test_HDFDatastore_PutMany_Duplicate_Keys():
+    """HDFDatastore.putMany() writes nothing when two keys are the same.
+    
+    """
+    dbName = testDataRoot / Path('database_test_files/myDB_PutMany.h5')
+    if dbName.exists():
+        remove(str(dbName))
+    
+    ds1 = TestType.TestType(datasetIDs = {'prefix' : 'Cos7', 'acqID' : 1})
+    ds2 = TestType.TestType(datasetIDs = {'prefix' : 'Cos7', 'acqID' : 1})
+    ds1.data = data.as_matrix()
+    ds2.data = data.as_matrix()
+    
+    try:
+        with database.HDFDatastore(dbName) as myDB:
+            myDB.putMany([ds1, ds2])
+    finally:
+        ok_(not dbName.exists())
+        
+def test_HDFDatastore_Persistent_State_Migration():
+    """The pickled state of older HDFDatastores is read and then replaced.
+    
+    """
+    dbName = testDataRoot / Path('database_test_files/myDB_Migration.h5')
+    if dbName.exists():
+        remove(str(dbName))
+    
+    ds1 = TestType.TestType(datasetIDs = {'prefix' : 'Cos7', 'acqID' : 1})
+    ds2 = TestType.TestType(datasetIDs = {'prefix' : 'Cos7', 'acqID' : 2})
+    ds1.data = data.as_matrix()
+    ds2.data = data.as_matrix()
+    
+    with database.HDFDatastore(dbName) as myDB:
+        myDB.put(ds1)
+    gt = list(myDB)
+    
+    # Replace the index with the pickled state of older versions
+    oldDB = database.HDFDatastore.__new__(database.HDFDatastore)
+    oldDB.__dict__.update({'widefieldPixelSize' : (0.108, 0.108),
+                           '_datasets'          : gt,
+                           '_persistenceKey'    : config.__Persistence_Key__})
+    with h5py.File(str(dbName), mode = 'a') as file:
+        del(file[config.__Index_Key__])
+        file[config.__Persistence_Key__] = np.void(pickle.dumps(oldDB))
+    
+    myDB = database.HDFDatastore(dbName)
+    assert_equal(list(myDB), gt)
+    assert_equal(myDB.widefieldPixelSize, (0.108, 0.108))
+    
+    # The next write replaces the pickle with the index
+    with myDB:
+        myDB.put(ds2)
+    with h5py.File(str(dbName), mode = 'r') as file:
+        ok_(config.__Index_Key__ in file)
+        ok_(config.__Persistence_Key__ not in file)
+        
+    newDB = database.HDFDatastore(dbName)
+    assert_equal(len(newDB), 2)
+    assert_equal(newDB.widefieldPixelSize, (0.108, 0.108))
+    
+    # Clean-up the file
+    if dbName.exists():
+        remove(str(dbName))
+        
+def test_HDFDatastore_Build_With_Workers():
+    """HDFDatastore.build() parses files in a pool of worker processes.
+    
+    """
+    dsName = testDataRoot / Path(('parsers_test_files/SimpleParser/'
+                                  'test_id_collection_temp.h5'))
+    if dsName.exists():
+        remove(str(dsName))
+    
+    temp = config.__Registered_DatasetTypes__.copy()
+    config.__Registered_DatasetTypes__ = [
+        'Localizations', 'LocMetadata', 'WidefieldImage']   
+        
+    parser = parsers.SimpleParser()
+    filenameStrings = {
+        'Localizations'  : '.csv',
+        'LocMetadata'    : '.txt',
+        'WidefieldImage' : '.tif'}
+    
+    with database.HDFDatastore(dsName) as myDS:
+        res = myDS.build(parser, dsName.parent, filenameStrings,
+                         workers = 2, readTiffTags = False)
+        
+    assert_equal(len(res), 6)
+    assert_equal(len(myDS), 6)
+    assert_equal(len(myDS.query('LocMetadata')), 2)
+        
+    config.__Registered_DatasetTypes__ = temp
+    if dsName.exists():
+        remove(str(dsName))
+        
+def test_HDFDatastore_Build_Incremental():
+    """Incremental builds skip files that are already in the datastore.
+    
+    """
+    dsName = testDataRoot / Path(('parsers_test_files/SimpleParser/'
+                                  'test_id_collection_temp.h5'))
+    if dsName.exists():
+        remove(str(dsName))
+    
+    temp = config.__Registered_DatasetTypes__.copy()
+    config.__Registered_DatasetTypes__ = [
+        'Localizations', 'LocMetadata', 'WidefieldImage']   
+        
+    parser = parsers.SimpleParser()
+    filenameStrings = {
+        'Localizations'  : '.csv',
+        'LocMetadata'    : '.txt',
+        'WidefieldImage' : '.tif'}
+    
+    with database.HDFDatastore(dsName) as myDS:
+        myDS.build(parser, dsName.parent, {'Localizations' : '.csv'},
+                   readTiffTags = False)
+    assert_equal(len(myDS), 2)
+    
+    # Without incremental=True, the Localizations would raise errors
+    with database.HDFDatastore(dsName) as myDS:
+        res = myDS.build(parser, dsName.parent, filenameStrings,
+                         incremental = True, readTiffTags = False)
+        
+    assert_equal(len(res), 4)
+    ok_('Localizations' not in res['datasetType'].values)
+    assert_equal(len(myDS), 6)
+        
+    config.__Registered_DatasetTypes__ = temp
+    if dsName.exists():
+        remove(str(dsName))
+    
+@raises(database.DatasetTypeError)
+def test_HDFDatastore_IterChunks_Not_Supported():
+    """iterChunks() raises an error for types that cannot be read in chunks.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_IterChunks.h5')
+    if dsName.exists():
+        remove(str(dsName))
+    
+    t    = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 1})
+    t.data = np.array([1, 2, 3])
+    try:
+        with database.HDFDatastore(dsName) as myDS:
+            myDS.put(t)
+        
+        myDS.iterChunks(myDS.query(datasetType = 'TestType')[0])
+    finally:
+        remove(str(dsName))
+    
+def test_HDFDatastore_Handle_Cache():
+    """Open files are reused inside a with...as block and closed on exit.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_Handles.h5')
+    if dsName.exists():
+        remove(str(dsName))
+    
+    t1 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 1})
+    t2 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 2})
+    t1.data, t2.data = np.array([1, 2, 3]), np.array([4, 5, 6])
+    try:
+        with database.HDFDatastore(dsName) as myDS:
+            myDS.putMany([t1, t2])
+            
+            dsIDs  = myDS.query(datasetType = 'TestType')
+            handle = myDS._handles['h5py']
+            data   = [myDS.get(dsID).data for dsID in dsIDs]
+            ok_(myDS._handles['h5py'] is handle)
+        
+        ok_(myDS._handles is None)
+        ok_(not handle)
+        ok_(array_equal(data[0], t1.data))
+        ok_(array_equal(data[1], t2.data))
+        
+        # Outside of the with...as block, files are opened once per call
+        openHandle = database._openHandle
+        opened     = []
+        def countingOpenHandle(*args, **kwargs):
+            opened.append(args)
+            return openHandle(*args, **kwargs)
+        
+        myDS._keys, myDS._indexedTypes
+        database._openHandle = countingOpenHandle
+        try:
+            ok_(array_equal(myDS.get(dsIDs[0]).data, t1.data))
+        finally:
+            database._openHandle = openHandle
+        assert_equal(len(opened), 1)
+        ok_(myDS._handles is None)
+    finally:
+        remove(str(dsName))
+    
+def test_HDFDatastore_Read_Only():
+    """Read-only datastores read without locking the file and cannot write.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_ReadOnly.h5')
+    if dsName.exists():
+        remove(str(dsName))
+    
+    t1 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 1})
+    t1.data = np.array([1, 2, 3])
+    try:
+        with database.HDFDatastore(dsName) as myDS:
+            myDS.put(t1)
+        
+        reader = database.HDFDatastore(dsName, readOnly = True)
+        with reader:
+            ok_(not reader._lock.is_locked)
+            dsID = reader.query(datasetType = 'TestType')[0]
+            ok_(array_equal(reader.get(dsID).data, t1.data))
+            
+            # The file is not kept open between reads
+            ok_(reader._handles is None)
+            
+            try:
+                reader.put(t1)
+                ok_(False, 'FileIsReadOnly was not raised.')
+            except database.FileIsReadOnly:
+                pass
+        
+        assert_equal(len(reader), 1)
+    finally:
+        remove(str(dsName))
+        
+def test_HDFDatastore_Read_Locked_File():
+    """Reads of a file that stays locked raise instead of returning nothing.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_ReadOnly.h5')
+    if dsName.exists():
+        remove(str(dsName))
+    
+    t1 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 1})
+    t1.data = np.array([1, 2, 3])
+    
+    def lockedHandle(*args, **kwargs):
+        raise OSError('unable to lock file')
+    
+    try:
+        with database.HDFDatastore(dsName) as myDS:
+            myDS.put(t1)
+        
+        reader = database.HDFDatastore(dsName, readOnly = True)
+        reader._handle = lockedHandle
+        for read in [len, lambda ds: ds.select(), lambda ds: ds._keys]:
+            try:
+                read(reader)
+                ok_(False, 'OSError was not raised.')
+            except OSError:
+                pass
+    finally:
+        remove(str(dsName))
+        
+def test_HDFDatastore_GetMany():
+    """HDFDatastore.getMany() returns the datasets in the order requested.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_GetMany.h5')
+    if dsName.exists():
+        remove(str(dsName))
+    
+    t1 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 1})
+    t2 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 2})
+    t1.data, t2.data = np.array([1, 2, 3]), np.array([4, 5, 6])
+    try:
+        with database.HDFDatastore(dsName) as myDS:
+            dsIDs = myDS.putMany([t1, t2])
+        
+        datasets = myDS.getMany(dsIDs[::-1])
+        ok_(myDS._handles is None)
+        assert_equal(len(datasets), 2)
+        assert_equal(datasets[0].datasetIDs['acqID'], 2)
+        ok_(array_equal(datasets[0].data, t2.data))
+        ok_(array_equal(datasets[1].data, t1.data))
+    finally:
+        remove(str(dsName))
+    
+@raises(database.HDF5KeyDoesNotExist)
+def test_HDFDatastore_GetMany_Missing_Key():
+    """HDFDatastore.getMany() raises an error when a dataset is missing.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_GetMany.h5')
+    if dsName.exists():
+        remove(str(dsName))
+    
+    t1 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 1})
+    t1.data = np.array([1, 2, 3])
+    try:
+        with database.HDFDatastore(dsName) as myDS:
+            dsIDs = myDS.putMany([t1])
+        
+        missing = dsIDs[0]._replace(acqID = 2)
+        myDS.getMany([dsIDs[0], missing])
+    finally:
+        remove(str(dsName))
+    
+def test_HDFDatastore_Select():
+    """HDFDatastore.select() filters the dataset IDs by their fields.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_Select.h5')
+    if dsName.exists():
+        remove(str(dsName))
+    
+    datasets = []
+    for acqID, channelID, dateID in [(1, 'A647', '2016-03-01'),
+                                     (2, 'A647', '2016-04-01'),
+                                     (3, 'A750', '2016-03-15')]:
+        ds = TestType.TestType(datasetIDs = {'prefix'    : 'HeLa',
+                                             'acqID'     : acqID,
+                                             'channelID' : channelID,
+                                             'dateID'    : dateID})
+        ds.data = np.array([1, 2, 3])
+        datasets.append(ds)
+    try:
+        with database.HDFDatastore(dsName) as myDS:
+            myDS.putMany(datasets)
+        
+        df = myDS.select('TestType', channelID = 'A647')
+        assert_equal(df['acqID'].tolist(), [1, 2])
+        
+        df = myDS.select('TestType', acqID = [1, 3],
+                         dateID = lambda d: d[5:7] == '03')
+        assert_equal(df['acqID'].tolist(), [1, 3])
+        
+        df = myDS.select(channelID = 'A750')
+        assert_equal(len(df), 1)
+        assert_equal(database.DatasetID(*df.iloc[0]).acqID, 3)
+        
+        assert_equal(len(myDS.select('TestType', channelID = 'A488')), 0)
+    finally:
+        remove(str(dsName))
+        
+@raises(database.DatasetIDError)
+def test_HDFDatastore_Select_Unknown_Field():
+    """HDFDatastore.select() raises an error for unknown ID fields.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_Select.h5')
+    database.HDFDatastore(dsName).select('TestType', colorID = 'A647')
+        
+def test_DatasetTypeInfo():
+    """datasetTypeInfo() looks up the class of a DatasetType only once.
+    
+    """
+    info = database.datasetTypeInfo('TestType')
+    
+    ok_(info.cls is TestType.TestType)
+    assert_equal(info.attributeOf, None)
+    assert_equal(info.handleType, 'h5py')
+    assert_equal(info.internalType, None)
+    ok_(database.datasetTypeInfo('TestType') is info)
+    
+@raises(database.DatasetTypeError)
+def test_DatasetTypeInfo_Unknown_Type():
+    """datasetTypeInfo() raises an error for types that do not exist.
+    
+    """
+    database.datasetTypeInfo('NotADatasetType')
+    
+def test_DecodeKey():
+    """decodeKey() parses keys with and without the precompiled pattern.
+    
+    """
+    dsID = database.DatasetID('HeLa_Control', 76, 'TestType', None, 'A750',
+                              '2016-05-05', (0, 2), 3, 5)
+    key  = database.encodeKey(dsID, 'TestType')
+    assert_equal(key, 'HeLa_Control/HeLa_Control_76/TestType_ChannelA750'
+                      '_Pos_000_002_Slice3_Date20160505_Replicate5')
+    assert_equal(database.decodeKey(key), dsID)
+    
+    # Keys with unknown fields are parsed field by field
+    key  = 'HeLa_Control/HeLa_Control_76/TestType_Pos1_Other_Date20160505'
+    assert_equal(database.decodeKey(key),
+                 database.DatasetID('HeLa_Control', 76, 'TestType', None,
+                                    None, '2016-05-05', (1,), None, None))
+
+@raises(ValueError)
+def test_DecodeKey_Invalid_Date():
+    """decodeKey() raises an error for dates that do not exist.
+    
+    """
+    database.decodeKey('HeLa_Control/HeLa_Control_76/TestType_Date20161345')
+    
+def test_HDFDatastore_Key_Cache():
+    """Keys are checked in memory and stale readers fall back on the file.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_KeyCache.h5')
+    if dsName.exists():
+        remove(str(dsName))
+    
+    t1 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 1})
+    t2 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 2})
+    t1.data, t2.data = np.array([1, 2, 3]), np.array([4, 5, 6])
+    try:
+        with database.HDFDatastore(dsName) as myDS:
+            myDS.put(t1)
+            ok_(('HeLa/HeLa_1/TestType', 'TestType') in myDS._keys)
+            
+            keyExists, _, _ = myDS._checkKeyExistence(
+                t2, raiseException = False)
+            ok_(not keyExists)
+        
+        # The reader's keys are loaded before t2 is written
+        reader = database.HDFDatastore(dsName, readOnly = True)
+        assert_equal(len(reader._keys), 1)
+        with myDS:
+            myDS.put(t2)
+        
+        dsID = myDS.query(datasetType = 'TestType')[1]
+        ok_(array_equal(reader.get(dsID).data, t2.data))
+    finally:
+        remove(str(dsName))
+
+def test_HDFDatastore_Key_Cache_Unindexed_Type():
+    """Keys of types without an index table are looked for in the file.
+    
+    """
+    dsName = testDataRoot / Path('database_test_files/myDB_KeyCache.h5')
+    if dsName.exists():
+        remove(str(dsName))
+    
+    t1 = TestType.TestType(datasetIDs = {'prefix' : 'HeLa', 'acqID' : 1})
+    t1.data = np.array([1, 2, 3])
+    try:
+        with database.HDFDatastore(dsName) as myDS:
+            myDS.put(t1)
+        
+        # Simulate an index built while TestType was not registered
+        with h5py.File(str(dsName), 'a') as f:
+            del(f[config.__Index_Key__ + '/TestType'])
+        
+        dsID = database.DatasetID('HeLa', 1, 'TestType', None, None, None,
+                                  None, None, None)
+        with myDS:
+            ok_(myDS._keyIndexed)
+            keyExists, _, _ = myDS._checkKeyExistence(
+                t1, raiseException = False)
+            ok_(keyExists)
+            ok_(array_equal(myDS.get(dsID).data, t1.data))
+    finally:
+        remove(str(dsName))
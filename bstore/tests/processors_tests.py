@@ -2,7 +2,7 @@
 # Switzerland, Laboratory of Experimental Biophysics, 2016-2018
 # See the LICENSE.txt file for more details.
 
-from nose.tools import ok_, assert_equal
+from nose.tools import ok_, assert_equal, raises
 from bstore import processors as proc
 from bstore import config
 import pandas as pd
@@ -101,6 +101,129 @@ def test_ComputeZPosition():
     ok_(zCol in procdf)
     ok_(procdf.equals(gt))
 
+def test_ComputeZPosition_Huang():
+    """The vectorized Huang fit finds the same z-positions as minimization.
+    
+    """
+    from scipy.interpolate import interp1d
+    
+    # Calibration curves of the DefaultAstigmatismComputer ground truth
+    zCal = np.arange(-800, 800, 10.0)
+    fx   = interp1d(zCal, 0.0005 * (zCal - 150)**2 + 150, kind='cubic')
+    fy   = interp1d(zCal, 0.0005 * (zCal + 150)**2 + 150, kind='cubic')
+    
+    z  = np.array([-600, -250.5, -10, 0, 42.3, 333, 600])
+    df = pd.DataFrame({'Wx': 0.0005 * (z - 150)**2 + 150,
+                       'Wy': 0.0005 * (z + 150)**2 + 150})
+    
+    huang    = proc.ComputeZPosition((fx, fy), sigmaCols=['Wx', 'Wy'],
+                                     fittype='huang')
+    minimize = proc.ComputeZPosition((fx, fy), sigmaCols=['Wx', 'Wy'],
+                                     fittype='huang_minimize')
+    procdf   = huang(df)
+    
+    # The input DataFrame is not modified
+    ok_('z' not in df)
+    npt.assert_allclose(procdf['z'], z, atol=0.5)
+    npt.assert_allclose(procdf['z'], minimize(df)['z'], atol=0.5)
+    
+    # Localizations with invalid widths have no z-position
+    df.loc[3, 'Wx'] = -1
+    ok_(np.isnan(huang(df).loc[3, 'z']))
+
+def test_ComputeZPosition_Cached_Calibration():
+    """ComputeZPosition compiles the calibration only once per zFunc.
+    
+    """
+    import pickle
+    
+    zCal = np.linspace(-800, 800, 161)
+    fx   = proc.LookupTable(zCal, 0.0005 * (zCal - 150)**2 + 150)
+    fy   = proc.LookupTable(zCal, 0.0005 * (zCal + 150)**2 + 150)
+    df   = pd.DataFrame({'Wx': [200.0, 150.5, 180.0],
+                         'Wy': [170.0, 240.0, 150.0]})
+    
+    cz = proc.ComputeZPosition((fx, fy), sigmaCols=['Wx', 'Wy'])
+    z  = cz(df)['z']
+    f  = cz._f
+    ok_(isinstance(f, proc.LookupTable))
+    
+    # The calibration is reused, also by copies of the processor
+    cz(df)
+    ok_(cz._f is f)
+    npt.assert_array_equal(pickle.loads(pickle.dumps(cz))(df)['z'], z)
+    
+    # New calibration curves are compiled again
+    cz.zFunc = (fy, fx)
+    npt.assert_allclose(cz(df)['z'], -z, atol=1)
+    ok_(cz._f is not f)
+
+def test_ComputeZPosition_Inplace_Blocks():
+    """ComputeZPosition gives the same results in place and in blocks.
+    
+    """
+    zCal = np.linspace(-800, 800, 161)
+    zFunc = (proc.LookupTable(zCal, 0.0005 * (zCal - 150)**2 + 150),
+             proc.LookupTable(zCal, 0.0005 * (zCal + 150)**2 + 150))
+    wobbleFunc = (proc.LookupTable(zCal, zCal / 100),
+                  proc.LookupTable(zCal, -zCal / 50))
+    
+    z  = np.linspace(-500, 500, num=1001)
+    df = pd.DataFrame({'x' : np.arange(1001.0),
+                       'y' : np.arange(1001.0),
+                       'Wx': 0.0005 * (z - 150)**2 + 150,
+                       'Wy': 0.0005 * (z + 150)**2 + 150})
+    
+    for fittype in ['diff', 'huang']:
+        cz = proc.ComputeZPosition(zFunc, sigmaCols=['Wx', 'Wy'],
+                                   fittype=fittype, wobbleFunc=wobbleFunc,
+                                   scalingFactor=0.5)
+        gt = cz(df)
+        ok_('z' not in df)
+        npt.assert_allclose(gt['z'], 0.5 * z, atol=0.5)
+        npt.assert_allclose(gt['dx'], gt['z'] / 100, atol=1e-9)
+        npt.assert_allclose(gt['x'], df['x'] - gt['dx'])
+        
+        # Blocks that do not evenly divide the localizations
+        cz.blockSize = 64
+        ok_(cz(df).equals(gt))
+        
+        # Huang distances computed in chunks of a few localizations
+        cz._distanceBudget = 7 * cz.zSamples
+        ok_(cz(df).equals(gt))
+        del(cz._distanceBudget)
+        
+        # The input DataFrame itself is modified in place
+        cz.inplace = True
+        inplacedf  = df.copy()
+        procdf     = cz(inplacedf)
+        ok_(procdf is inplacedf)
+        ok_(procdf.equals(gt))
+
+def test_LookupTable():
+    """LookupTable interpolates linearly and returns NaN outside its grid.
+    
+    """
+    x   = np.linspace(-3, 5, num=97)
+    lut = proc.LookupTable(x, np.sin(x))
+    
+    values = np.array([np.nan, -3.5, -3, -1.234, 0, 2.71, 5, 5.5])
+    inside = (values >= -3) & (values <= 5)
+    gt     = np.where(inside, np.interp(values, x, np.sin(x)), np.nan)
+    npt.assert_allclose(lut(values), gt, atol=1e-12)
+    assert_equal(lut(5), np.sin(5))
+    
+    # Unordered samples are resampled onto a uniform grid
+    lut = proc.LookupTable.fromSamples([3, 1, np.nan, 2], [30, 10, 0, 20])
+    npt.assert_allclose(lut([1, 1.5, 3]), [10, 15, 30])
+
+@raises(ValueError)
+def test_LookupTable_NonUniform_Grid():
+    """LookupTable raises an error when its grid is not uniform.
+    
+    """
+    proc.LookupTable([0, 1, 3], [0, 1, 2])
+
 def test_Reset_AstigmatismComputer():
     """The reset method of the DefaultAstigmatismComputer works.
     
@@ -376,6 +499,82 @@ def test_Reset_DriftComputer():
     assert_equal(dc.useTrajectories, [])
     assert_equal(dc.zeroFrame, 1000)
     
+def test_Cluster_Tiled():
+    """Tiled clustering gives the same labels as clustering all at once.
+    
+    """
+    # Gaussian clusters on top of a uniform background
+    rng     = np.random.RandomState(42)
+    centers = rng.uniform(0, 5000, size=(25, 2))
+    coords  = np.vstack([
+        centers[rng.randint(25, size=5000)] + rng.normal(0, 30, (5000, 2)),
+        rng.uniform(0, 5000, size=(1000, 2))])
+    df = pd.DataFrame({'x': coords[:, 0], 'y': coords[:, 1],
+                       'z': rng.uniform(0, 50, len(coords))})
+    
+    for coordCols in [['x', 'y'], ['x', 'y', 'z']]:
+        gt = proc.Cluster(minSamples=10, eps=20, coordCols=coordCols)(df)
+        ok_(gt['cluster_id'].max() > 0)
+        
+        # Tiles smaller and larger than the clusters
+        for tileSize, workers in [(70, None), (1000, None), (1000, 2)]:
+            cl = proc.Cluster(minSamples=10, eps=20, coordCols=coordCols,
+                              tileSize=tileSize, workers=workers)
+            ok_(cl(df).equals(gt))
+
+@raises(ValueError)
+def test_Cluster_Tiled_NaN():
+    """Tiled clustering raises an error for NaN coordinates like sklearn.
+    
+    """
+    df = pd.DataFrame({'x' : [0.0, 1.0, 2.0], 'y' : [0.0, np.nan, 2.0]})
+    proc.Cluster(minSamples=2, eps=20, tileSize=70)(df)
+
+def test_Cluster_Grid():
+    """The grid algorithm gives the same labels as scikit-learn's DBSCAN.
+    
+    """
+    rng     = np.random.RandomState(7)
+    centers = rng.uniform(0, 3000, size=(15, 2))
+    coords  = np.vstack([
+        centers[rng.randint(15, size=3000)] + rng.normal(0, 30, (3000, 2)),
+        rng.uniform(0, 3000, size=(1000, 2))])
+    df = pd.DataFrame({'x': coords[:, 0], 'y': coords[:, 1],
+                       'z': rng.uniform(0, 50, len(coords))})
+    
+    for coordCols in [['x', 'y'], ['x', 'y', 'z']]:
+        gt = proc.Cluster(minSamples=10, eps=20, coordCols=coordCols)(df)
+        ok_(gt['cluster_id'].max() > 0)
+        
+        for tileSize, workers in [(None, None), (70, None), (1000, 2)]:
+            cl = proc.Cluster(minSamples=10, eps=20, coordCols=coordCols,
+                              algorithm='grid', tileSize=tileSize,
+                              workers=workers)
+            ok_(cl(df).equals(gt))
+    
+    # Small batches force the links to be reduced to a spanning forest
+    gt     = proc.Cluster(minSamples=10, eps=20)(df)
+    labels = proc._dbscanGrid(df[['x', 'y']].values, 10, 20, batchSize=100)
+    ok_(np.array_equal(labels, gt['cluster_id'].values))
+    assert_equal(proc._dbscanGrid(np.empty((0, 2)), 10, 20).size, 0)
+
+def test_Cluster_Grid_NaN():
+    """The grid algorithm raises an error for NaN coordinates like sklearn.
+    
+    """
+    rng = np.random.RandomState(0)
+    df  = pd.DataFrame(rng.uniform(0, 100, size=(200, 2)),
+                       columns=['x', 'y'])
+    df.loc[50, 'y'] = np.nan
+    
+    for tileSize in [None, 70]:
+        try:
+            proc.Cluster(minSamples=5, eps=20, algorithm='grid',
+                         tileSize=tileSize)(df)
+            ok_(False, 'ValueError was not raised.')
+        except ValueError:
+            pass
+
 def test_ClusterStats():
     """Cluster statistics are computed correctly.
     
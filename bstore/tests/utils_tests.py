@@ -7,7 +7,7 @@
 
 """
 
-from nose.tools import assert_equal
+from nose.tools import assert_equal, ok_
 
 import os
 import shutil
@@ -38,3 +38,29 @@ def test_findPlugins():
     # Remove the test file
     if Path(cFile).exists():
         os.remove(cFile)
+        
+def test_mapBounded():
+    """mapBounded yields the results in order and submits few jobs ahead.
+    
+    """
+    produced = []
+    def jobs():
+        for x in range(10):
+            produced.append(x)
+            yield x, (x, 2)
+    
+    results = []
+    for key, future in _utils.mapBounded(pow, jobs(), workers = 2):
+        # At most 2 jobs per process and the next one are submitted
+        ok_(len(produced) <= key + 2 * 2 + 1)
+        results.append((key, future.result()))
+    
+    assert_equal(results, [(x, x**2) for x in range(10)])
+    
+    # Exceptions are raised by the futures
+    futures = list(_utils.mapBounded(pow, [('a', ('a', 2))], workers = 1))
+    try:
+        futures[0][1].result()
+        ok_(False, 'TypeError was not raised.')
+    except TypeError:
+        pass